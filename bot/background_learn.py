@@ -0,0 +1,142 @@
+"""
+Module for learning messages in the background of the bot process.
+
+This module defines the BackgroundLearn class, which takes the messages of the bot off
+the reply path: handlers put them onto a bounded asyncio queue, and a background task
+drains the queue in batches and learns every batch with one set-based transaction.
+A batch which fails is logged and dropped, so the task keeps draining the queue and
+the handlers never wait on a queue nobody reads.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.services.learn_service import LearnService
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class BackgroundLearn:
+    """Class responsible for learning queued messages in a background asyncio task."""
+
+    def __init__(self, session_factory: async_sessionmaker, max_size: int = 1000,
+                 batch_size: int = 100):
+        """
+        Initialize the BackgroundLearn.
+
+        Args:
+            session_factory (async_sessionmaker): Factory of asyncio database sessions.
+            max_size (int, optional): Maximum number of queued messages. Once the queue is
+                full, `put` waits until the background task has made room. Defaults to 1000.
+            batch_size (int, optional): Maximum number of messages learned in one
+                transaction. Defaults to 100.
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self._queue: Optional["asyncio.Queue[Optional[Tuple[List[str], int]]]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def queue(self) -> "asyncio.Queue[Optional[Tuple[List[str], int]]]":
+        """
+        Get the message queue, creating it in the running event loop on first use.
+
+        Returns:
+            asyncio.Queue: The queue of (words, chat_id) tuples, in which None asks the
+                background task to stop.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    async def put(self, words: List[str], chat_id: int) -> None:
+        """
+        Queue a message for learning, waiting while the queue is full.
+
+        Args:
+            words (List[str]): Words of the message.
+            chat_id (int): The chat ID associated with the message.
+        """
+        await self.queue.put((words, chat_id))
+
+    def start(self) -> None:
+        """Start the background task which learns the queued messages."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the background task and learn the messages that are still queued.
+
+        The task is asked to stop through the queue, so the batch it is learning is
+        finished instead of being cancelled.
+        """
+        if self._task is not None:
+            if not self._task.done():
+                await self.queue.put(None)
+            try:
+                await self._task
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Background learning failed: %s", e, exc_info=True)
+            self._task = None
+        self._stopping = False
+        while not self.queue.empty():
+            batch = self._take_batch([])
+            if batch:
+                await self._learn(batch)
+
+    async def _run(self) -> None:
+        """Learn the queued messages batch by batch until asked to stop."""
+        while not self._stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            await self._learn(self._take_batch([item]))
+
+    def _take_batch(self, batch: List[Tuple[List[str], int]]) -> List[Tuple[List[str], int]]:
+        """
+        Add the messages already waiting in the queue to a batch, up to the batch size.
+
+        A stop request met in the queue ends the batch and stops the background task
+        once the batch has been learned.
+
+        Args:
+            batch (List[Tuple[List[str], int]]): Messages taken from the queue so far.
+
+        Returns:
+            List[Tuple[List[str], int]]: The batch of (words, chat_id) tuples.
+        """
+        while len(batch) < self.batch_size and not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is None:
+                self._stopping = True
+                break
+            batch.append(item)
+        return batch
+
+    async def _learn(self, batch: List[Tuple[List[str], int]]) -> None:
+        """
+        Learn a batch of messages in one transaction.
+
+        Any error is logged and the batch is dropped, so the background task survives it.
+
+        Args:
+            batch (List[Tuple[List[str], int]]): List of (words, chat_id) tuples.
+        """
+        logger.debug("Learning %d queued messages", len(batch))
+        try:
+            async with self.session_factory() as session:
+                await session.run_sync(LearnService.learn_batch, batch)
+        except SQLAlchemyError as e:
+            logger.error("Failed to learn %d queued messages: %s", len(batch), e, exc_info=True)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Unexpected error while learning %d queued messages: %s",
+                         len(batch), e, exc_info=True)
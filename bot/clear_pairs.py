@@ -1,11 +1,13 @@
 """
 This module contains the CleanPairs class, which is responsible for periodically 
 cleaning up old pairs from the database based on the configuration settings.
+
+Old pairs are deleted in place in bounded, rate-limited chunks, and the cleaner
+sleeps between passes instead of querying the database back to back.
 """
 
 import time
 import logging
-from typing import List
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from core.repositories.pair_repository import PairRepository
@@ -20,45 +22,92 @@ logging.basicConfig(level=logging.DEBUG,
 class CleanPairs:
     """Class for cleaning up old pairs from the database."""
 
+    # Number of seconds to wait before retrying a pass after an error.
+    error_wait = 5
+
     @staticmethod
-    def run(session: Session, config: Config):
+    def run(session: Session, config: Config, once: bool = False) -> bool:
         """
-        Continuously run the cleanup process in an infinite loop.
+        Run a cleanup pass every `cleanup_interval` seconds.
+
+        The interval is measured from the start of a pass, so an idle cleaner only runs
+        a single cheap query per interval.
 
         Args:
             session (Session): SQLAlchemy session object.
             config (Config): Configuration object containing settings.
+            once (bool, optional): Run a single pass and return. Defaults to False.
+
+        Returns:
+            bool: Whether the single pass of `once` succeeded; without `once` the
+                cleaner runs until it is interrupted.
         """
         while True:
+            started = time.monotonic()
             try:
                 CleanPairs.clean_up(session, config)
-            except (SQLAlchemyError, ValueError, RuntimeError, OSError) as e:
-                CleanPairs._handle_exception(e)
-                time.sleep(5)
+            except (SQLAlchemyError, ValueError, RuntimeError, OSError):
+                if once:
+                    return False
+                time.sleep(CleanPairs.error_wait)
+                continue
+            if once:
+                return True
+            time.sleep(max(0.0, config.bot.cleanup_interval - (time.monotonic() - started)))
 
     @staticmethod
-    def clean_up(session: Session, config: Config):
+    def clean_up(session: Session, config: Config) -> int:
         """
-        Perform the cleanup operation by removing old pairs from the database.
+        Perform a cleanup pass, removing the old pairs chunk by chunk until none is left.
+
+        Every chunk is deleted and committed by its own short transaction. When
+        `cleanup_rate` is set, the pass sleeps between chunks to remove at most that
+        many pairs per second.
 
         Args:
             session (Session): SQLAlchemy session object.
             config (Config): Configuration object containing settings.
+
+        Returns:
+            int: Number of removed pairs.
         """
+        pair_repo = PairRepository()
+        batch_size = max(1, config.bot.cleanup_limit)
+        rate = config.bot.cleanup_rate
+        started = time.monotonic()
+        removed = 0
+        last = None
         try:
-            with session.begin():
-                pair_repo = PairRepository()
-                removed_ids: List[int] = pair_repo.remove_old(
-                    session, config.bot.cleanup_limit)
-
-                if not removed_ids:
-                    logger.info("Nothing to remove")
-                else:
-                    logger.info(
-                        "Removed %d pairs: %s", len(removed_ids), ', '.join(map(str, removed_ids)))
+            while True:
+                count, last = pair_repo.remove_old(
+                    session, batch_size, config.bot.cleanup_retention_days, last)
+                removed += count
+                if count < batch_size:
+                    break
+                if rate > 0:
+                    time.sleep(max(0.0, removed / rate - (time.monotonic() - started)))
         except (SQLAlchemyError, ValueError, RuntimeError, OSError) as e:
+            session.rollback()
             CleanPairs._handle_exception(e)
             raise
+        finally:
+            CleanPairs._report(removed, time.monotonic() - started)
+        return removed
+
+    @staticmethod
+    def _report(removed: int, elapsed: float):
+        """
+        Log the result of a cleanup pass.
+
+        Args:
+            removed (int): Number of removed pairs.
+            elapsed (float): Duration of the pass in seconds.
+        """
+        if not removed:
+            logger.info("Nothing to remove")
+        else:
+            logger.info("Removed %d pairs in %.1f s (%.0f rows/s)",
+                        removed, elapsed, removed / elapsed if elapsed > 0 else removed)
 
     @staticmethod
     def _handle_exception(e: Exception):
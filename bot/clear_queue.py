@@ -18,8 +18,6 @@ logging.basicConfig(level=logging.DEBUG,
 class CleanQueue:
     """Class to handle cleaning the learn queue in the repository."""
 
-    learn_queue = LearnQueueRepository()
-
     @staticmethod
     def run():
         """
@@ -38,5 +36,10 @@ class CleanQueue:
 
     @staticmethod
     def _clean_up():
-        """Clears the learn queue by calling the clear method of the repository."""
-        CleanQueue.learn_queue.clear()
+        """
+        Clears the learn queue by calling the clear method of the repository.
+
+        The repository is created here rather than at import, so importing this
+        module does not open a MongoDB client which forked processes would inherit.
+        """
+        LearnQueueRepository.from_config().clear()
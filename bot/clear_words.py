@@ -0,0 +1,133 @@
+"""
+This module contains the CleanWords class, which is responsible for periodically
+removing the words that are no longer used by any pair or reply.
+
+Words become unreferenced when the pairs which used them are cleaned up. They are
+found with anti-joins over bounded ranges of word IDs and deleted in rate-limited
+chunks, so the cleaner can run while the bot keeps learning.
+"""
+
+import time
+import logging
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from core.repositories.word_repository import WordRepository
+from config import Config
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class CleanWords:
+    """Class for removing unreferenced words from the database."""
+
+    # Number of seconds to wait before retrying a pass after an error.
+    error_wait = 5
+
+    @staticmethod
+    def run(session: Session, config: Config, once: bool = False) -> bool:
+        """
+        Run a cleanup pass every `cleanup_interval` seconds.
+
+        Args:
+            session (Session): SQLAlchemy session object.
+            config (Config): Configuration object containing settings.
+            once (bool, optional): Run a single pass and return. Defaults to False.
+
+        Returns:
+            bool: Whether the single pass of `once` succeeded; without `once` the
+                cleaner runs until it is interrupted.
+        """
+        while True:
+            started = time.monotonic()
+            try:
+                CleanWords.clean_up(session, config)
+            except (SQLAlchemyError, ValueError, RuntimeError, OSError):
+                if once:
+                    return False
+                time.sleep(CleanWords.error_wait)
+                continue
+            if once:
+                return True
+            time.sleep(max(0.0, config.bot.cleanup_interval - (time.monotonic() - started)))
+
+    @staticmethod
+    def clean_up(session: Session, config: Config) -> int:
+        """
+        Perform a cleanup pass over all words, chunk by chunk in the order of their IDs.
+
+        Every chunk examines `cleanup_limit` words and is committed by its own short
+        transaction. When `cleanup_rate` is set, the pass sleeps between chunks to
+        examine at most that many words per second.
+
+        Args:
+            session (Session): SQLAlchemy session object.
+            config (Config): Configuration object containing settings.
+
+        Returns:
+            int: Number of removed words.
+        """
+        word_repo = WordRepository()
+        batch_size = max(1, config.bot.cleanup_limit)
+        rate = config.bot.cleanup_rate
+        started = time.monotonic()
+        examined = 0
+        removed = 0
+        last = 0
+        try:
+            while True:
+                count, last = word_repo.remove_unreferenced(session, batch_size, last)
+                if last is None:
+                    break
+                removed += count
+                examined += batch_size
+                if rate > 0:
+                    time.sleep(max(0.0, examined / rate - (time.monotonic() - started)))
+        except (SQLAlchemyError, ValueError, RuntimeError, OSError) as e:
+            session.rollback()
+            CleanWords._handle_exception(e)
+            raise
+        finally:
+            CleanWords._report(removed, time.monotonic() - started)
+        return removed
+
+    @staticmethod
+    def _report(removed: int, elapsed: float):
+        """
+        Log the result of a cleanup pass.
+
+        Args:
+            removed (int): Number of removed words.
+            elapsed (float): Duration of the pass in seconds.
+        """
+        if not removed:
+            logger.info("No unreferenced words to remove")
+        else:
+            logger.info("Removed %d words in %.1f s (%.0f rows/s)",
+                        removed, elapsed, removed / elapsed if elapsed > 0 else removed)
+
+    @staticmethod
+    def _handle_exception(e: Exception):
+        """
+        Handle exceptions by logging appropriate error messages.
+
+        Args:
+            e (Exception): The exception that occurred.
+        """
+        if isinstance(e, SQLAlchemyError):
+            logger.error(
+                "Database error occurred during word cleanup: %s", e, exc_info=True)
+        elif isinstance(e, ValueError):
+            logger.error(
+                "Configuration error occurred during word cleanup: %s", e, exc_info=True)
+        elif isinstance(e, RuntimeError):
+            logger.error(
+                "Runtime error occurred during word cleanup: %s", e, exc_info=True)
+        elif isinstance(e, OSError):
+            logger.error(
+                "OS error occurred during word cleanup: %s", e, exc_info=True)
+        else:
+            logger.error(
+                "Unexpected error occurred during word cleanup: %s", e, exc_info=True)
@@ -5,11 +5,9 @@ generation of stories based on Telegram updates.
 
 from typing import Optional
 from sqlalchemy.orm import Session
-from telegram import Update
 
 from core.services.story_service import StoryService
 from bot.handlers.generic_handler import GenericHandler
-from config import Config
 
 
 class CoolStoryHandler(GenericHandler):
@@ -18,25 +16,16 @@ class CoolStoryHandler(GenericHandler):
 
     Attributes:
         update (Update): The Telegram update object.
-        session (Session): The SQLAlchemy session for database operations.
+        session (AsyncSession): The SQLAlchemy asyncio session for database operations.
         config (Config): Configuration object.
     """
 
-    def __init__(self, update: Update, session: Session, config: Config):
+    def _initialize_story_service(self, session: Session) -> StoryService:
         """
-        Initializes the CoolStoryHandler with the provided update, session, and config.
+        Initializes the StoryService with the necessary parameters.
 
         Args:
-            update (Update): The Telegram update object.
-            session (Session): The SQLAlchemy session for database operations.
-            config (Config): Configuration object.
-        """
-        super().__init__(update, session, config)
-        self.story_service = self._initialize_story_service()
-
-    def _initialize_story_service(self) -> StoryService:
-        """
-        Initializes the StoryService with the necessary parameters.
+            session (Session): The synchronous session of the update's AsyncSession.
 
         Returns:
             StoryService: An instance of StoryService configured with the necessary parameters.
@@ -45,9 +34,10 @@ class CoolStoryHandler(GenericHandler):
             words=self.words,
             context=self.full_context,
             chat_id=self.chat.id,
-            session=self.session,
+            session=session,
             end_sentence=self.config.end_sentence,
-            sentences=50
+            sentences=50,
+            engine=self.config.bot.story_engine
         )
 
     async def call(self, *args, **kwargs) -> Optional[str]:
@@ -69,5 +59,18 @@ class CoolStoryHandler(GenericHandler):
                 available or fails to generate a story.
         """
 
-        self.before()
-        return self.story_service.generate() if self.story_service else None
+        await self.before()
+        await self.context_cache.load(self.chat_context)
+        return await self.session.run_sync(self._generate_story)
+
+    def _generate_story(self, session: Session) -> Optional[str]:
+        """
+        Generates the story, run through `AsyncSession.run_sync`.
+
+        Args:
+            session (Session): The synchronous session of the update's AsyncSession.
+
+        Returns:
+            Optional[str]: The generated story, or None if no story was generated.
+        """
+        return self._initialize_story_service(session).generate()
@@ -1,18 +1,22 @@
 """
 This module defines the GenericHandler abstract base class,
 which serves as a base for handling Telegram bot updates.
+
+Database work is awaited through the AsyncSession of the update: the repositories
+and services are run with `AsyncSession.run_sync`, so their queries do not block
+the event loop.
 """
 
 import string
 import random
 from abc import ABC, abstractmethod
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from telegram import Update
 
 from core.entities.chat_entity import Chat as ChatEntity
 from core.repositories.chat_repository import ChatRepository
-from core.repositories.context_repository import ContextRepository
+from core.caches.context_cache import ContextCache
 from config import Config
 
 
@@ -21,23 +25,20 @@ class GenericHandler(ABC):
     Abstract base class for handling Telegram bot updates.
     """
 
-    def __init__(self, update: Update, session: Session, config: Config):
+    def __init__(self, update: Update, session: AsyncSession, config: Config):
         """
         Initializes the GenericHandler with the given update, session, and config.
 
         Attributes:
             update (Update): The Telegram update object.
-            session (Session): The SQLAlchemy session object.
+            session (AsyncSession): The SQLAlchemy asyncio session object.
             config (Config): The configuration object.
         """
         self.message = update.message
         self.session = session
         self.config = config
-        self.context_repository = ContextRepository(
-            host=self.config.cache.host,
-            port=self.config.cache.port,
-            database_name=self.config.cache.name
-        )
+        self._chat: Optional[ChatEntity] = None
+        self.context_cache = ContextCache.shared()
 
     @abstractmethod
     async def call(self, *args, **kwargs) -> Optional[str]:
@@ -60,13 +61,32 @@ class GenericHandler(ABC):
         """
 
 
-    def before(self):
+    async def before(self):
         """
         Executes actions before handling the update.
+
+        Loads the chat entity of the update and updates it if the chat has changed.
         """
+        await self.load_chat()
         if self.is_chat_changed:
-            ChatRepository().update_chat(self.session, self.chat.id,
-                                         self.chat_name, self.migration_id)
+            migrated = await self.session.run_sync(ChatRepository().update_chat, self.chat.id,
+                                                   self.chat_name, self.migration_id)
+            self.chat.name = self.chat_name
+            if migrated:
+                self.chat.telegram_id = self.migration_id
+
+    async def load_chat(self) -> ChatEntity:
+        """
+        Gets or creates the chat entity for the current chat, once per update.
+
+        Returns:
+            ChatEntity: The chat entity for the current chat.
+        """
+        if self._chat is None:
+            self._chat = await self.session.run_sync(
+                ChatRepository().get_or_create_by,
+                self.telegram_id, self.chat_name, self.chat_type)
+        return self._chat
 
     @property
     def is_chat_changed(self) -> bool:
@@ -197,18 +217,35 @@ class GenericHandler(ABC):
             for entity in self.message.entities:
                 start, end = entity.offset, entity.offset + entity.length
                 text = text[:start] + " " * (end - start) + text[end:]
+        return GenericHandler.tokenize(text)
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """
+        Splits a text into lowercase words, skipping words longer than 2000 characters.
+
+        Args:
+            text (str): The text to split.
+
+        Returns:
+            List[str]: A list of words of the text.
+        """
         return [word.lower() for word in text.split() if word and len(word) <= 2000]
 
     @property
     def chat(self) -> ChatEntity:
         """
-        Gets or creates the chat entity for the current chat.
+        Gets the chat entity for the current chat loaded by `load_chat`.
 
         Returns:
             ChatEntity: The chat entity for the current chat.
+
+        Raises:
+            RuntimeError: If the chat has not been loaded yet.
         """
-        return ChatRepository().get_or_create_by(
-            self.session, self.telegram_id, self.chat_name, self.chat_type)
+        if self._chat is None:
+            raise RuntimeError("Chat is not loaded, call load_chat first")
+        return self._chat
 
     @property
     def telegram_id(self) -> int:
@@ -288,7 +325,7 @@ class GenericHandler(ABC):
         Returns:
             List[str]: A random sample of context strings for the current chat.
         """
-        context = self.context_repository.get_context(self.chat_context, limit)
+        context = self.context_cache.get_context(self.chat_context, limit)
         return random.sample(context, min(len(context), limit))
 
     @property
@@ -30,6 +30,6 @@ class GetGabHandler(GenericHandler):
             Optional[str]: A formatted string indicating the 'pizdlivost' level, or None if 
                 not available.
         """
-        self.before()
+        await self.before()
         pizdlivost_level = self.chat.random_chance
         return f"Pizdlivost level is on {pizdlivost_level}"
@@ -4,7 +4,7 @@ of statistics about known pairs in a chat.
 """
 
 from typing import Optional
-from core.repositories.pair_repository import PairRepository
+from core.repositories.chat_stats_repository import ChatStatsRepository
 from bot.handlers.generic_handler import GenericHandler
 
 class GetStatsHandler(GenericHandler):
@@ -12,27 +12,34 @@ class GetStatsHandler(GenericHandler):
     Handler class responsible for retrieving statistics about known pairs in a chat.
 
     Methods:
-        call: Asynchronously retrieves and returns the count of known pairs in the chat.
+        call: Asynchronously retrieves and returns the statistics of the chat.
     """
 
     async def call(self, *args, **kwargs) -> Optional[str]:
         """
-        Asynchronously retrieves the count of known pairs in the current chat.
+        Asynchronously retrieves the statistics of the current chat.
 
         This method performs the following steps:
         1. Calls the `before` method to execute any preliminary actions before handling the update.
-        2. Uses the `PairRepository` to retrieve the count of known pairs for the current chat 
-            from the database.
-        3. Returns a formatted string containing the count of known pairs in the chat.
+        2. Uses the `ChatStatsRepository` to read the statistics row of the current chat,
+            which learning and cleanup keep up to date, so no pairs are counted.
+        3. Returns a formatted string containing the statistics of the chat.
 
         Args:
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
 
         Returns:
-            Optional[str]: A string containing the count of known pairs in the chat, or None if 
+            Optional[str]: A string containing the statistics of the chat, or None if
                 not available.
         """
-        self.before()
-        count = PairRepository().get_pairs_count(self.session, self.chat.id)
-        return f"Known pairs in this chat: {count}."
+        await self.before()
+        stats = await self.session.run_sync(ChatStatsRepository().get, self.chat.id)
+        if stats is None:
+            return "Known pairs in this chat: 0."
+        response = (f"Known pairs in this chat: {stats.pairs_count}.\n"
+                    f"Known replies: {stats.replies_count}.\n"
+                    f"Known words: {stats.words_count}.")
+        if stats.last_learned_at:
+            response += f"\nLast learned: {stats.last_learned_at:%Y-%m-%d %H:%M}."
+        return response
@@ -6,18 +6,26 @@ containing messages, extracting relevant data, and pushing it to a learn queue.
 """
 
 import json
+import os
+import shutil
 import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import tempfile
+from typing import Optional, List, Tuple
+import httpx
 from telegram import Document, File, Update
 from telegram.error import TimedOut, NetworkError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from bot.handlers.generic_handler import GenericHandler
 from config import Config
+from core.readers.telegram_export_reader import TelegramExportReader
 from core.repositories.learn_queue_repository import LearnQueueRepository
 
 logger = logging.getLogger(__name__)
 
+PUSH_CHUNK_SIZE = 1000
+DOWNLOAD_TIMEOUT = 60
+
 
 class ImportHistoryHandler(GenericHandler):
     """
@@ -27,20 +35,20 @@ class ImportHistoryHandler(GenericHandler):
     """
     EXCLUDED_SENDERS = {"pepeground_bot", "pepepot", "pepepot_test"}
 
-    def __init__(self, update: Update, session: Session,
+    def __init__(self, update: Update, session: AsyncSession,
                  config: Config, document: Document):
         """
         Initializes the ImportHistoryHandler instance.
 
         Args:
             update (Update): The Telegram update instance.
-            session (Session): The SQLAlchemy session instance.
+            session (AsyncSession): The SQLAlchemy asyncio session instance.
             config (Config): The configuration instance.
             document (Document): The Telegram document instance.
         """
         super().__init__(update, session, config)
         self.document = document
-        self.learn_queue = LearnQueueRepository()
+        self.learn_queue = LearnQueueRepository.from_config()
 
     async def call(self, *args, **kwargs) -> Optional[str]:
         """
@@ -68,7 +76,7 @@ class ImportHistoryHandler(GenericHandler):
                         JSON decode error, network error).
         """
         try:
-            self.before()
+            await self.before()
             if not self.document:
                 return "No document attached. Please send a JSON file with the /learn command."
             return await self._process_json_file()
@@ -81,6 +89,10 @@ class ImportHistoryHandler(GenericHandler):
         Processes the JSON file sent by the user, extracts messages, 
         and pushes words to the learning queue.
 
+        The file is streamed to a temporary file and its messages are read and pushed
+        to the learning queue in chunks in a worker thread, so neither the download nor
+        the parsing holds the whole export in memory or blocks the event loop.
+
         Returns:
             str: The result message indicating success or failure.
         """
@@ -91,25 +103,71 @@ class ImportHistoryHandler(GenericHandler):
         if not telegram_file:
             return "Failed to download the file."
 
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
         try:
-            byte_array = await telegram_file.download_as_bytearray()
-            json_data = json.loads(byte_array.decode('utf-8'))
-            extracted_data = self._extract_message_data(json_data)
-
-            for message in extracted_data["messages"]:
-                words = self._extract_words(message["text"])
-                self.learn_queue.push(words, self.chat.id)
+            await self._download_to(telegram_file, path)
+            count = await asyncio.get_event_loop().run_in_executor(
+                None, self._push_messages, path, self.chat.id)
 
             return f"""
-        Successfully processed {len(extracted_data['messages'])} 
+        Successfully processed {count} 
         messages from provided JSON file."""
 
         except json.JSONDecodeError as e:
             logger.error("JSON decode error: %s", e)
             return "Failed to decode the JSON file."
-        except (TimedOut, NetworkError) as e:
+        except (TimedOut, NetworkError, httpx.HTTPError) as e:
             logger.error("Network error while processing JSON file: %s", e)
             return "Network error occurred while processing the JSON file."
+        finally:
+            os.remove(path)
+
+    async def _download_to(self, telegram_file: File, path: str) -> None:
+        """
+        Streams the file to the given path without keeping it in memory.
+
+        Args:
+            telegram_file (File): The Telegram file.
+            path (str): Path of the destination file.
+        """
+        file_path = telegram_file.file_path or ""
+        if not file_path.startswith(("http://", "https://")):
+            # A local Bot API server hands out paths on the local file system. The
+            # export may be large, so it is copied off the event loop.
+            await asyncio.get_event_loop().run_in_executor(
+                None, shutil.copyfile, file_path, path)
+            return
+        async with httpx.AsyncClient(timeout=DOWNLOAD_TIMEOUT) as client:
+            async with client.stream("GET", file_path) as response:
+                response.raise_for_status()
+                with open(path, "wb") as file:
+                    async for chunk in response.aiter_bytes():
+                        file.write(chunk)
+
+    def _push_messages(self, path: str, chat_id: int) -> int:
+        """
+        Reads the messages of the export and pushes their words to the learning queue
+        in chunks of `PUSH_CHUNK_SIZE` items.
+
+        Args:
+            path (str): Path of the downloaded export.
+            chat_id (int): The chat ID the messages are learned for.
+
+        Returns:
+            int: Number of messages pushed.
+        """
+        count = 0
+        chunk: List[Tuple[List[str], int]] = []
+        with open(path, encoding="utf-8") as file:
+            for text in TelegramExportReader(file).texts(self.EXCLUDED_SENDERS):
+                chunk.append((self._extract_words(text), chat_id))
+                count += 1
+                if len(chunk) == PUSH_CHUNK_SIZE:
+                    self.learn_queue.push_many(chunk)
+                    chunk = []
+        self.learn_queue.push_many(chunk)
+        return count
 
     async def _download_file(self, retries: int = 3, delay: int = 5) -> Optional[File]:
         """
@@ -142,32 +200,6 @@ class ImportHistoryHandler(GenericHandler):
         """
         return self.document is not None and self.document.mime_type == 'application/json'
 
-    def _extract_message_data(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Extracts relevant message data from the JSON.
-
-        Args:
-            json_data (Dict[str, Any]): The JSON data.
-
-        Returns:
-            Dict[str, Any]: Extracted messages.
-        """
-        messages = [
-            {
-                "id": msg.get("id"),
-                "date": msg.get("date"),
-                "from": msg.get("from"),
-                "from_id": msg.get("from_id"),
-                "text": msg.get("text")
-            }
-            for msg in json_data.get("messages", [])
-            if msg.get("type") == "message"
-            and msg.get("from") not in self.EXCLUDED_SENDERS
-            and isinstance(msg.get("text"), str)
-            and msg.get("text").strip()
-        ]
-        return {"messages": messages}
-
     def _extract_words(self, text: str) -> List[str]:
         """
         Extracts words from the text.
@@ -6,12 +6,14 @@ on specific conditions using Telegram bot updates.
 
 import logging
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from telegram import Update
 
 from core.repositories.learn_queue_repository import LearnQueueRepository
 from core.services.learn_service import LearnService
 from core.services.story_service import StoryService
+from bot.background_learn import BackgroundLearn
 from bot.handlers.generic_handler import GenericHandler
 from config import Config
 
@@ -24,20 +26,20 @@ logging.basicConfig(level=logging.DEBUG,
 class MessageHandler(GenericHandler):
     """Handler for processing messages and generating stories based on specific conditions."""
 
-    def __init__(self, update: Update, session: Session, config: Config):
-        """Initialize the MessageHandler with update, session, and config."""
+    def __init__(self, update: Update, session: AsyncSession, config: Config,
+                 background_learn: Optional[BackgroundLearn] = None):
+        """
+        Initialize the MessageHandler.
+
+        Args:
+            update (Update): The Telegram update object.
+            session (AsyncSession): The SQLAlchemy asyncio session object.
+            config (Config): The configuration object.
+            background_learn (Optional[BackgroundLearn], optional): In-process learner used
+                in the `background` learn mode. Defaults to None.
+        """
         super().__init__(update, session, config)
-        self.learn_service = LearnService(
-            words=self.words, chat_id=self.chat.id, session=self.session
-        )
-        self.story_service = StoryService(
-            words=self.words,
-            context=self.context,
-            chat_id=self.chat.id,
-            session=self.session,
-            end_sentence=self.config.end_sentence
-        )
-        logger.debug("MessageHandler initialized")
+        self.background_learn = background_learn
 
     async def call(self, *args, **kwargs) -> Optional[str]:
         """
@@ -48,15 +50,14 @@ class MessageHandler(GenericHandler):
         2. Checks if the message has text and is not an edition (i.e., not edited). If not, 
             logs the condition and exits.
         3. Logs the receipt of the message, including the text, chat name, and migration ID.
-        4. Calls the `_learn` method to learn the words from the message based on the bot's 
-            asynchronous configuration.
-        5. Updates the chat context with the words from the message using the context repository.
-        6. Checks if the `StoryService` is available. If not, logs the condition and exits.
-        7. Calls the `_should_generate_story` method to determine if a story should be generated 
+        4. Calls the `_learn` method to learn the words from the message, or queue them,
+            based on the bot's learn mode.
+        5. Updates the chat context with the words from the message using the context cache.
+        6. Calls the `_should_generate_story` method to determine if a story should be generated 
             based on various conditions.
-        8. If conditions are met for generating a story, logs the condition and generates the 
+        7. If conditions are met for generating a story, logs the condition and generates the 
             story using the `StoryService`.
-        9. If no conditions are met for generating a story, logs the condition and exits.
+        8. If no conditions are met for generating a story, logs the condition and exits.
 
         Args:
             *args: Additional arguments.
@@ -66,7 +67,7 @@ class MessageHandler(GenericHandler):
             Optional[str]: The generated story if conditions are met, or None if no story is 
                 generated or conditions are not met.
         """
-        self.before()
+        await self.before()
 
         if not self.has_text or self.is_edition:
             logger.debug("No text or message is an edition, exiting")
@@ -79,29 +80,48 @@ class MessageHandler(GenericHandler):
             self.migration_id
         )
 
-        self._learn()
-        self.context_repository.update_context(self.chat_context, self.words)
+        await self._learn()
+        await self.context_cache.load(self.chat_context)
+        self.context_cache.update_context(self.chat_context, self.words)
         logger.debug("Context updated")
 
-        if self.story_service is None:
-            logger.debug("StoryService is None, exiting")
-            return None
-
         if self._should_generate_story():
             logger.debug("Conditions met for generating story")
-            return self.story_service.generate()
+            return await self.session.run_sync(self._generate_story)
 
         logger.debug("No conditions met for generating story")
         return None
 
-    def _learn(self) -> None:
-        """Learn the words based on the async configuration."""
-        if self.config.bot.async_learn:
+    async def _learn(self) -> None:
+        """Learn the words based on the learn mode configuration."""
+        if self.config.bot.learn_mode == "background" and self.background_learn:
+            logger.debug("Background learn enabled, queueing message")
+            await self.background_learn.put(self.words, self.chat.id)
+        elif self.config.bot.learn_mode == "queue":
             logger.debug("Async learn enabled, pushing to learn queue")
-            LearnQueueRepository().push(self.words, self.chat.id)
+            await self.session.run_sync(self._push_learn_item)
         else:
             logger.debug("Async learn disabled, learning pair immediately")
-            self.learn_service.learn_pair()
+            await self.session.run_sync(self._learn_pair)
+
+    def _push_learn_item(self, session: Session) -> None:
+        """Push the words of the message onto the learn queue, run through `AsyncSession.run_sync`."""
+        LearnQueueRepository.from_config(session).push(self.words, self.chat.id)
+
+    def _learn_pair(self, session: Session) -> None:
+        """Learn the words of the message, run through `AsyncSession.run_sync`."""
+        LearnService(words=self.words, chat_id=self.chat.id, session=session).learn_pair()
+
+    def _generate_story(self, session: Session) -> Optional[str]:
+        """Generate a story for the message, run through `AsyncSession.run_sync`."""
+        return StoryService(
+            words=self.words,
+            context=self.context,
+            chat_id=self.chat.id,
+            session=session,
+            end_sentence=self.config.end_sentence,
+            engine=self.config.bot.story_engine
+        ).generate()
 
     def _should_generate_story(self) -> bool:
         """Determine if a story should be generated based on various conditions."""
@@ -30,5 +30,5 @@ class PingHandler(GenericHandler):
         Returns:
             Optional[str]: A string "Pong." indicating a successful ping response.
         """
-        self.before()
+        await self.before()
         return "Pong."
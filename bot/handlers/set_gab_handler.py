@@ -37,7 +37,7 @@ class SetGabHandler(GenericHandler):
                         if invalid.
                     - A success message indicating that the gab level has been set if valid.
         """
-        self.before()
+        await self.before()
 
         level = int(args[0])
         if level is None:
@@ -46,5 +46,6 @@ class SetGabHandler(GenericHandler):
         if level > 50 or level < 0:
             return "0-50 allowed, Dude!"
 
-        ChatRepository().update_random_chance(self.session, self.chat.id, level)
+        await self.session.run_sync(
+            ChatRepository().update_random_chance, self.chat.id, level)
         return f"Ya wohl, Lord Helmet! Setting gab to {level}"
@@ -0,0 +1,93 @@
+"""
+This module contains the ImportHistory class, which imports a Telegram chat history
+export straight into the database, bypassing the learn queue.
+
+The trigrams of the whole export are counted with NumPy and loaded with `COPY` and a
+few set-based statements in a single transaction, so a large history is learned in
+minutes instead of hours and the queue of the live bot is left untouched.
+"""
+
+import logging
+import time
+from typing import List
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+from bot.handlers.generic_handler import GenericHandler
+from bot.handlers.import_history_handler import ImportHistoryHandler
+from core.readers.telegram_export_reader import TelegramExportReader
+from core.repositories.chat_repository import ChatRepository
+from core.repositories.chat_stats_repository import ChatStatsRepository
+from core.repositories.import_repository import ImportRepository
+from core.services.trigram_counter import TrigramCounter
+from config import Config
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ImportHistory:
+    """Class for bulk importing a chat history export into the database."""
+
+    @staticmethod
+    def run(session: Session, config: Config, path: str, telegram_id: int) -> None:
+        """
+        Import the messages of an export into the chat with the given Telegram ID.
+
+        Args:
+            session (Session): SQLAlchemy session object.
+            config (Config): Configuration object containing settings.
+            path (str): Path of the export (result.json).
+            telegram_id (int): Telegram ID of the chat to import the messages into.
+        """
+        chat = ChatRepository().get_by_telegram_id(session, telegram_id)
+        if chat is None:
+            logger.error("Chat with telegram_id=%d does not exist, "
+                         "send a message to the bot in that chat first", telegram_id)
+            return
+
+        started = time.monotonic()
+        counter = ImportHistory.count(path, config.end_sentence)
+        logger.info("Read %d messages with %d distinct words in %.1f s",
+                    counter.messages, len(counter.vocabulary), time.monotonic() - started)
+
+        repository = ImportRepository()
+        try:
+            word_ids = repository.load_words(session, counter.vocabulary)
+            pairs, replies = repository.load_trigrams(session, chat.id, counter.rows(word_ids))
+            session.commit()
+            ChatStatsRepository().reconcile(session, chat.id)
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error("Database error occurred during import: %s", e, exc_info=True)
+            return
+
+        logger.info("Imported %d messages into chat %d: %d new pairs, %d replies in %.1f s",
+                    counter.messages, chat.id, pairs, replies, time.monotonic() - started)
+
+    @staticmethod
+    def count(path: str, end_sentence: List[str]) -> TrigramCounter:
+        """
+        Count the trigrams of the messages of an export.
+
+        The messages are tokenized like the messages the bot learns, and messages
+        without any word are skipped.
+
+        Args:
+            path (str): Path of the export.
+            end_sentence (List[str]): List of characters that indicate sentence endings.
+
+        Returns:
+            TrigramCounter: The counter holding the words and trigrams of the messages.
+        """
+        counter = TrigramCounter(end_sentence)
+        with open(path, encoding="utf-8") as file:
+            reader = TelegramExportReader(file)
+            for message in reader.texts(ImportHistoryHandler.EXCLUDED_SENDERS):
+                words = GenericHandler.tokenize(message)
+                if words:
+                    counter.add(words)
+        return counter
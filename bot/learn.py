@@ -1,20 +1,29 @@
 """
-Module for processing learning items from a queue using multiple threads.
+Module for processing learning items from a queue using multiple processes.
 
 This module defines the Learn class which is responsible for fetching learning items 
-from a queue and processing them using a pool of worker threads. It handles 
-database interactions with SQLAlchemy and MongoDB, and provides robust error handling 
-for different types of exceptions that might occur during processing.
+from a queue and processing them using worker processes, each owning a shard of the
+chats. It handles database interactions with SQLAlchemy and MongoDB, and provides
+robust error handling for different types of exceptions that might occur during processing.
+
+Each worker claims a batch of items, learns them in a single transaction and
+acknowledges them only after the commit, so a crash never loses a claimed item.
+Items whose batch fails for another reason than a lost connection are retried on
+their own and parked after TELEGRAM_BOT_LEARN_MAX_ATTEMPTS attempts. Idle workers
+wait for new items instead of polling, and the process keeps running until it is
+interrupted.
 """
 
 import time
 import logging
-from typing import Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+import threading
+from typing import List, Tuple
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import InterfaceError, OperationalError, SQLAlchemyError
 from pymongo.errors import PyMongoError
+from core.caches.touch_buffer import TouchBuffer
 from core.repositories.learn_queue_repository import LearnQueueRepository, LearnItem
 from core.services.learn_service import LearnService
 from config import Config
@@ -25,98 +34,278 @@ logging.basicConfig(level=logging.DEBUG,
 
 
 class Learn:
-    """Class responsible for processing learning items from the queue using multiple threads."""
+    """Class responsible for processing learning items from the queue using multiple processes."""
 
     max_workers = 5
-    max_no_item_count = 50
+    min_idle_wait = 0.1
+    shutdown_timeout = 15
 
     @staticmethod
-    def run():
+    def run(workers: int = max_workers, shard: Tuple[int, int] = (0, 1)):
         """
         Main method to start processing learn items.
-        It initializes the necessary configurations and manages the worker threads.
+
+        The chats of shard I/M are those with `chat_id % M == I`, and they are split
+        further among the `workers` processes by `(chat_id // M) % workers`, so process
+        `w` learns the chats with `chat_id % (M * workers) == w * M + I`. The chats of a
+        shard do not depend on the number of workers, so the commands of different
+        shards may start different numbers of processes. Each chat is learned by exactly
+        one process, and the processes never wait for each other's row locks. The
+        processes keep running until they are interrupted; the ones still busy after
+        `shutdown_timeout` seconds are terminated, which is safe because unacknowledged
+        items are learned again.
+
+        Args:
+            workers (int, optional): Number of learn processes. Defaults to 5.
+            shard (Tuple[int, int], optional): Index and count of the shard to learn.
+                Defaults to (0, 1), all chats.
+        """
+        shards = Learn.worker_shards(workers, shard)
+        if workers == 1:
+            Learn.run_shard(shards[0])
+            return
+
+        processes = [
+            multiprocessing.Process(target=Learn.run_shard, args=(worker_shard,),
+                                    name=f"learn-{worker_shard[0]}/{worker_shard[1]}")
+            for worker_shard in shards
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            logger.info("Interrupted by user, waiting for the learn processes to finish.")
+            for process in processes:
+                process.join(Learn.shutdown_timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+    @staticmethod
+    def worker_shards(workers: int, shard: Tuple[int, int]) -> List[Tuple[int, int]]:
         """
-        no_item_count = 0
+        Split a shard among worker processes, see `run`.
 
+        Args:
+            workers (int): Number of learn processes.
+            shard (Tuple[int, int]): Index and count of the shard to learn.
+
+        Returns:
+            List[Tuple[int, int]]: Index and count of the shard of every process.
+        """
+        shard_index, shard_count = shard
+        return [(worker * shard_count + shard_index, shard_count * workers)
+                for worker in range(workers)]
+
+    @staticmethod
+    def run_shard(shard: Tuple[int, int]):
+        """
+        Learn the items of one shard in the current process until it is interrupted.
+
+        Args:
+            shard (Tuple[int, int]): Index and count of the shard to learn.
+        """
+        logger.info("Learning shard %d/%d", *shard)
+        # A MongoDB client is not fork-safe, so a client inherited from the parent
+        # process is dropped and the worker connects on its own.
+        LearnQueueRepository.reset_client()
         config = Config()
-        engine = create_engine(config.db.url)
+        engine = create_engine(config.db.url, **config.db.pool_options)
         session_local = sessionmaker(
             autocommit=False, autoflush=False, bind=engine)
-        learn_queue_repository = LearnQueueRepository()
-
-        with ThreadPoolExecutor(max_workers=Learn.max_workers) as executor:
-            futures = []
-            while no_item_count < Learn.max_no_item_count:
-                try:
-                    if len(futures) < Learn.max_workers:
-                        futures.append(
-                            executor.submit(
-                                Learn.process_item, session_local, learn_queue_repository
-                            )
-                        )
-                    else:
-                        for future in as_completed(futures):
-                            item_processed = future.result()
-                            futures.remove(future)
-                            if not item_processed:
-                                no_item_count += 1
-                                logger.debug(
-                                    "No item count: %d/%d", no_item_count, Learn.max_no_item_count)
-                            else:
-                                no_item_count = 0
-                except KeyboardInterrupt:
-                    logger.info("Interrupted by user, shutting down.")
-                    break
-                except RuntimeError as e:
-                    logger.error("Runtime error: %s", str(e), exc_info=True)
-                    time.sleep(5)
-                    no_item_count = 0
-
-            logger.debug("No new learn items for a while, finishing execution.")
+        learn_queue_repository = LearnQueueRepository.from_config(shard=shard)
+        try:
+            Learn.work(session_local, learn_queue_repository, threading.Event(), shard)
+        except KeyboardInterrupt:
+            logger.info("Interrupted by user, shutting down shard %d/%d.", *shard)
+        finally:
+            Learn.flush_touches(session_local, force=True)
+            engine.dispose()
 
     @staticmethod
-    def process_item(session_local, learn_queue_repository) -> bool:
+    def work(session_local, learn_queue_repository, stop: threading.Event,
+             shard: Tuple[int, int] = (0, 1)) -> None:
         """
-        Retrieves and processes a single learn item.
+        Process learn items until stopped, waiting for new items while the queue is empty.
+
+        An idle worker blocks on `LearnQueueRepository.wait_for_items`, which wakes up as
+        soon as an item is pushed when change streams are available. The wait doubles
+        with every empty round up to TELEGRAM_BOT_LEARN_IDLE_MAX_WAIT seconds, so an
+        idle queue costs almost no queries either way.
 
         Args:
             session_local: SQLAlchemy session factory.
             learn_queue_repository: Repository to manage the learn queue.
+            stop (threading.Event): Event which stops the worker when set.
+            shard (Tuple[int, int], optional): Index and count of the shard to learn.
+                Defaults to (0, 1), all chats.
+        """
+        max_idle_wait = Config().bot.learn_idle_max_wait
+        idle_wait = Learn.min_idle_wait
+        while not stop.is_set():
+            try:
+                if Learn.process_item(session_local, shard):
+                    idle_wait = Learn.min_idle_wait
+                    continue
+                Learn.flush_touches(session_local)
+                logger.debug("No learn item found, waiting up to %.1f seconds.", idle_wait)
+                if learn_queue_repository.wait_for_items(idle_wait):
+                    idle_wait = Learn.min_idle_wait
+                else:
+                    idle_wait = min(idle_wait * 2, max_idle_wait)
+            except PyMongoError as e:
+                logger.error("Database error: %s", str(e), exc_info=True)
+                time.sleep(5)
+            except RuntimeError as e:
+                logger.error("Runtime error: %s", str(e), exc_info=True)
+                time.sleep(5)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Unexpected error: %s", str(e), exc_info=True)
+                time.sleep(5)
+
+    @staticmethod
+    def process_item(session_local, shard: Tuple[int, int] = (0, 1)) -> bool:
+        """
+        Retrieves and processes a batch of learn items.
+
+        The learn queue repository is bound to the session of the batch, so the
+        Postgres backend deletes the items in the same transaction that learns them.
+
+        Args:
+            session_local: SQLAlchemy session factory.
+            shard (Tuple[int, int], optional): Index and count of the shard to learn.
+                Defaults to (0, 1), all chats.
 
         Returns:
-            bool: True if an item was processed, False otherwise.
+            bool: True if any item was processed, False otherwise.
         """
         session = session_local()
         try:
-            return Learn.learn(session, learn_queue_repository)
+            return Learn.learn(session, LearnQueueRepository.from_config(session, shard))
         finally:
             session.close()
 
     @staticmethod
-    def learn(session: Session, learn_queue_repository: LearnQueueRepository) -> bool:
+    def learn(session: Session, learn_queue_repository) -> bool:
         """
-        The core method that performs the learning operation on an item.
+        The core method that performs the learning operation on a batch of items.
+
+        After the first items have been claimed, the batch keeps filling for up to
+        TELEGRAM_BOT_LEARN_WINDOW_MS milliseconds, so the repeated trigrams of a busy
+        chat are merged into one delta. The claimed items are learned in one
+        transaction and acknowledged after it has been committed.
+
+        When the database or the queue cannot be reached, the items are retried later
+        by any worker. Any other error is blamed on the items: their failed attempt is
+        recorded, they are claimed again one at a time, and an item which keeps
+        failing is parked after TELEGRAM_BOT_LEARN_MAX_ATTEMPTS attempts instead of
+        failing forever.
 
         Args:
             session (Session): SQLAlchemy session.
-            learn_queue_repository (LearnQueueRepository): Repository to manage the learn queue.
+            learn_queue_repository: Repository to manage the learn queue.
 
         Returns:
-            bool: True if an item was processed, False otherwise.
+            bool: True if any item was processed, False otherwise.
         """
+        config = Config()
+        learn_items: List[LearnItem] = []
         try:
-            learn_item: Optional[LearnItem] = learn_queue_repository.pop()
-            if learn_item:
-                logger.debug("Processing learn item: %s", learn_item)
-                learn_service = LearnService(
-                    learn_item.message, learn_item.chat_id, session)
-                learn_service.learn_pair()
+            learn_items = learn_queue_repository.pop_batch(
+                config.bot.learn_batch_size, config.bot.learn_visibility_timeout)
+            if learn_items:
+                learn_items += Learn._fill_window(
+                    learn_queue_repository, config.bot.learn_batch_size - len(learn_items))
+                logger.debug("Processing %d learn items", len(learn_items))
+                LearnService.learn_batch(
+                    session, [(item.message, item.chat_id) for item in learn_items])
+                learn_queue_repository.ack(learn_items)
                 return True
-            else:
-                logger.debug("No learn item found, sleeping for a short period.")
-                time.sleep(0.1)
-                return False
-        except (SQLAlchemyError, PyMongoError) as e:
+            return False
+        except (OperationalError, InterfaceError, PyMongoError) as e:
+            session.rollback()
             logger.error("Database error: %s", str(e), exc_info=True)
             time.sleep(5)
             return False
+        except Exception as e:  # pylint: disable=broad-except
+            session.rollback()
+            logger.error("Failed to learn %d items: %s", len(learn_items), str(e),
+                         exc_info=True)
+            if not learn_items:
+                time.sleep(5)
+                return False
+            Learn._fail(learn_queue_repository, learn_items, e)
+            return True
+
+    @staticmethod
+    def _fail(learn_queue_repository, learn_items: List[LearnItem], error: Exception) -> None:
+        """
+        Record a failed attempt to learn the items, parking the ones which have failed
+        too many times.
+
+        Args:
+            learn_queue_repository: Repository to manage the learn queue.
+            learn_items (List[LearnItem]): The items which could not be learned.
+            error (Exception): The error of the attempt.
+        """
+        max_attempts = Config().bot.learn_max_attempts
+        try:
+            parked = learn_queue_repository.fail(learn_items, max_attempts, repr(error))
+        except (SQLAlchemyError, PyMongoError) as e:
+            logger.error("Failed to record the failed learn items: %s", str(e), exc_info=True)
+            time.sleep(5)
+            return
+        if parked:
+            logger.warning("Parked %d learn items which failed %d times", parked, max_attempts)
+
+    @staticmethod
+    def flush_touches(session_local, force: bool = False) -> None:
+        """
+        Write the pair touches buffered by the learned batches, so an idle or stopping
+        worker does not keep them.
+
+        Args:
+            session_local: SQLAlchemy session factory.
+            force (bool, optional): Flush even if the flush interval has not passed.
+                Defaults to False.
+        """
+        session = session_local()
+        try:
+            touch_buffer = TouchBuffer.shared()
+            if force:
+                touch_buffer.flush(session)
+            else:
+                touch_buffer.flush_if_due(session)
+        except SQLAlchemyError as e:
+            logger.error("Database error: %s", str(e), exc_info=True)
+        finally:
+            session.close()
+
+    @staticmethod
+    def _fill_window(learn_queue_repository, size: int) -> List[LearnItem]:
+        """
+        Claim more items until the learn window closes or `size` items have been claimed.
+
+        Args:
+            learn_queue_repository: Repository to manage the learn queue.
+            size (int): Maximum number of additional items to claim.
+
+        Returns:
+            List[LearnItem]: The additionally claimed items.
+        """
+        config = Config()
+        deadline = time.monotonic() + config.bot.learn_window_ms / 1000
+        learn_items: List[LearnItem] = []
+        while len(learn_items) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            claimed = learn_queue_repository.pop_batch(
+                size - len(learn_items), config.bot.learn_visibility_timeout)
+            if claimed:
+                learn_items += claimed
+            else:
+                learn_queue_repository.wait_for_items(min(remaining, Learn.min_idle_wait))
+        return learn_items
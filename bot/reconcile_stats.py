@@ -0,0 +1,64 @@
+"""
+This module contains the ReconcileStats class, which recomputes the statistics of
+every chat from its pairs and replies.
+
+Learning and the pairs cleanup change the statistics by deltas, which drift when a
+delta is lost or counted twice, e.g. when a chat is changed by hand, when concurrent
+learners add the same new word, or when the legacy learner's delta is committed
+after its pairs. Reconciling regularly keeps the drift small. The recomputation counts
+the pairs of one chat at a time, every chat in its own short transaction, and a
+chat which fails is skipped so the others are still reconciled.
+"""
+
+import time
+import logging
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from core.repositories.chat_repository import ChatRepository
+from core.repositories.chat_stats_repository import ChatStatsRepository
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ReconcileStats:
+    """Class for recomputing the statistics of the chats."""
+
+    @staticmethod
+    def run(session: Session) -> int:
+        """
+        Recompute the statistics of every chat.
+
+        Args:
+            session (Session): SQLAlchemy session object.
+
+        Returns:
+            int: Number of chats whose statistics had drifted.
+        """
+        stats_repo = ChatStatsRepository()
+        started = time.monotonic()
+        chats = 0
+        drifted = 0
+        failed = 0
+        try:
+            chat_ids = ChatRepository().get_ids(session)
+        except SQLAlchemyError as e:
+            session.rollback()
+            logger.error("Database error occurred while listing the chats: %s",
+                         e, exc_info=True)
+            return 0
+        for chat_id in chat_ids:
+            try:
+                if stats_repo.reconcile(session, chat_id):
+                    drifted += 1
+                chats += 1
+            except SQLAlchemyError as e:
+                session.rollback()
+                failed += 1
+                logger.error("Database error occurred while reconciling the stats of "
+                             "chat %d: %s", chat_id, e, exc_info=True)
+        logger.info("Reconciled the stats of %d chats in %.1f s, %d had drifted, %d failed",
+                    chats, time.monotonic() - started, drifted, failed)
+        return drifted
@@ -6,13 +6,17 @@ and defines the Router class responsible for processing incoming updates and rou
 to the appropriate handlers.
 """
 
+import asyncio
 import logging
 from typing import Optional, Type, Union, Callable
 from telegram import Document, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
 from telegram.error import TelegramError
-from sqlalchemy.exc import OperationalError
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from core.caches.context_cache import ContextCache
+from core.caches.touch_buffer import TouchBuffer
+from bot.background_learn import BackgroundLearn
 from bot.handlers.generic_handler import GenericHandler
 from bot.handlers import (
     cool_story_handler, get_gab_handler,
@@ -28,12 +32,59 @@ logging.basicConfig(level=logging.DEBUG,
 class Router:
     """Router class for handling Telegram bot commands and messages."""
 
-    def __init__(self, config: Config, session: Session):
-        self.application = Application.builder().token(config.bot.token).build()
-        self.session = session
+    def __init__(self, config: Config, session_factory: async_sessionmaker):
+        """
+        Initialize the Router.
+
+        Every update is handled in its own short-lived session taken from the
+        session factory, so updates can be processed concurrently and no identity
+        map outlives the update it was created for.
+
+        Args:
+            config (Config): The configuration object.
+            session_factory (async_sessionmaker): Factory of asyncio database sessions.
+        """
+        self.application = (
+            Application.builder()
+            .token(config.bot.token)
+            .concurrent_updates(config.bot.concurrent_updates)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
+        self.session_factory = session_factory
         self.config = config
+        self.context_cache = ContextCache.shared()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.background_learn = (
+            BackgroundLearn(session_factory, config.bot.learn_buffer_size,
+                            config.bot.learn_batch_size)
+            if config.bot.learn_mode == "background" else None
+        )
         self._add_handlers()
 
+    async def _post_init(self, _: Application):
+        """Start the background tasks of the bot once it is initialized."""
+        self._flush_task = asyncio.ensure_future(self.context_cache.flush_periodically())
+        if self.background_learn:
+            self.background_learn.start()
+
+    async def _post_shutdown(self, _: Application):
+        """
+        Stop the background tasks, learning the queued messages and writing the contexts
+        and the buffered pair touches.
+        """
+        if self.background_learn:
+            await self.background_learn.stop()
+        if self._flush_task:
+            self._flush_task.cancel()
+        await asyncio.get_event_loop().run_in_executor(None, self.context_cache.flush)
+        try:
+            async with self.session_factory() as session:
+                await session.run_sync(TouchBuffer.shared().flush)
+        except SQLAlchemyError as e:
+            logger.error("Failed to flush pair touches: %s", e)
+
     def _add_handlers(self):
         """Add command and message handlers to the bot application."""
         command_handlers = {
@@ -77,13 +128,14 @@ class Router:
                               document: Optional[Document] = None):
         """Handle commands using the specified handler class."""
         logger.debug("Handling %s command", handler_class.__name__)
-        handler = (
-            handler_class(update, self.session, self.config,
-                          document)  # type: ignore
-            if handler_class == import_history_handler.ImportHistoryHandler
-            else handler_class(update, self.session, self.config)
-        )
-        response = await handler.call()
+        async with self.session_factory() as session:
+            handler = (
+                handler_class(update, session, self.config,
+                              document)  # type: ignore
+                if handler_class == import_history_handler.ImportHistoryHandler
+                else handler_class(update, session, self.config)
+            )
+            response = await handler.call()
         msg = update.message
         if response and msg:
             await self._send_response(
@@ -104,9 +156,10 @@ class Router:
         if msg and args:
             try:
                 level = int(args[0])
-                handler = set_gab_handler.SetGabHandler(
-                    update, self.session, self.config)
-                response = await handler.call(level)
+                async with self.session_factory() as session:
+                    handler = set_gab_handler.SetGabHandler(
+                        update, session, self.config)
+                    response = await handler.call(level)
                 if response:
                     await self._send_response(context, msg.chat_id, response)
             except (IndexError, ValueError):
@@ -116,9 +169,10 @@ class Router:
     async def handle_message(self, update: Update, context: CallbackContext):
         """Handle incoming messages."""
         logger.debug("Handling incoming message")
-        handler = message_handler.MessageHandler(
-            update, self.session, self.config)
-        response = await handler.call()
+        async with self.session_factory() as session:
+            handler = message_handler.MessageHandler(
+                update, session, self.config, self.background_learn)
+            response = await handler.call()
         msg = update.message
         if msg:
             try:
@@ -21,46 +21,130 @@ class DatabaseConfig:
     """Configuration class for the database."""
 
     def __init__(self, engine: str, host: str, name: str, port: int,
-                 user: str, password: str):
+                 user: str, password: str, pool_size: int = 5,
+                 max_overflow: int = 10, pool_pre_ping: bool = True):
         self.engine = engine
         self.host = host
         self.name = name
         self.port = port
         self.user = user
         self.password = password
-        logger.debug("DatabaseConfig initialized: %s", self.url)
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_pre_ping = pool_pre_ping
+        logger.debug(
+            "DatabaseConfig initialized: %s, pool_size=%d, max_overflow=%d, pool_pre_ping=%s",
+            self.url, self.pool_size, self.max_overflow, self.pool_pre_ping)
 
     @property
     def url(self):
         """Construct the database URL from the given components."""
         return f"{self.engine}://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
 
+    @property
+    def async_url(self):
+        """Construct the database URL for the asyncio driver from the given components."""
+        dialect = self.engine.split('+')[0]
+        return (f"{dialect}+asyncpg://{self.user}:{self.password}@"
+                f"{self.host}:{self.port}/{self.name}")
+
+    @property
+    def pool_options(self):
+        """Connection pool arguments for the database engines."""
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_pre_ping": self.pool_pre_ping
+        }
+
 
 class CacheConfig:
     """Configuration class for the cache."""
 
     def __init__(self, host: str = 'mongo', port: int = 27017,
-                 name: str = 'cache'):
+                 name: str = 'cache', max_pool_size: int = 100,
+                 min_pool_size: int = 0, max_idle_time_ms: int = 0):
         self.host = host
         self.port = port
         self.name = name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.max_idle_time_ms = max_idle_time_ms
         logger.debug(
-            "CacheConfig initialized: host=%s, port=%d, name=%s", self.host, self.port, self.name)
+            "CacheConfig initialized: host=%s, port=%d, name=%s, max_pool_size=%d, "
+            "min_pool_size=%d, max_idle_time_ms=%d", self.host, self.port, self.name,
+            self.max_pool_size, self.min_pool_size, self.max_idle_time_ms)
+
+    @property
+    def pool_options(self):
+        """Connection pool arguments for the MongoDB clients."""
+        return {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxIdleTimeMS": self.max_idle_time_ms or None
+        }
 
 
 class BotConfig:
     """Configuration class for the bot."""
 
     def __init__(self, token: str, name: str, anchors: List[str],
-                 async_learn: bool = False, cleanup_limit: int = 1000):
+                 async_learn: bool = False, cleanup_limit: int = 1000,
+                 bulk_learn: bool = False, word_cache_size: int = 100000,
+                 story_engine: str = 'db', story_model_budget: int = 1000000,
+                 story_model_ttl: int = 3600, concurrent_updates: int = 8,
+                 chat_cache_ttl: int = 300, context_cache_size: int = 10000,
+                 context_flush_interval: int = 5, learn_batch_size: int = 100,
+                 learn_visibility_timeout: int = 300, learn_idle_max_wait: int = 10,
+                 learn_max_attempts: int = 5, learn_queue_backend: str = 'mongo',
+                 learn_mode: str = '', learn_buffer_size: int = 1000, learn_window_ms: int = 1000,
+                 cleanup_interval: int = 3600, cleanup_rate: int = 0,
+                 cleanup_retention_days: int = 90, touch_granularity: int = 86400,
+                 touch_flush_interval: int = 60):
         self.token = token
         self.name = name
         self.anchors = anchors
         self.async_learn = async_learn
         self.cleanup_limit = cleanup_limit
+        self.bulk_learn = bulk_learn
+        self.word_cache_size = word_cache_size
+        self.story_engine = story_engine
+        self.story_model_budget = story_model_budget
+        self.story_model_ttl = story_model_ttl
+        self.concurrent_updates = concurrent_updates
+        self.chat_cache_ttl = chat_cache_ttl
+        self.context_cache_size = context_cache_size
+        self.context_flush_interval = context_flush_interval
+        self.learn_batch_size = learn_batch_size
+        self.learn_visibility_timeout = learn_visibility_timeout
+        self.learn_idle_max_wait = learn_idle_max_wait
+        self.learn_max_attempts = learn_max_attempts
+        self.learn_queue_backend = learn_queue_backend
+        self.learn_mode = learn_mode or ('queue' if async_learn else 'sync')
+        self.learn_buffer_size = learn_buffer_size
+        self.learn_window_ms = learn_window_ms
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_rate = cleanup_rate
+        self.cleanup_retention_days = cleanup_retention_days
+        self.touch_granularity = touch_granularity
+        self.touch_flush_interval = touch_flush_interval
         logger.debug(
-            "BotConfig initialized: name=%s, async_learn=%s, cleanup_limit=%d",
-            self.name, self.async_learn, self.cleanup_limit)
+            "BotConfig initialized: name=%s, async_learn=%s, cleanup_limit=%d, bulk_learn=%s, "
+            "word_cache_size=%d, story_engine=%s, story_model_budget=%d, story_model_ttl=%d, "
+            "concurrent_updates=%d, chat_cache_ttl=%d, context_cache_size=%d, "
+            "context_flush_interval=%d, learn_batch_size=%d, learn_visibility_timeout=%d, "
+            "learn_idle_max_wait=%d, learn_max_attempts=%d, learn_queue_backend=%s, "
+            "learn_mode=%s, learn_buffer_size=%d, learn_window_ms=%d, cleanup_interval=%d, "
+            "cleanup_rate=%d, "
+            "cleanup_retention_days=%d, touch_granularity=%d, touch_flush_interval=%d",
+            self.name, self.async_learn, self.cleanup_limit, self.bulk_learn,
+            self.word_cache_size, self.story_engine, self.story_model_budget,
+            self.story_model_ttl, self.concurrent_updates, self.chat_cache_ttl,
+            self.context_cache_size, self.context_flush_interval, self.learn_batch_size,
+            self.learn_visibility_timeout, self.learn_idle_max_wait, self.learn_max_attempts,
+            self.learn_queue_backend, self.learn_mode, self.learn_buffer_size, self.learn_window_ms,
+            self.cleanup_interval, self.cleanup_rate, self.cleanup_retention_days,
+            self.touch_granularity, self.touch_flush_interval)
 
 class Config:
     """Singleton configuration class that loads environment variables."""
@@ -86,19 +170,47 @@ class Config:
             name=self.get_str('DATABASE_NAME'),
             port=self.get_int('DATABASE_PORT'),
             user=self.get_str('DATABASE_USER'),
-            password=self.get_str('DATABASE_PASSWORD')
+            password=self.get_str('DATABASE_PASSWORD'),
+            pool_size=self.get_int('DATABASE_POOL_SIZE', 5),
+            max_overflow=self.get_int('DATABASE_MAX_OVERFLOW', 10),
+            pool_pre_ping=self.get_boolean('DATABASE_POOL_PRE_PING', True)
         )
         self.cache = CacheConfig(
             host=self.get_str('CACHE_HOST'),
             port=self.get_int('CACHE_PORT'),
-            name=self.get_str('CACHE_NAME')
+            name=self.get_str('CACHE_NAME'),
+            max_pool_size=self.get_int('CACHE_MAX_POOL_SIZE', 100),
+            min_pool_size=self.get_int('CACHE_MIN_POOL_SIZE', 0),
+            max_idle_time_ms=self.get_int('CACHE_MAX_IDLE_TIME_MS', 0)
         )
         self.bot = BotConfig(
             token=self.get_str('TELEGRAM_BOT_TOKEN'),
             name=self.get_str('TELEGRAM_BOT_NAME'),
             anchors=self.get_str_list('TELEGRAM_BOT_ANCHORS'),
             async_learn=self.get_boolean('TELEGRAM_BOT_ASYNC_LEARN'),
-            cleanup_limit=self.get_int('TELEGRAM_BOT_CLEANUP_LIMIT')
+            cleanup_limit=self.get_int('TELEGRAM_BOT_CLEANUP_LIMIT', 1000),
+            bulk_learn=self.get_boolean('TELEGRAM_BOT_BULK_LEARN'),
+            word_cache_size=self.get_int('TELEGRAM_BOT_WORD_CACHE_SIZE', 100000),
+            story_engine=self.get_str('TELEGRAM_BOT_STORY_ENGINE') or 'db',
+            story_model_budget=self.get_int('TELEGRAM_BOT_STORY_MODEL_BUDGET', 1000000),
+            story_model_ttl=self.get_int('TELEGRAM_BOT_STORY_MODEL_TTL', 3600),
+            concurrent_updates=self.get_int('TELEGRAM_BOT_CONCURRENT_UPDATES', 8),
+            chat_cache_ttl=self.get_int('TELEGRAM_BOT_CHAT_CACHE_TTL', 300),
+            context_cache_size=self.get_int('TELEGRAM_BOT_CONTEXT_CACHE_SIZE', 10000),
+            context_flush_interval=self.get_int('TELEGRAM_BOT_CONTEXT_FLUSH_INTERVAL', 5),
+            learn_batch_size=self.get_int('TELEGRAM_BOT_LEARN_BATCH_SIZE', 100),
+            learn_visibility_timeout=self.get_int('TELEGRAM_BOT_LEARN_VISIBILITY_TIMEOUT', 300),
+            learn_idle_max_wait=self.get_int('TELEGRAM_BOT_LEARN_IDLE_MAX_WAIT', 10),
+            learn_max_attempts=self.get_int('TELEGRAM_BOT_LEARN_MAX_ATTEMPTS', 5),
+            learn_queue_backend=self.get_str('TELEGRAM_BOT_LEARN_QUEUE_BACKEND') or 'mongo',
+            learn_mode=self.get_str('TELEGRAM_BOT_LEARN_MODE'),
+            learn_buffer_size=self.get_int('TELEGRAM_BOT_LEARN_BUFFER_SIZE', 1000),
+            learn_window_ms=self.get_int('TELEGRAM_BOT_LEARN_WINDOW_MS', 1000),
+            cleanup_interval=self.get_int('TELEGRAM_BOT_CLEANUP_INTERVAL', 3600),
+            cleanup_rate=self.get_int('TELEGRAM_BOT_CLEANUP_RATE', 0),
+            cleanup_retention_days=self.get_int('TELEGRAM_BOT_CLEANUP_RETENTION_DAYS', 90),
+            touch_granularity=self.get_int('TELEGRAM_BOT_TOUCH_GRANULARITY', 86400),
+            touch_flush_interval=self.get_int('TELEGRAM_BOT_TOUCH_FLUSH_INTERVAL', 60)
         )
         self.end_sentence = self.get_str_list('PUNCTUATION_END_SENTENCE')
         logger.debug("Config initialization complete")
@@ -119,7 +231,7 @@ class Config:
             return True
         return False
 
-    def get_boolean(self, key: str) -> bool:
+    def get_boolean(self, key: str, default: bool = False) -> bool:
         """Get a boolean value from environment variables."""
         value = os.getenv(key, '')
         if not self.is_empty(key, value):
@@ -129,10 +241,10 @@ class Config:
                 return result
             except (SyntaxError, ValueError):
                 logger.error("Error parsing boolean value for key: '%s'", key)
-                return False
-        return False
+                return default
+        return default
 
-    def get_int(self, key: str) -> int:
+    def get_int(self, key: str, default: int = 0) -> int:
         """Get an integer value from environment variables."""
         value = os.getenv(key, '')
         if not self.is_empty(key, value):
@@ -143,8 +255,8 @@ class Config:
             except ValueError:
                 logger.error(
                     "Error: '%s' in '%s' is not a valid integer and will be ignored", value, key)
-                return 0
-        return 0
+                return default
+        return default
 
     def get_str(self, key: str) -> str:
         """Get a string value from environment variables."""
@@ -0,0 +1,127 @@
+"""
+This module provides the ChatCache class, a process-wide time-limited cache of chat
+rows keyed by their Telegram IDs.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from core.entities.chat_entity import Chat
+
+CHAT_COLUMNS = ("id", "telegram_id", "chat_type", "random_chance", "created_at",
+                "updated_at", "name", "repost_chat_username")
+
+
+def copy_chat(chat: Chat) -> Chat:
+    """
+    Copy the column values of a chat into a new transient Chat entity.
+
+    Args:
+        chat (Chat): The chat to copy.
+
+    Returns:
+        Chat: A Chat entity which is not attached to any session.
+    """
+    return Chat(**{column: getattr(chat, column) for column in CHAT_COLUMNS})
+
+
+class ChatCache:
+    """
+    Thread-safe cache of chat snapshots which expire after a fixed number of seconds.
+
+    The cache holds transient copies of the chats and hands out new copies, so the
+    cached values are never shared with a session or modified by a caller.
+    """
+
+    def __init__(self, ttl: int = 300, max_size: int = 10000):
+        """
+        Initialize the ChatCache.
+
+        Args:
+            ttl (int, optional): Number of seconds a chat is kept. Defaults to 300.
+            max_size (int, optional): Maximum number of cached chats. Defaults to 10000.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._chats: Dict[int, Tuple[float, Chat]] = {}
+        self._telegram_ids: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, telegram_id: int) -> Optional[Chat]:
+        """
+        Get a copy of the cached chat with the given Telegram ID.
+
+        Args:
+            telegram_id (int): Telegram ID of the chat.
+
+        Returns:
+            Optional[Chat]: The chat, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._chats.get(telegram_id)
+            if entry is None:
+                return None
+            expires_at, chat = entry
+            if expires_at <= time.monotonic():
+                self._pop(telegram_id)
+                return None
+            return copy_chat(chat)
+
+    def put(self, chat: Chat) -> None:
+        """
+        Cache a copy of a chat.
+
+        Args:
+            chat (Chat): The chat to cache.
+        """
+        snapshot = copy_chat(chat)
+        with self._lock:
+            self._pop_chat(snapshot.id)
+            if len(self._chats) >= self.max_size:
+                self._purge()
+            self._chats[snapshot.telegram_id] = (time.monotonic() + self.ttl, snapshot)
+            self._telegram_ids[snapshot.id] = snapshot.telegram_id
+
+    def invalidate(self, chat_id: int) -> None:
+        """
+        Remove the chat with the given ID from the cache.
+
+        Args:
+            chat_id (int): ID of the chat.
+        """
+        with self._lock:
+            self._pop_chat(chat_id)
+
+    def _pop(self, telegram_id: int) -> None:
+        """
+        Remove the chat with the given Telegram ID from the cache.
+
+        Args:
+            telegram_id (int): Telegram ID of the chat.
+        """
+        entry = self._chats.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[1].id, None)
+
+    def _pop_chat(self, chat_id: int) -> None:
+        """
+        Remove the chat with the given ID from the cache.
+
+        Args:
+            chat_id (int): ID of the chat.
+        """
+        telegram_id = self._telegram_ids.get(chat_id)
+        if telegram_id is not None:
+            self._pop(telegram_id)
+
+    def _purge(self) -> None:
+        """
+        Remove the expired chats, and the oldest ones if the cache is still full.
+        """
+        now = time.monotonic()
+        for telegram_id in [telegram_id for telegram_id, (expires_at, _)
+                            in self._chats.items() if expires_at <= now]:
+            self._pop(telegram_id)
+        while len(self._chats) >= self.max_size:
+            self._pop(next(iter(self._chats)))
@@ -0,0 +1,190 @@
+"""
+This module provides the ContextCache class, a write-behind in-process store of chat
+contexts.
+
+The bot process is the only writer of the contexts of its chats, so the contexts are
+read from MongoDB once, kept in a bounded LRU and changed in memory. Changed contexts
+are written back in batches by `flush`, which the bot runs on a timer and at shutdown.
+Handlers `load` a context before using it, so a miss is read from MongoDB in an
+executor instead of blocking the event loop.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from pymongo.errors import PyMongoError
+
+from core.repositories.context_repository import ContextRepository
+from config import Config
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ContextCache:
+    """
+    Thread-safe LRU of chat contexts with batched write-back of the changed ones.
+
+    Contexts evicted before they have been flushed are kept aside until the next
+    flush, so no update is lost when the cache is full.
+    """
+
+    _shared: Optional["ContextCache"] = None
+
+    def __init__(self, repository: ContextRepository, max_size: int = 10000,
+                 flush_interval: int = 5):
+        """
+        Initialize the ContextCache.
+
+        Args:
+            repository (ContextRepository): Repository the contexts are loaded from and
+                written to.
+            max_size (int, optional): Maximum number of cached contexts. Defaults to 10000.
+            flush_interval (int, optional): Number of seconds between two flushes of the
+                changed contexts. Defaults to 5.
+        """
+        self.repository = repository
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._contexts: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._dirty: Dict[str, List[str]] = {}
+        self._flushing: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "ContextCache":
+        """
+        Get the process-wide ContextCache configured from the application config.
+
+        Returns:
+            ContextCache: The shared cache.
+        """
+        if cls._shared is None:
+            config = Config()
+            repository = ContextRepository(
+                host=config.cache.host,
+                port=config.cache.port,
+                database_name=config.cache.name
+            )
+            cls._shared = cls(repository, config.bot.context_cache_size,
+                              config.bot.context_flush_interval)
+        return cls._shared
+
+    async def load(self, path: str) -> None:
+        """
+        Make sure the context of a path is cached, reading it from MongoDB in the default
+        executor on a miss, so the event loop is not blocked.
+
+        Args:
+            path (str): The unique identifier for the context.
+        """
+        with self._lock:
+            if path in self._contexts:
+                return
+        await asyncio.get_event_loop().run_in_executor(None, self._get, path)
+
+    def get_context(self, path: str, limit: int = 50) -> List[str]:
+        """
+        Retrieve the context words for a given path, loading them on first use.
+
+        Args:
+            path (str): The unique identifier for the context.
+            limit (int, optional): Maximum number of words to retrieve. Defaults to 50.
+
+        Returns:
+            List[str]: List of words in the context, newest first.
+        """
+        return self._get(path)[:limit]
+
+    def update_context(self, path: str, words: List[str]) -> None:
+        """
+        Add new words to the context for a given path and mark it for the next flush.
+
+        Args:
+            path (str): The unique identifier for the context.
+            words (List[str]): List of new words to add to the context.
+        """
+        context = self._get(path)
+        with self._lock:
+            context = ContextRepository.merge_words(
+                self._contexts.get(path, context), words)
+            self._put(path, context)
+            self._dirty[path] = context
+
+    def flush(self) -> int:
+        """
+        Write the changed contexts back to MongoDB with a single bulk write.
+
+        Returns:
+            int: Number of contexts written.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flushing = dirty
+        if not dirty:
+            return 0
+        try:
+            self.repository.save_contexts(dirty)
+        except PyMongoError:
+            with self._lock:
+                for path, context in dirty.items():
+                    self._dirty.setdefault(path, context)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+        logger.debug("Flushed %d chat contexts", len(dirty))
+        return len(dirty)
+
+    async def flush_periodically(self) -> None:
+        """
+        Flush the changed contexts every `flush_interval` seconds until cancelled.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except PyMongoError as e:
+                logger.error("Failed to flush chat contexts: %s", e)
+
+    def _get(self, path: str) -> List[str]:
+        """
+        Get the cached context for a given path, loading it from MongoDB on a miss.
+
+        Args:
+            path (str): The unique identifier for the context.
+
+        Returns:
+            List[str]: List of words in the context, newest first.
+        """
+        with self._lock:
+            context = self._contexts.get(path)
+            if context is None:
+                context = self._dirty.get(path, self._flushing.get(path))
+            if context is not None:
+                self._put(path, context)
+                return context
+
+        context = self.repository.get_context(path)
+        with self._lock:
+            context = self._contexts.get(path, context)
+            self._put(path, context)
+        return context
+
+    def _put(self, path: str, context: List[str]) -> None:
+        """
+        Store a context as the most recently used one, evicting the least recently used.
+
+        Args:
+            path (str): The unique identifier for the context.
+            context (List[str]): List of words in the context.
+        """
+        self._contexts[path] = context
+        self._contexts.move_to_end(path)
+        while len(self._contexts) > self.max_size:
+            self._contexts.popitem(last=False)
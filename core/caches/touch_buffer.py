@@ -0,0 +1,137 @@
+"""
+This module provides the TouchBuffer class, a write-behind buffer of the pairs whose
+updated_at timestamp has to be refreshed after learning.
+
+The timestamp only keeps a pair from being removed by the cleanup, which keeps pairs
+for days, so it does not have to be exact. A pair is buffered at most once per
+`granularity` seconds, and the buffered pairs are written by one bulk update every
+`flush_interval` seconds, which also skips the rows touched within the granularity
+by other processes. A busy pair therefore gets about one new row version per day
+instead of one per message.
+"""
+
+import logging
+import threading
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from core.repositories.pair_repository import PairRepository
+from config import Config
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TouchBuffer:
+    """
+    Thread-safe buffer of the (chat_id, pair_id) keys of the pairs to touch.
+
+    The keys buffered during the current period of `granularity` seconds are
+    remembered, so a pair learned again in the same period is not buffered again.
+    """
+
+    _shared: Optional["TouchBuffer"] = None
+
+    def __init__(self, granularity: int = 86400, flush_interval: int = 60,
+                 max_size: int = 1000000):
+        """
+        Initialize the TouchBuffer.
+
+        Args:
+            granularity (int, optional): Number of seconds within which a pair is
+                touched at most once. Defaults to 86400.
+            flush_interval (int, optional): Number of seconds between two flushes of
+                the buffered pairs. Defaults to 60.
+            max_size (int, optional): Maximum number of remembered pairs, beyond which
+                they are forgotten and may be touched again. Defaults to 1000000.
+        """
+        self.granularity = granularity
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._period: Optional[int] = None
+        self._touched: Set[Tuple[int, int]] = set()
+        self._pending: Set[Tuple[int, int]] = set()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "TouchBuffer":
+        """
+        Get the process-wide TouchBuffer configured from the application config.
+
+        Returns:
+            TouchBuffer: The shared buffer.
+        """
+        if cls._shared is None:
+            config = Config()
+            cls._shared = cls(config.bot.touch_granularity, config.bot.touch_flush_interval)
+        return cls._shared
+
+    def add(self, chat_id: int, pair_ids: Iterable[int]) -> None:
+        """
+        Buffer the pairs of a chat which have just been learned.
+
+        Args:
+            chat_id (int): Chat ID of the pairs.
+            pair_ids (Iterable[int]): IDs of the learned pairs.
+        """
+        with self._lock:
+            if self.granularity > 0:
+                period = int(time.time() // self.granularity)
+                if period != self._period or len(self._touched) > self.max_size:
+                    self._period = period
+                    self._touched = set()
+            for pair_id in pair_ids:
+                key = (chat_id, pair_id)
+                if key not in self._touched:
+                    self._pending.add(key)
+                    if self.granularity > 0:
+                        self._touched.add(key)
+
+    def flush(self, session: Session) -> int:
+        """
+        Touch the buffered pairs with a single bulk update and commit.
+
+        Args:
+            session (Session): SQLAlchemy session.
+
+        Returns:
+            int: Number of updated pairs.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            count = PairRepository().touch_many(session, pending, True, self.granularity)
+        except SQLAlchemyError:
+            session.rollback()
+            with self._lock:
+                self._pending |= pending
+            raise
+        logger.debug("Flushed %d pair touches, %d pairs updated", len(pending), count)
+        return count
+
+    def flush_if_due(self, session: Session) -> int:
+        """
+        Flush the buffered pairs if `flush_interval` seconds have passed since the last
+        flush. Errors are logged, the pairs are then flushed with the next attempt.
+
+        Args:
+            session (Session): SQLAlchemy session.
+
+        Returns:
+            int: Number of updated pairs.
+        """
+        if time.monotonic() - self._flushed_at < self.flush_interval:
+            return 0
+        try:
+            return self.flush(session)
+        except SQLAlchemyError as e:
+            logger.error("Failed to flush pair touches: %s", e)
+            return 0
@@ -0,0 +1,370 @@
+"""
+This module provides the in-memory trigram models used for story generation.
+
+A TrigramModel holds the pairs, reply counts and word texts of one chat, so a story
+can be generated without querying the database. The TrigramModelCache loads the
+models on first use, keeps them current as new trigrams are learned, and evicts
+the least recently used chats to stay within its memory budget.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from core.repositories.pair_repository import PairRepository
+from config import Config
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+PairKey = Tuple[Optional[int], Optional[int]]
+Update = Tuple[Dict[PairKey, int], Dict[Tuple[int, Optional[int]], int], Dict[str, int]]
+
+
+class ModelPair(NamedTuple):
+    """A pair of the trigram model, mirroring the attributes of the Pair entity."""
+    id: int
+    first_id: Optional[int]
+    second_id: Optional[int]
+
+
+class ModelReply(NamedTuple):
+    """A reply of the trigram model, mirroring the attributes of the Reply entity."""
+    word_id: Optional[int]
+    count: int
+
+
+class _PairNode:
+    """Pair of the trigram model together with its reply counts."""
+
+    __slots__ = ("pair", "created_at", "replies")
+
+    def __init__(self, pair: ModelPair, created_at: datetime):
+        self.pair = pair
+        self.created_at = created_at
+        self.replies: Dict[Optional[int], int] = {}
+
+
+class TrigramModel:
+    """
+    In-memory pairs, replies and words of a single chat.
+    """
+
+    def __init__(self, chat_id: int):
+        """
+        Initialize an empty TrigramModel.
+
+        Args:
+            chat_id (int): Chat ID of the model.
+        """
+        self.chat_id = chat_id
+        self.loaded_at = time.monotonic()
+        self._pairs: Dict[PairKey, _PairNode] = {}
+        self._pairs_by_id: Dict[int, _PairNode] = {}
+        self._words: Dict[int, str] = {}
+        self._word_ids: Dict[str, int] = {}
+        self.size = 0
+
+    def add(self, pair_id: int, first_id: Optional[int], second_id: Optional[int],
+            created_at: datetime, reply_word_id: Optional[int], count: int) -> None:
+        """
+        Add reply occurrences of a pair, creating the pair if it is not known yet.
+
+        Args:
+            pair_id (int): The pair ID.
+            first_id (Optional[int]): The first word ID of the pair.
+            second_id (Optional[int]): The second word ID of the pair.
+            created_at (datetime): Timestamp when the pair was created.
+            reply_word_id (Optional[int]): The word ID of the reply.
+            count (int): Number of occurrences to add.
+        """
+        node = self._pairs_by_id.get(pair_id)
+        if node is None:
+            node = _PairNode(ModelPair(pair_id, first_id, second_id), created_at)
+            self._pairs.setdefault((first_id, second_id), node)
+            self._pairs_by_id[pair_id] = node
+            self.size += 1
+        if reply_word_id not in node.replies:
+            node.replies[reply_word_id] = 0
+            self.size += 1
+        node.replies[reply_word_id] += count
+
+    def add_words(self, words: Dict[int, str]) -> None:
+        """
+        Add word texts to the model.
+
+        Args:
+            words (Dict[int, str]): Mapping of word IDs to words.
+        """
+        for word_id, word in words.items():
+            if word_id not in self._words:
+                self._words[word_id] = word
+                self._word_ids[word] = word_id
+                self.size += 1
+
+    def get_pairs(self, first_id: Optional[int],
+                  second_ids: List[Optional[int]]) -> List[ModelPair]:
+        """
+        Get up to 3 pairs with replies which are older than 10 minutes, following the same
+        rules as `PairRepository.get_pair_with_replies`.
+
+        Args:
+            first_id (Optional[int]): First word ID of the pairs.
+            second_ids (List[Optional[int]]): Candidate second word IDs of the pairs.
+
+        Returns:
+            List[ModelPair]: The matching pairs.
+        """
+        time_offset = datetime.now() - timedelta(minutes=10)
+        pairs = []
+        for second_id in dict.fromkeys(second_ids):
+            if second_id is None:
+                continue
+            node = self._pairs.get((first_id, second_id))
+            if node and node.replies and node.created_at < time_offset:
+                pairs.append(node.pair)
+                if len(pairs) == 3:
+                    break
+        return pairs
+
+    def get_replies(self, pair_id: int) -> List[ModelReply]:
+        """
+        Get the top 3 replies of a pair, ordered by count in descending order.
+
+        Args:
+            pair_id (int): The pair ID.
+
+        Returns:
+            List[ModelReply]: The top replies of the pair.
+        """
+        node = self._pairs_by_id.get(pair_id)
+        if node is None:
+            return []
+        replies = sorted(node.replies.items(), key=lambda reply: reply[1], reverse=True)
+        return [ModelReply(word_id, count) for word_id, count in replies[:3]]
+
+    def get_word(self, word_id: Optional[int]) -> Optional[str]:
+        """
+        Get the text of a word.
+
+        Args:
+            word_id (Optional[int]): The word ID.
+
+        Returns:
+            Optional[str]: The word, or None if it is unknown.
+        """
+        return self._words.get(word_id) if word_id is not None else None
+
+    def get_word_ids(self, words: List[str]) -> Dict[str, int]:
+        """
+        Get the IDs of the words known to the model.
+
+        Only the words a story can continue with are known, so the other words
+        cannot start a story anyway.
+
+        Args:
+            words (List[str]): The words to look up.
+
+        Returns:
+            Dict[str, int]: Mapping of the known words to their IDs.
+        """
+        return {word: self._word_ids[word] for word in words if word in self._word_ids}
+
+
+class TrigramModelCache:
+    """
+    Process-wide cache of per-chat trigram models bounded by a memory budget.
+
+    The budget is expressed in model entries (pairs, replies and words). Chats whose
+    model alone exceeds the budget are not cached and are reported as unavailable,
+    so the caller can fall back to generating from the database.
+    """
+
+    _shared: Optional["TrigramModelCache"] = None
+
+    def __init__(self, budget: int = 1000000, ttl: int = 3600):
+        """
+        Initialize the TrigramModelCache.
+
+        Args:
+            budget (int, optional): Maximum number of entries kept in memory.
+                Defaults to 1000000.
+            ttl (int, optional): Number of seconds after which a model is reloaded, to pick
+                up trigrams learned by other processes. Defaults to 3600.
+        """
+        self.budget = budget
+        self.ttl = ttl
+        self._models: "OrderedDict[int, TrigramModel]" = OrderedDict()
+        self._oversized: Dict[int, float] = {}
+        self._loading: Dict[int, List[List[Update]]] = {}
+        self._size = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def shared(cls) -> "TrigramModelCache":
+        """
+        Get the process-wide TrigramModelCache configured from the application config.
+
+        Returns:
+            TrigramModelCache: The shared cache.
+        """
+        if cls._shared is None:
+            config = Config()
+            cls._shared = cls(config.bot.story_model_budget, config.bot.story_model_ttl)
+        return cls._shared
+
+    def get(self, session: Session, chat_id: int) -> Optional[TrigramModel]:
+        """
+        Get the model of a chat, loading it from the database on first use.
+
+        The trigrams applied while the model is being loaded are buffered and replayed
+        into it, so they are not missing until the next reload. A trigram committed
+        before the load read it may then be counted twice, which the next reload fixes.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): The chat ID.
+
+        Returns:
+            Optional[TrigramModel]: The model, or None if the chat is too big to be cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            model = self._models.get(chat_id)
+            if model and now - model.loaded_at < self.ttl:
+                self._models.move_to_end(chat_id)
+                return model
+            if now - self._oversized.get(chat_id, -self.ttl) < self.ttl:
+                return None
+            updates: List[Update] = []
+            self._loading.setdefault(chat_id, []).append(updates)
+
+        try:
+            model = self._load(session, chat_id)
+        finally:
+            with self._lock:
+                loading = self._loading[chat_id]
+                loading.remove(updates)
+                if not loading:
+                    del self._loading[chat_id]
+        with self._lock:
+            self._remove(chat_id)
+            if model is None:
+                self._oversized[chat_id] = now
+                return None
+            for pair_ids, reply_counts, word_ids in updates:
+                self._apply(model, pair_ids, reply_counts, word_ids)
+            self._models[chat_id] = model
+            self._size += model.size
+            self._evict()
+        return model
+
+    def apply(self, chat_id: int, pair_ids: Dict[PairKey, int],
+              reply_counts: Dict[Tuple[int, Optional[int]], int],
+              word_ids: Dict[str, int]) -> None:
+        """
+        Apply freshly learned trigrams to the model of a chat, if it is loaded or
+        being loaded.
+
+        Only the words used by the pairs and replies of the chat are added, as
+        `word_ids` may hold the words of a whole batch of chats.
+
+        Args:
+            chat_id (int): The chat ID.
+            pair_ids (Dict[PairKey, int]): Mapping of learned (first_id, second_id) keys
+                to pair IDs.
+            reply_counts (Dict[Tuple[int, Optional[int]], int]): Occurrences of learned
+                (pair_id, word_id) replies.
+            word_ids (Dict[str, int]): Mapping of learned words to their IDs.
+        """
+        with self._lock:
+            for updates in self._loading.get(chat_id, ()):
+                updates.append((pair_ids, reply_counts, word_ids))
+            model = self._models.get(chat_id)
+            if model is None:
+                return
+            size = model.size
+            self._apply(model, pair_ids, reply_counts, word_ids)
+            self._size += model.size - size
+            self._evict()
+
+    @staticmethod
+    def _apply(model: TrigramModel, pair_ids: Dict[PairKey, int],
+               reply_counts: Dict[Tuple[int, Optional[int]], int],
+               word_ids: Dict[str, int]) -> None:
+        """
+        Add learned trigrams and the words they use to a model.
+
+        Args:
+            model (TrigramModel): The model of the chat.
+            pair_ids (Dict[PairKey, int]): Mapping of learned (first_id, second_id) keys
+                to pair IDs.
+            reply_counts (Dict[Tuple[int, Optional[int]], int]): Occurrences of learned
+                (pair_id, word_id) replies.
+            word_ids (Dict[str, int]): Mapping of learned words to their IDs.
+        """
+        keys = {pair_id: key for key, pair_id in pair_ids.items()}
+        now = datetime.now()
+        used = set()
+        for (pair_id, word_id), count in reply_counts.items():
+            first_id, second_id = keys.get(pair_id, (None, None))
+            model.add(pair_id, first_id, second_id, now, word_id, count)
+            used.update((second_id, word_id))
+        model.add_words({word_id: word for word, word_id in word_ids.items()
+                         if word_id in used})
+
+    def _load(self, session: Session, chat_id: int) -> Optional[TrigramModel]:
+        """
+        Load the model of a chat from the database.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): The chat ID.
+
+        Returns:
+            Optional[TrigramModel]: The model, or None if it exceeds the memory budget.
+        """
+        logger.debug("Loading trigram model for chat_id: %d", chat_id)
+        model = TrigramModel(chat_id)
+        for (pair_id, first_id, second_id, created_at, reply_word_id, count,
+             second_word, reply_word) in PairRepository().iter_pairs_with_replies(
+                 session, chat_id):
+            model.add(pair_id, first_id, second_id, created_at, reply_word_id, count)
+            model.add_words({
+                word_id: word
+                for word_id, word in ((second_id, second_word), (reply_word_id, reply_word))
+                if word_id is not None
+            })
+            if model.size > self.budget:
+                logger.info("Trigram model for chat_id: %d exceeds the memory budget", chat_id)
+                return None
+        logger.debug("Loaded trigram model for chat_id: %d with %d entries",
+                     chat_id, model.size)
+        return model
+
+    def _remove(self, chat_id: int) -> None:
+        """
+        Remove the model of a chat from the cache.
+
+        Args:
+            chat_id (int): The chat ID.
+        """
+        model = self._models.pop(chat_id, None)
+        if model:
+            self._size -= model.size
+        self._oversized.pop(chat_id, None)
+
+    def _evict(self) -> None:
+        """
+        Evict the least recently used models until the cache fits its memory budget.
+        """
+        while self._size > self.budget and self._models:
+            chat_id, model = self._models.popitem(last=False)
+            self._size -= model.size
+            logger.debug("Evicted trigram model for chat_id: %d", chat_id)
@@ -0,0 +1,93 @@
+"""
+This module provides the WordCache class, a bounded in-process dictionary of words
+and their IDs shared by learning and story generation.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+class WordCache:
+    """
+    Thread-safe bidirectional word <-> ID mapping with LRU eviction.
+
+    Words are never renamed, so the cached entries never have to be invalidated one by
+    one. They are evicted when the cache grows beyond its maximum size, and the whole
+    cache is cleared when a cached word turns out to have been removed.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        """
+        Initialize the WordCache.
+
+        Args:
+            max_size (int, optional): Maximum number of cached words. Defaults to 100000.
+        """
+        self.max_size = max_size
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._words: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def get_ids(self, words: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the cached IDs of the given words.
+
+        Args:
+            words (Iterable[str]): Words to look up.
+
+        Returns:
+            Dict[str, int]: Mapping of the cached words to their IDs. Missing words are omitted.
+        """
+        found = {}
+        with self._lock:
+            for word in words:
+                word_id = self._ids.get(word)
+                if word_id is not None:
+                    self._ids.move_to_end(word)
+                    found[word] = word_id
+        return found
+
+    def get_word(self, word_id: int) -> Optional[str]:
+        """
+        Get the cached word with the given ID.
+
+        Args:
+            word_id (int): ID of the word.
+
+        Returns:
+            Optional[str]: The word, or None if it is not cached.
+        """
+        with self._lock:
+            word = self._words.get(word_id)
+            if word is not None:
+                self._ids.move_to_end(word)
+            return word
+
+    def put_many(self, word_ids: Dict[str, int]) -> None:
+        """
+        Add words and their IDs to the cache, evicting the least recently used ones.
+
+        Args:
+            word_ids (Dict[str, int]): Mapping of words to their IDs.
+        """
+        with self._lock:
+            for word, word_id in word_ids.items():
+                self._ids[word] = word_id
+                self._ids.move_to_end(word)
+                self._words[word_id] = word
+            while len(self._ids) > self.max_size:
+                _, word_id = self._ids.popitem(last=False)
+                self._words.pop(word_id, None)
+
+    def clear(self) -> None:
+        """
+        Remove all words from the cache.
+        """
+        with self._lock:
+            self._ids.clear()
+            self._words.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids)
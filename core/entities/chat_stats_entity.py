@@ -0,0 +1,41 @@
+"""
+This module defines the ChatStats entity class for the database model.
+The ChatStats class holds the counters shown by /get_stats for a chat,
+and is mapped to the 'chat_stats' table in the database.
+"""
+
+from sqlalchemy import BigInteger, ForeignKey, Integer, TIMESTAMP, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.entities.base_entity import Base
+
+
+class ChatStats(Base):
+    """
+    Represents the statistics of a chat, maintained incrementally by learning and cleanup.
+    This class is mapped to the 'chat_stats' table in the database.
+
+    Attributes:
+        chat_id (int): Primary key and foreign key to the chat.
+        pairs_count (int): Number of pairs of the chat.
+        replies_count (int): Number of replies of the chat.
+        words_count (int): Number of distinct words of the pairs of the chat.
+        last_learned_at (str): Timestamp when the chat was last learned.
+        updated_at (str): Timestamp when the statistics were last updated.
+    """
+
+    __tablename__ = 'chat_stats'
+
+    chat_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('chats.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    pairs_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    replies_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    words_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_learned_at: Mapped[str] = mapped_column(TIMESTAMP)
+    updated_at: Mapped[str] = mapped_column(
+        TIMESTAMP, nullable=False, server_default=func.now())  # pylint: disable=not-callable
+
+    def __repr__(self) -> str:
+        return (f"ChatStats(chat_id={self.chat_id!r}, pairs_count={self.pairs_count!r}, "
+                f"replies_count={self.replies_count!r}, words_count={self.words_count!r}, "
+                f"last_learned_at={self.last_learned_at!r}, updated_at={self.updated_at!r})")
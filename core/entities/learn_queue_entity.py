@@ -0,0 +1,74 @@
+"""
+This module defines the LearnQueueItem entity class for the database model.
+The LearnQueueItem class represents a message waiting to be learned,
+and is mapped to the 'learn_queue' table in the database. The FailedLearnQueueItem
+class represents a message which could not be learned, parked in the
+'learn_queue_failed' table.
+"""
+
+from typing import List
+
+from sqlalchemy import ARRAY, BigInteger, Integer, String, Text, TIMESTAMP, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.entities.base_entity import Base
+
+
+class LearnQueueItem(Base):
+    """
+    Represents a queued message with attributes like id, chat_id, message, etc.
+    This class is mapped to the 'learn_queue' table in the database.
+
+    Attributes:
+        id (int): Primary key of the item, increasing in queue order.
+        chat_id (int): ID of the chat the message belongs to.
+        message (List[str]): Words of the message.
+        created_at (str): Timestamp when the item was queued.
+        attempts (int): Number of failed attempts to learn the item.
+    """
+
+    __tablename__ = 'learn_queue'
+
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=True, nullable=False)
+    chat_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    message: Mapped[List[str]] = mapped_column(ARRAY(String), nullable=False)
+    created_at: Mapped[str] = mapped_column(
+        TIMESTAMP, server_default=func.now(), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, server_default="0", nullable=False)
+
+    def __repr__(self) -> str:
+        return (f"LearnQueueItem(id={self.id!r}, chat_id={self.chat_id!r}, "
+                f"message={self.message!r}, created_at={self.created_at!r}, "
+                f"attempts={self.attempts!r})")
+
+
+class FailedLearnQueueItem(Base):
+    """
+    Represents a queued message which failed to be learned too many times.
+    This class is mapped to the 'learn_queue_failed' table in the database.
+
+    Attributes:
+        id (int): ID the item had in the learn queue.
+        chat_id (int): ID of the chat the message belongs to.
+        message (List[str]): Words of the message.
+        created_at (str): Timestamp when the item was queued.
+        attempts (int): Number of failed attempts to learn the item.
+        error (str): Error of the last attempt.
+        failed_at (str): Timestamp when the item was parked.
+    """
+
+    __tablename__ = 'learn_queue_failed'
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, nullable=False)
+    chat_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    message: Mapped[List[str]] = mapped_column(ARRAY(String), nullable=False)
+    created_at: Mapped[str] = mapped_column(TIMESTAMP, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    error: Mapped[str] = mapped_column(Text, nullable=False)
+    failed_at: Mapped[str] = mapped_column(
+        TIMESTAMP, server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return (f"FailedLearnQueueItem(id={self.id!r}, chat_id={self.chat_id!r}, "
+                f"attempts={self.attempts!r}, error={self.error!r})")
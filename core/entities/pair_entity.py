@@ -13,7 +13,8 @@ from core.entities.base_entity import Base
 class Pair(Base):
     """
     Represents a pair entity with attributes like id, chat_id, first_id, etc.
-    This class is mapped to the 'pairs' table in the database.
+    This class is mapped to the 'pairs' table in the database, which is hash
+    partitioned by chat_id.
 
     Attributes:
         id (int): Primary key of the pair.
@@ -4,7 +4,7 @@ The Reply class represents a reply associated with a pair of words and a chat,
 and is mapped to the 'replies' table in the database.
 """
 
-from sqlalchemy import BigInteger, Integer, ForeignKey
+from sqlalchemy import BigInteger, Integer, ForeignKey, ForeignKeyConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.entities.base_entity import Base
@@ -13,10 +13,12 @@ from core.entities.base_entity import Base
 class Reply(Base):
     """
     Represents a reply entity with attributes like id, pair_id, word_id, etc.
-    This class is mapped to the 'replies' table in the database.
+    This class is mapped to the 'replies' table in the database, which is partitioned
+    by chat_id like the 'pairs' table.
 
     Attributes:
         id (int): Primary key of the reply.
+        chat_id (int): Chat ID of the pair, the partition key.
         pair_id (int): Foreign key to the pair.
         word_id (int): Foreign key to the word.
         count (int): Count of replies.
@@ -25,11 +27,15 @@ class Reply(Base):
     """
 
     __tablename__ = 'replies'
+    __table_args__ = (
+        ForeignKeyConstraint(['chat_id', 'pair_id'], ['pairs.chat_id', 'pairs.id'],
+                             ondelete='CASCADE'),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True, nullable=False)
-    pair_id: Mapped[int] = mapped_column(Integer, ForeignKey(
-        'pairs.id', ondelete='CASCADE'), nullable=False)
+    chat_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    pair_id: Mapped[int] = mapped_column(Integer, nullable=False)
     word_id: Mapped[int] = mapped_column(
         Integer, ForeignKey('words.id', ondelete='CASCADE'))
     count: Mapped[int] = mapped_column(BigInteger, default=1, nullable=False)
@@ -38,5 +44,5 @@ class Reply(Base):
     word = relationship('Word')
 
     def __repr__(self) -> str:
-        return (f"Reply(id={self.id!r}, pair_id={self.pair_id!r}, "
+        return (f"Reply(id={self.id!r}, chat_id={self.chat_id!r}, pair_id={self.pair_id!r}, "
                 f"word_id={self.word_id!r}, count={self.count!r})")
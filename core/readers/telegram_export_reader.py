@@ -0,0 +1,174 @@
+"""
+This module provides the TelegramExportReader class, which reads the messages of a
+Telegram chat history export (result.json) one at a time.
+
+The export is read in chunks and only the message being decoded is kept in memory,
+so the memory used does not depend on the size of the export.
+"""
+
+import json
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
+
+MESSAGES_KEY = "messages"
+
+
+class TelegramExportReader:
+    """
+    Incremental reader of the `messages` array of a Telegram chat history export.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = 1 << 16):
+        """
+        Initialize the TelegramExportReader.
+
+        Args:
+            file (TextIO): The export, opened in text mode.
+            chunk_size (int, optional): Number of characters read at a time.
+                Defaults to 65536.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._eof = False
+
+    def messages(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the entries of the `messages` array of the export.
+
+        Yields:
+            Dict[str, Any]: The next message object.
+
+        Raises:
+            json.JSONDecodeError: If the export is not a valid chat history export.
+        """
+        pos = self._find_messages()
+        while True:
+            pos = self._skip(pos, " \t\r\n,")
+            if pos >= len(self._buffer):
+                raise json.JSONDecodeError("Unterminated messages array", self._buffer, pos)
+            if self._buffer[pos] == "]":
+                return
+            message, end = self._decode(pos)
+            self._buffer = self._buffer[end:]
+            pos = 0
+            yield message
+
+    def texts(self, excluded_senders: Iterable[str] = ()) -> Iterator[str]:
+        """
+        Iterate over the texts of the plain text messages of the export.
+
+        Service messages, messages with formatted text, which the export stores as a
+        list of parts, and messages of the excluded senders are skipped.
+
+        Args:
+            excluded_senders (Iterable[str], optional): Names of the senders whose
+                messages are skipped. Defaults to ().
+
+        Yields:
+            str: The text of the next message.
+
+        Raises:
+            json.JSONDecodeError: If the export is not a valid chat history export.
+        """
+        excluded = set(excluded_senders)
+        for message in self.messages():
+            text = message.get("text")
+            if (message.get("type") == "message"
+                    and message.get("from") not in excluded
+                    and isinstance(text, str)
+                    and text.strip()):
+                yield text
+
+    def _find_messages(self) -> int:
+        """
+        Read up to the opening bracket of the top-level `messages` array.
+
+        The keys of the top-level object are decoded one at a time and the values
+        before the array are skipped, so a string value equal to the key is not
+        mistaken for it.
+
+        Returns:
+            int: Position of the first character after the bracket in the buffer.
+
+        Raises:
+            json.JSONDecodeError: If the export has no messages array.
+        """
+        pos = self._skip(0, " \t\r\n")
+        if pos >= len(self._buffer) or self._buffer[pos] != "{":
+            raise json.JSONDecodeError("Expected an object", self._buffer, pos)
+        pos += 1
+        while True:
+            pos = self._skip(pos, " \t\r\n,")
+            if pos >= len(self._buffer) or self._buffer[pos] == "}":
+                raise json.JSONDecodeError("No messages array", self._buffer, pos)
+            key, end = self._decode(pos)
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expected a key", self._buffer, pos)
+            pos = self._skip(end, " \t\r\n:")
+            if pos >= len(self._buffer):
+                raise json.JSONDecodeError("Expected a value", self._buffer, pos)
+            if key == MESSAGES_KEY:
+                if self._buffer[pos] != "[":
+                    raise json.JSONDecodeError("Expected messages array", self._buffer, pos)
+                self._buffer = self._buffer[pos + 1:]
+                return 0
+            _, end = self._decode(pos)
+            self._buffer = self._buffer[end:]
+            pos = 0
+
+    def _decode(self, pos: int) -> Tuple[Any, int]:
+        """
+        Decode the JSON value at the given position, reading more of the file until the
+        value is complete.
+
+        A value which ends at the end of the buffer is decoded again with more of the
+        file, as a number may continue in the next chunk.
+
+        Args:
+            pos (int): Position of the value in the buffer.
+
+        Returns:
+            Tuple[Any, int]: The value and the position of the first character after it.
+
+        Raises:
+            json.JSONDecodeError: If the value is not valid JSON.
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, pos)
+                if end < len(self._buffer) or self._eof:
+                    return value, end
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._read()
+
+    def _skip(self, pos: int, characters: str) -> int:
+        """
+        Skip the given characters, reading more of the file when the buffer runs out.
+
+        Args:
+            pos (int): Position in the buffer to start at.
+            characters (str): Characters to skip.
+
+        Returns:
+            int: Position of the first other character, or the buffer length at the end
+                of the file.
+        """
+        while True:
+            while pos < len(self._buffer) and self._buffer[pos] in characters:
+                pos += 1
+            if pos < len(self._buffer) or self._eof:
+                return pos
+            self._read()
+
+    def _read(self) -> None:
+        """
+        Append the next chunk of the file to the buffer.
+        """
+        chunk = self.file.read(self.chunk_size)
+        if chunk:
+            self._buffer += chunk
+        else:
+            self._eof = True
@@ -1,18 +1,24 @@
 """
 This module provides the ChatRepository class for managing chat entities
 in a PostgreSQL database using SQLAlchemy.
+
+Chats are looked up through a process-wide ChatCache first, so handling an update
+usually does not query the chats table at all.
 """
 
 import logging
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from core.caches.chat_cache import ChatCache, copy_chat
 from core.entities.chat_entity import Chat
 from core.enums.chat_types import ChatType
+from config import Config
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,11 +32,24 @@ class ChatRepository:
     Provides methods to retrieve, create, and update Chat records.
     """
 
+    _cache: Optional[ChatCache] = None
+
+    def __init__(self):
+        """
+        Initialize the ChatRepository with the process-wide chat cache.
+        """
+        if ChatRepository._cache is None:
+            ChatRepository._cache = ChatCache(Config().bot.chat_cache_ttl)
+        self.cache = ChatRepository._cache
+
     def get_or_create_by(self, session: Session, telegram_id: int,
                          name: str, chat_type: str) -> Chat:
         """
         Retrieve a Chat entity by its Telegram ID, or create it if it does not exist.
 
+        The chat is returned as a transient entity, either from the cache or from the
+        upsert that creates or fetches it.
+
         Args:
             session (Session): SQLAlchemy session.
             telegram_id (int): Telegram ID of the chat.
@@ -44,13 +63,50 @@ class ChatRepository:
             "Fetching or creating chat with telegram_id=%d, name=%s, chat_type=%s",
             telegram_id, name, chat_type
         )
-        chat = self._get_by_telegram_id(session, telegram_id)
+        chat = self.cache.get(telegram_id)
         if chat:
-            logger.debug("Chat found with telegram_id=%d", telegram_id)
+            logger.debug("Chat found in cache with telegram_id=%d", telegram_id)
             return chat
-        logger.debug(
-            "Chat not found, creating new chat with telegram_id=%d", telegram_id)
-        return self._create(session, telegram_id, name, chat_type)
+        chat = self._create(session, telegram_id, name, chat_type)
+        self.cache.put(chat)
+        return chat
+
+    def get_by_telegram_id(self, session: Session, telegram_id: int) -> Optional[Chat]:
+        """
+        Retrieve a Chat entity by its Telegram ID without creating it.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            telegram_id (int): Telegram ID of the chat.
+
+        Returns:
+            Optional[Chat]: The chat as a transient entity, or None if it does not exist.
+        """
+        logger.debug("Fetching chat with telegram_id=%d", telegram_id)
+        chat = self.cache.get(telegram_id)
+        if chat:
+            return chat
+        chat = session.scalars(
+            select(Chat).where(Chat.telegram_id == telegram_id).limit(1)
+        ).first()
+        if chat is None:
+            return None
+        chat = copy_chat(chat)
+        self.cache.put(chat)
+        return chat
+
+    def get_ids(self, session: Session) -> List[int]:
+        """
+        Retrieve the IDs of all chats.
+
+        Args:
+            session (Session): SQLAlchemy session.
+
+        Returns:
+            List[int]: The IDs of the chats in ascending order.
+        """
+        logger.debug("Fetching the IDs of all chats")
+        return list(session.scalars(select(Chat.id).order_by(Chat.id)))
 
     def update_random_chance(self, session: Session, chat_id: int, random_chance: int) -> None:
         """
@@ -74,12 +130,18 @@ class ChatRepository:
             .values(random_chance=random_chance, updated_at=datetime.now())
         )
         session.commit()
+        self.cache.invalidate(chat_id)
 
     def update_chat(self, session: Session, chat_id: int,
-                    name: Optional[str], telegram_id: int) -> None:
+                    name: Optional[str], telegram_id: int) -> bool:
         """
         Update the name and Telegram ID of a Chat entity.
 
+        A group migrated to a supergroup gets a new Telegram ID, which may already
+        belong to another chat if the bot saw the supergroup first. The unique index
+        then rejects the update; the chat keeps its old Telegram ID and only the name
+        is updated, so the migration is not retried with every update.
+
         Args:
             session (Session): SQLAlchemy session.
             chat_id (int): ID of the chat to update.
@@ -87,22 +149,41 @@ class ChatRepository:
             telegram_id (int): New Telegram ID of the chat.
 
         Returns:
-            None
+            bool: True if the Telegram ID has been updated, False if it belongs to
+                another chat.
         """
         logger.debug(
             "Updating chat id=%d with name=%s and telegram_id=%d",
             chat_id, name, telegram_id
         )
-        session.execute(
-            update(Chat)
-            .where(Chat.id == chat_id)
-            .values(name=name, telegram_id=telegram_id, updated_at=datetime.now())
-        )
-        session.commit()
+        updated = True
+        try:
+            session.execute(
+                update(Chat)
+                .where(Chat.id == chat_id)
+                .values(name=name, telegram_id=telegram_id, updated_at=datetime.now())
+            )
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            logger.warning("Telegram ID %d of chat id=%d already belongs to another chat, "
+                           "keeping the old one", telegram_id, chat_id)
+            session.execute(
+                update(Chat)
+                .where(Chat.id == chat_id)
+                .values(name=name, updated_at=datetime.now())
+            )
+            session.commit()
+            updated = False
+        self.cache.invalidate(chat_id)
+        return updated
 
     def _create(self, session: Session, telegram_id: int, name: str, chat_type: str) -> Chat:
         """
-        Create a new Chat entity.
+        Create a new Chat entity, or fetch the existing one, with a single upsert.
+
+        The conflict on the unique Telegram ID leaves the existing row as it is and
+        returns it, so a chat is never created twice by concurrent updates.
 
         Args:
             session (Session): SQLAlchemy session.
@@ -111,7 +192,7 @@ class ChatRepository:
             chat_type (str): Type of the new chat.
 
         Returns:
-            Chat: The newly created Chat entity.
+            Chat: The newly created or existing Chat entity, as a transient copy.
 
         Raises:
             ValueError: If the chat could not be created.
@@ -120,39 +201,25 @@ class ChatRepository:
             "Creating chat with telegram_id=%d, name=%s, chat_type=%s",
             telegram_id, name, chat_type
         )
-        session.execute(
-            insert(Chat)
-            .values(
-                telegram_id=telegram_id,
-                name=name,
-                chat_type=ChatType.from_str(chat_type.lower()),
-                updated_at=datetime.now(),
-                created_at=datetime.now()
-            )
-            .on_conflict_do_nothing()
+        stmt = insert(Chat).values(
+            telegram_id=telegram_id,
+            name=name,
+            chat_type=ChatType.from_str(chat_type.lower()),
+            updated_at=datetime.now(),
+            created_at=datetime.now()
         )
+        chat = session.scalars(
+            stmt.on_conflict_do_update(
+                index_elements=[Chat.telegram_id],
+                set_={"telegram_id": stmt.excluded.telegram_id}
+            ).returning(Chat),
+            execution_options={"populate_existing": True}
+        ).first()
+        if chat is None:
+            session.rollback()
+            logger.error("Failed to create chat with telegram_id=%d", telegram_id)
+            raise ValueError("No such chat")
+        chat = copy_chat(chat)
         session.commit()
-
-        chat = self._get_by_telegram_id(session, telegram_id)
-        if chat:
-            logger.debug(
-                "Chat created successfully with telegram_id=%d", telegram_id)
-            return chat
-        logger.error("Failed to create chat with telegram_id=%d", telegram_id)
-        raise ValueError("No such chat")
-
-    def _get_by_telegram_id(self, session: Session, telegram_id: int) -> Optional[Chat]:
-        """
-        Retrieve a Chat entity by its Telegram ID.
-
-        Args:
-            session (Session): SQLAlchemy session.
-            telegram_id (int): Telegram ID of the chat to retrieve.
-
-        Returns:
-            Optional[Chat]: The Chat entity, or None if not found.
-        """
-        logger.debug("Fetching chat with telegram_id=%d", telegram_id)
-        result = session.execute(
-            select(Chat).where(Chat.telegram_id == telegram_id).limit(1)).scalar()
-        return result
+        logger.debug("Chat fetched or created with telegram_id=%d", telegram_id)
+        return chat
@@ -0,0 +1,179 @@
+"""
+This module provides the ChatStatsRepository class for managing the ChatStats
+entities in a PostgreSQL database using SQLAlchemy.
+
+The statistics of a chat are changed by deltas when its pairs are learned or
+removed, so reading them never has to count the pairs of the chat. The deltas are
+not always exact: the legacy learner commits the pairs before their delta, and two
+learners adding the same new word to a chat both count it. Reconciling corrects
+these errors eventually.
+"""
+
+import logging
+from datetime import datetime
+from typing import Collection, Dict, Optional, Tuple
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from core.entities.chat_stats_entity import ChatStats
+from core.entities.pair_entity import Pair as PairEntity
+from core.entities.reply_entity import Reply as ReplyEntity
+
+# Configure logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ChatStatsRepository:
+    """
+    Repository class for managing ChatStats entities.
+    Provides methods to retrieve, change and recompute the statistics of chats.
+    """
+
+    def get(self, session: Session, chat_id: int) -> Optional[ChatStats]:
+        """
+        Get the statistics of a chat.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): ID of the chat.
+
+        Returns:
+            Optional[ChatStats]: The statistics, or None if the chat has never been learned.
+        """
+        logger.debug("Getting stats for chat_id: %d", chat_id)
+        return session.get(ChatStats, chat_id)
+
+    def count_new_words(self, session: Session, chat_id: int,
+                        pair_ids: Collection[int]) -> int:
+        """
+        Count the words that no other pair of a chat than the given new pairs starts with.
+
+        Every word of a learned message starts a pair, so these are the words added to
+        the vocabulary of the chat by the new pairs.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): ID of the chat.
+            pair_ids (Collection[int]): IDs of the pairs created by the current transaction.
+
+        Returns:
+            int: Number of new words.
+        """
+        if not pair_ids:
+            return 0
+        new_pair = aliased(PairEntity)
+        other_pair = aliased(PairEntity)
+        return session.execute(
+            select(func.count(func.distinct(new_pair.first_id)))  # pylint: disable=not-callable
+            .where(
+                (new_pair.chat_id == chat_id) & new_pair.id.in_(pair_ids) &
+                new_pair.first_id.isnot(None) &
+                ~exists().where(
+                    (other_pair.chat_id == chat_id) &
+                    (other_pair.first_id == new_pair.first_id) &
+                    other_pair.id.notin_(pair_ids)
+                )
+            )
+        ).scalar() or 0
+
+    def add_many(self, session: Session, deltas: Dict[int, Tuple[int, int, int]],
+                 learned_at: Optional[datetime] = None) -> None:
+        """
+        Add deltas to the statistics of many chats with a single upsert.
+
+        The rows are locked in the order of the chat IDs, as every writer of the
+        statistics does, and only at the end of the caller's transaction, so learners
+        and the cleanup never wait for each other in a cycle. The session is not
+        committed.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            deltas (Dict[int, Tuple[int, int, int]]): Mapping of chat IDs to the numbers
+                of pairs, replies and words to add, which are negative for removals.
+            learned_at (Optional[datetime], optional): Time the chats were learned at,
+                or None if they were not learned. Defaults to None.
+        """
+        if not deltas:
+            return
+        logger.debug("Updating stats of %d chats", len(deltas))
+        now = datetime.now()
+        stmt = insert(ChatStats).values([
+            {
+                "chat_id": chat_id,
+                "pairs_count": pairs,
+                "replies_count": replies,
+                "words_count": words,
+                "last_learned_at": learned_at,
+                "updated_at": now
+            }
+            for chat_id, (pairs, replies, words) in sorted(deltas.items())
+        ])
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[ChatStats.chat_id],
+            set_={
+                "pairs_count": ChatStats.pairs_count + stmt.excluded.pairs_count,
+                "replies_count": ChatStats.replies_count + stmt.excluded.replies_count,
+                "words_count": ChatStats.words_count + stmt.excluded.words_count,
+                "last_learned_at": func.greatest(ChatStats.last_learned_at,
+                                                 stmt.excluded.last_learned_at),
+                "updated_at": stmt.excluded.updated_at
+            }
+        ))
+
+    def reconcile(self, session: Session, chat_id: int) -> bool:
+        """
+        Recompute the statistics of a chat from its pairs and replies and commit.
+
+        The statistics row is locked before the pairs are counted, which orders the
+        recomputation after the batches that have already added their deltas. Pairs
+        committed before their delta, as the legacy learner does, may still be
+        counted twice if the recomputation runs in between, so the statistics are
+        only correct eventually, after a later run.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): ID of the chat.
+
+        Returns:
+            bool: True if the stored statistics were wrong and have been corrected.
+        """
+        logger.debug("Reconciling stats for chat_id: %d", chat_id)
+        session.execute(
+            insert(ChatStats)
+            .values(chat_id=chat_id, updated_at=datetime.now())
+            .on_conflict_do_nothing()
+        )
+        stats = session.execute(
+            select(ChatStats)
+            .where(ChatStats.chat_id == chat_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalar_one()
+
+        pairs, words, last_updated_at = session.execute(
+            select(func.count(), func.count(func.distinct(PairEntity.first_id)),  # pylint: disable=not-callable
+                   func.max(PairEntity.updated_at))
+            .where(PairEntity.chat_id == chat_id)
+        ).one()
+        replies = session.execute(
+            select(func.count()).where(ReplyEntity.chat_id == chat_id)  # pylint: disable=not-callable
+        ).scalar()
+
+        drifted = (stats.pairs_count, stats.replies_count, stats.words_count) != \
+            (pairs, replies, words)
+        if drifted:
+            logger.info("Stats of chat %d drifted: pairs %d -> %d, replies %d -> %d, "
+                        "words %d -> %d", chat_id, stats.pairs_count, pairs,
+                        stats.replies_count, replies, stats.words_count, words)
+        stats.pairs_count = pairs
+        stats.replies_count = replies
+        stats.words_count = words
+        if stats.last_learned_at is None:
+            stats.last_learned_at = last_updated_at
+        stats.updated_at = datetime.now()
+        session.commit()
+        return drifted
@@ -4,8 +4,9 @@ stored in a MongoDB collection. The repository includes methods for updating
 and retrieving context records, ensuring efficient management of context data.
 """
 
-from typing import List
-from pymongo import MongoClient
+from typing import Dict, List, Optional
+from pymongo import MongoClient, UpdateOne
+from config import Config
 
 
 class ContextRepository:
@@ -14,16 +15,24 @@ class ContextRepository:
     Provides methods to retrieve and update context records.
     """
 
+    _client: Optional[MongoClient] = None
+
     def __init__(self, host: str = 'localhost', port: int = 27017, database_name: str = 'cache'):
         """
         Initialize the ContextRepository with the given MongoDB connection details.
 
+        All repositories of the process share one pooled client, created from the
+        connection details of the first one.
+
         Args:
             host (str, optional): MongoDB host. Defaults to 'localhost'.
             port (int, optional): MongoDB port. Defaults to 27017.
             database_name (str, optional): Name of the database. Defaults to 'cache'.
         """
-        self.client = MongoClient(host, port)
+        if ContextRepository._client is None:
+            ContextRepository._client = MongoClient(
+                host, port, **Config().cache.pool_options)
+        self.client = ContextRepository._client
         self.db = self.client[database_name]
         self.collection = self.db['contexts']
 
@@ -42,24 +51,37 @@ class ContextRepository:
             return doc['words']
         return []
 
-    def update_context(self, path: str, words: List[str]) -> None:
+    @staticmethod
+    def merge_words(context: List[str], words: List[str], limit: int = 50) -> List[str]:
         """
-        Update the context for a given path by adding new words to the existing context,
-        ensuring the context does not exceed the specified limit.
+        Merge new words into a context, keeping the most recent distinct words first.
 
         Args:
-            path (str): The unique identifier for the context.
+            context (List[str]): The existing context words, newest first.
             words (List[str]): List of new words to add to the context.
+            limit (int, optional): Maximum number of words to keep. Defaults to 50.
+
+        Returns:
+            List[str]: The merged context words, newest first.
+        """
+        new_words = list(dict.fromkeys(word.lower() for word in words))[:limit]
+        added = set(new_words)
+        old_words = [word for word in context if word not in added]
+        return (new_words + old_words)[:limit]
+
+    def save_contexts(self, contexts: Dict[str, List[str]]) -> None:
+        """
+        Replace the words of several contexts with a single bulk write.
+
+        Args:
+            contexts (Dict[str, List[str]]): Mapping of context paths to their words.
         """
-        existing_context = self._get_context_words(path)
-        new_words = {word.lower()
-                     for word in words if word.lower() not in existing_context}
-        updated_context = list(new_words.union(existing_context))[:50]
-
-        self.collection.update_one(
-            {'_id': path},
-            {'$set': {'words': updated_context}},
-            upsert=True
+        if not contexts:
+            return
+        self.collection.bulk_write(
+            [UpdateOne({'_id': path}, {'$set': {'words': words}}, upsert=True)
+             for path, words in contexts.items()],
+            ordered=False
         )
 
     def get_context(self, path: str, limit: int = 50) -> List[str]:
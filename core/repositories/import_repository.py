@@ -0,0 +1,172 @@
+"""
+This module provides the ImportRepository class, which bulk loads pre-counted words,
+pairs and replies into PostgreSQL.
+
+The rows are streamed into temporary staging tables with `COPY` and merged into the
+`words`, `pairs` and `replies` tables with a few set-based statements, so the cost
+of an import does not depend on the number of statements per message.
+"""
+
+import csv
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Staging rows are buffered in memory up to this size and spilled to disk beyond it.
+COPY_BUFFER_SIZE = 64 * 1024 * 1024
+
+# Pairs and replies are matched on their word IDs with NULL mapped to 0, which is never
+# a word ID, so the matches can use hash joins instead of IS NOT DISTINCT FROM.
+SAME_PAIR = ("COALESCE({a}.first_id, 0) = COALESCE({b}.first_id, 0) "
+             "AND COALESCE({a}.second_id, 0) = COALESCE({b}.second_id, 0)")
+
+
+class ImportRepository:
+    """
+    Repository class for bulk loading words, pairs and replies through staging tables.
+
+    The methods do not commit, so a whole import is applied in the caller's transaction.
+    The staging tables are dropped when that transaction ends.
+    """
+
+    def load_words(self, session: Session, words: Iterable[str]) -> Dict[str, int]:
+        """
+        Create the missing words and map every word to its ID.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            words (Iterable[str]): Distinct words to load.
+
+        Returns:
+            Dict[str, int]: Mapping of every word to its ID.
+        """
+        session.execute(text(
+            "CREATE TEMPORARY TABLE import_words (word character varying NOT NULL) "
+            "ON COMMIT DROP"
+        ))
+        count = self._copy(session, "import_words", ["word"], ((word,) for word in words))
+        logger.debug("Staged %d words", count)
+
+        created = session.execute(text(
+            "INSERT INTO words (word) SELECT word FROM import_words ORDER BY word "
+            "ON CONFLICT DO NOTHING"
+        )).rowcount
+        logger.debug("Created %d words", created)
+
+        return dict(session.execute(text(
+            "SELECT w.word, w.id FROM words w JOIN import_words i ON i.word = w.word"
+        )).all())
+
+    def load_trigrams(self, session: Session, chat_id: int,
+                      counts: Iterable[Tuple[Optional[int], Optional[int], Optional[int], int]]
+                      ) -> Tuple[int, int]:
+        """
+        Create the missing pairs of a chat and add the reply counts of the trigrams.
+
+        Pairs that already existed are touched, as learning does.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID of the pairs.
+            counts (Iterable[Tuple[Optional[int], Optional[int], Optional[int], int]]):
+                Rows of (first_id, second_id, reply_id, count) with distinct trigrams.
+
+        Returns:
+            Tuple[int, int]: Number of created pairs and number of upserted replies.
+        """
+        session.execute(text(
+            "CREATE TEMPORARY TABLE import_replies ("
+            "first_id integer, second_id integer, word_id integer, count bigint NOT NULL"
+            ") ON COMMIT DROP"
+        ))
+        count = self._copy(session, "import_replies",
+                           ["first_id", "second_id", "word_id", "count"], counts)
+        logger.debug("Staged %d trigrams", count)
+
+        session.execute(text(
+            "CREATE TEMPORARY TABLE import_pairs ON COMMIT DROP AS "
+            "SELECT DISTINCT first_id, second_id, NULL::integer AS pair_id FROM import_replies"
+        ))
+        session.execute(text("ANALYZE import_replies"))
+        session.execute(text("ANALYZE import_pairs"))
+
+        params = {"chat_id": chat_id, "now": datetime.now()}
+        created = session.execute(text(
+            "INSERT INTO pairs (chat_id, first_id, second_id, created_at, updated_at) "
+            "SELECT :chat_id, i.first_id, i.second_id, :now, :now FROM import_pairs i "
+            "WHERE NOT EXISTS (SELECT 1 FROM pairs p WHERE p.chat_id = :chat_id AND "
+            + SAME_PAIR.format(a="p", b="i") + ") "
+            "ORDER BY i.first_id NULLS FIRST, i.second_id NULLS FIRST "
+            "ON CONFLICT DO NOTHING"
+        ), params).rowcount
+        logger.debug("Created %d pairs", created)
+
+        # Duplicates of the (NULL, NULL) pair are not prevented by the unique indexes,
+        # so the oldest pair is used, as PairRepository.get_or_create_ids does.
+        session.execute(text(
+            "UPDATE import_pairs i SET pair_id = p.id FROM ("
+            "SELECT DISTINCT ON (COALESCE(first_id, 0), COALESCE(second_id, 0)) "
+            "id, first_id, second_id FROM pairs WHERE chat_id = :chat_id "
+            "ORDER BY COALESCE(first_id, 0), COALESCE(second_id, 0), id"
+            ") p WHERE " + SAME_PAIR.format(a="p", b="i")
+        ), params)
+        session.execute(text(
+            "UPDATE pairs SET updated_at = :now "
+            "WHERE chat_id = :chat_id AND id IN (SELECT pair_id FROM import_pairs) "
+            "AND updated_at < :now"
+        ), params)
+
+        replies = 0
+        for condition, conflict in (("IS NOT NULL", "(chat_id, pair_id, word_id)"),
+                                    ("IS NULL", "(chat_id, pair_id) WHERE word_id IS NULL")):
+            replies += session.execute(text(
+                "INSERT INTO replies (chat_id, pair_id, word_id, count) "
+                "SELECT :chat_id, i.pair_id, r.word_id, r.count FROM import_replies r "
+                "JOIN import_pairs i ON " + SAME_PAIR.format(a="i", b="r") + " "
+                f"WHERE r.word_id {condition} ORDER BY i.pair_id, r.word_id "
+                f"ON CONFLICT {conflict} DO UPDATE SET count = replies.count + excluded.count"
+            ), params).rowcount
+        logger.debug("Upserted %d replies", replies)
+        return created, replies
+
+    def _copy(self, session: Session, table: str, columns: List[str],
+              rows: Iterable[Tuple]) -> int:
+        """
+        Stream rows into a table of the session's connection with `COPY ... FROM STDIN`.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            table (str): Name of the table.
+            columns (List[str]): Names of the columns of the rows.
+            rows (Iterable[Tuple]): The rows, None is loaded as NULL.
+
+        Returns:
+            int: Number of copied rows.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=COPY_BUFFER_SIZE, mode="w+",
+                                           newline="", encoding="utf-8") as buffer:
+            # Every string is quoted, so no word is read as the end-of-data marker, and
+            # the quoted empty strings written for None are read back as NULL.
+            writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+            count = 0
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+            buffer.seek(0)
+            cursor = session.connection().connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN "
+                    f"WITH (FORMAT csv, FORCE_NULL ({', '.join(columns)}))",
+                    buffer)
+            finally:
+                cursor.close()
+        return count
@@ -2,11 +2,23 @@
 This module provides the LearnQueueRepository class for managing a learning
 queue stored in a MongoDB collection. It also includes the LearnItem class
 to represent items in the learning queue.
+
+Workers consume the queue with `pop_batch` and `ack`: claimed items stay in the
+collection, hidden from other workers for a visibility timeout, and are deleted only
+once they have been learned, so the items of a crashed worker are claimed again.
+
+Items which could not be learned are reported with `fail`. An item which has failed
+before is claimed on its own, so one broken message does not fail the batches of
+the others, and after too many attempts it is parked in `learn_queue_failed`.
 """
 
 import logging
-from typing import List, Optional
-from pymongo import MongoClient
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import OperationFailure
 from config import Config
 
 
@@ -15,16 +27,47 @@ class LearnItem:
     A class to represent an item in the learning queue.
     """
 
-    def __init__(self, message: List[str], chat_id: int):
+    def __init__(self, message: List[str], chat_id: int, item_id: Optional[Any] = None,
+                 attempts: int = 0):
         """
         Initialize a LearnItem.
 
         Args:
             message (List[str]): The message content.
             chat_id (int): The chat ID associated with the message.
+            item_id (Optional[Any], optional): ID of the queue record. Defaults to None.
+            attempts (int, optional): Number of failed attempts to learn the item.
+                Defaults to 0.
         """
         self.message = message
         self.chat_id = chat_id
+        self.id = item_id
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"LearnItem(id={self.id!r}, chat_id={self.chat_id!r}, message={self.message!r})"
+
+
+def claim_count(attempts: Sequence[int]) -> int:
+    """
+    Get the number of the oldest candidate items to claim.
+
+    An item which has failed before is claimed on its own, and the items before it are
+    claimed without it, so a broken item is retried in a batch of its own.
+
+    Args:
+        attempts (Sequence[int]): Numbers of failed attempts of the candidates, oldest
+            first.
+
+    Returns:
+        int: Number of candidates to claim.
+    """
+    if attempts and attempts[0]:
+        return 1
+    for count, item_attempts in enumerate(attempts):
+        if item_attempts:
+            return count
+    return len(attempts)
 
 
 class LearnQueueRepository:
@@ -33,19 +76,57 @@ class LearnQueueRepository:
     """
 
     _client = None
+    _change_streams: Optional[bool] = None
 
-    def __init__(self):
+    def __init__(self, shard: Optional[Tuple[int, int]] = None):
         """
         Initialize the LearnQueueRepository with the given MongoDB connection details.
+
+        Args:
+            shard (Optional[Tuple[int, int]], optional): Index and count of the shard of
+                chats whose items are claimed and awaited, selected by
+                `chat_id % count == index`. Defaults to None, all chats.
         """
         if not LearnQueueRepository._client:
             config = Config()
             LearnQueueRepository._client = MongoClient(
-                host=config.cache.host, port=config.cache.port)
+                host=config.cache.host, port=config.cache.port, **config.cache.pool_options)
         self.client = LearnQueueRepository._client
         config = Config()
         self.db = self.client[config.cache.name]  # pylint: disable=unsubscriptable-object
         self.collection = self.db["learn_queue"]
+        self.shard = shard
+
+    @staticmethod
+    def reset_client() -> None:
+        """
+        Forget the shared MongoDB client without closing it, so the next repository
+        connects with a new one. A forked process must call this before using the
+        queue, as the client and its sockets belong to the parent process.
+        """
+        LearnQueueRepository._client = None
+
+    @staticmethod
+    def from_config(session: Optional[Any] = None, shard: Optional[Tuple[int, int]] = None):
+        """
+        Create the learn queue repository of the backend selected by
+        TELEGRAM_BOT_LEARN_QUEUE_BACKEND: `mongo` (default) or `postgres`.
+
+        Args:
+            session (Optional[Session], optional): SQLAlchemy session the Postgres backend
+                claims and deletes items in. Ignored by the MongoDB backend.
+                Defaults to None.
+            shard (Optional[Tuple[int, int]], optional): Index and count of the shard of
+                chats the repository claims items of. Defaults to None, all chats.
+
+        Returns:
+            Union[LearnQueueRepository, PgLearnQueueRepository]: The learn queue repository.
+        """
+        if Config().bot.learn_queue_backend == "postgres":
+            # pylint: disable=import-outside-toplevel
+            from core.repositories.pg_learn_queue_repository import PgLearnQueueRepository
+            return PgLearnQueueRepository(session, shard)
+        return LearnQueueRepository(shard)
 
     def push(self, message: List[str], chat_id: int) -> None:
         """
@@ -59,6 +140,17 @@ class LearnQueueRepository:
         self.collection.insert_one(
             {"message": item.message, "chat_id": item.chat_id})
 
+    def push_many(self, items: List[Tuple[List[str], int]]) -> None:
+        """
+        Push several items onto the learning queue with a single insert.
+
+        Args:
+            items (List[Tuple[List[str], int]]): List of (message, chat_id) tuples.
+        """
+        if items:
+            self.collection.insert_many(
+                [{"message": message, "chat_id": chat_id} for message, chat_id in items])
+
     def pop(self) -> Optional[LearnItem]:
         """
         Pop an item from the learning queue.
@@ -69,13 +161,151 @@ class LearnQueueRepository:
         doc = self.collection.find_one_and_delete({})
         if doc:
             try:
-                return LearnItem(message=doc['message'], chat_id=doc['chat_id'])
+                return LearnItem(message=doc['message'], chat_id=doc['chat_id'],
+                                 item_id=doc['_id'])
             except KeyError as e:
                 logging.error(
                     "Failed to pop item from queue: missing key %s", e)
                 return None
         return None
 
+    def pop_batch(self, size: int, visibility_timeout: int = 300) -> List[LearnItem]:
+        """
+        Claim up to `size` of the oldest unclaimed items of the learning queue.
+
+        The claimed items are hidden from other workers for `visibility_timeout` seconds.
+        They must be acknowledged with `ack` once learned, otherwise they are claimed
+        again when the timeout expires.
+
+        Args:
+            size (int): Maximum number of items to claim.
+            visibility_timeout (int, optional): Number of seconds the items stay claimed.
+                Defaults to 300.
+
+        Returns:
+            List[LearnItem]: The claimed items, oldest first.
+        """
+        now = datetime.utcnow()
+        available = self._available_filter(now)
+        candidates = list(
+            self.collection.find(available, {"_id": 1, "attempts": 1})
+            .sort("_id", ASCENDING).limit(size)
+        )
+        ids = [doc["_id"] for doc in
+               candidates[:claim_count([doc.get("attempts", 0) for doc in candidates])]]
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        self.collection.update_many(
+            {"_id": {"$in": ids}, **available},
+            {"$set": {"claimed_until": now + timedelta(seconds=visibility_timeout),
+                      "claim_token": token}}
+        )
+
+        items = []
+        malformed = []
+        for doc in self.collection.find({"claim_token": token}).sort("_id", ASCENDING):
+            try:
+                items.append(LearnItem(doc["message"], doc["chat_id"], doc["_id"],
+                                       doc.get("attempts", 0)))
+            except KeyError as e:
+                logging.error("Dropping malformed learn item %s: missing key %s", doc["_id"], e)
+                malformed.append(doc["_id"])
+        if malformed:
+            self.collection.delete_many({"_id": {"$in": malformed}})
+        return items
+
+    def ack(self, items: List[LearnItem]) -> None:
+        """
+        Remove learned items from the learning queue.
+
+        Args:
+            items (List[LearnItem]): Items claimed by `pop_batch`.
+        """
+        ids = [item.id for item in items if item.id is not None]
+        if ids:
+            self.collection.delete_many({"_id": {"$in": ids}})
+
+    def fail(self, items: List[LearnItem], max_attempts: int, error: str) -> int:
+        """
+        Record a failed attempt to learn claimed items and release them.
+
+        The items are claimed again at once, each on its own. Items which have failed
+        `max_attempts` times are moved to the `learn_queue_failed` collection.
+
+        Args:
+            items (List[LearnItem]): Items claimed by `pop_batch`.
+            max_attempts (int): Number of attempts after which an item is parked.
+            error (str): Description of the error, stored with parked items.
+
+        Returns:
+            int: Number of parked items.
+        """
+        ids = [item.id for item in items if item.id is not None]
+        if not ids:
+            return 0
+        self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$inc": {"attempts": 1}, "$unset": {"claimed_until": "", "claim_token": ""}}
+        )
+        parked = list(self.collection.find(
+            {"_id": {"$in": ids}, "attempts": {"$gte": max_attempts}}))
+        if parked:
+            now = datetime.utcnow()
+            self.db["learn_queue_failed"].insert_many(
+                [{**doc, "error": error, "failed_at": now} for doc in parked])
+            self.collection.delete_many({"_id": {"$in": [doc["_id"] for doc in parked]}})
+        return len(parked)
+
+    def wait_for_items(self, timeout: float) -> bool:
+        """
+        Block until an item is pushed onto the learning queue or the timeout expires.
+
+        New items are awaited on a change stream of the collection. Change streams need
+        a replica set; on a standalone server the first attempt fails, and from then on
+        this method sleeps for the whole timeout so the caller can back off.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if a new item may be available, False if the timeout expired.
+        """
+        if LearnQueueRepository._change_streams is not False:
+            inserted = {"operationType": "insert"}
+            if self.shard:
+                inserted["fullDocument.chat_id"] = {"$mod": [self.shard[1], self.shard[0]]}
+            try:
+                with self.collection.watch(
+                        [{"$match": inserted}],
+                        max_await_time_ms=max(int(timeout * 1000), 1)) as stream:
+                    LearnQueueRepository._change_streams = True
+                    if self.collection.find_one(
+                            self._available_filter(datetime.utcnow()), {"_id": 1}):
+                        return True
+                    return stream.try_next() is not None
+            except OperationFailure as e:
+                logging.info("Change streams are not available, polling the learn queue: %s", e)
+                LearnQueueRepository._change_streams = False
+        time.sleep(timeout)
+        return False
+
+    def _available_filter(self, now: datetime) -> dict:
+        """
+        Build the filter of the unclaimed items of the repository's shard.
+
+        Args:
+            now (datetime): Current UTC time.
+
+        Returns:
+            dict: The MongoDB filter.
+        """
+        available = {"claimed_until": {"$not": {"$gt": now}}}
+        if self.shard:
+            available["chat_id"] = {"$mod": [self.shard[1], self.shard[0]]}
+        return available
+
     def clear(self) -> None:
         """
         Clear all records in the learn_queue collection.
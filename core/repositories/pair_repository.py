@@ -5,15 +5,19 @@ to check, retrieve, create, update, and delete pairs and their associated replie
 """
 
 import logging
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 from sqlalchemy.dialects.postgresql import insert
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    select, update, delete, exists, func, and_, or_, tuple_, bindparam, Integer)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, aliased
 
 from core.entities.pair_entity import Pair as PairEntity
 from core.entities.reply_entity import Reply as ReplyEntity
+from core.entities.word_entity import Word as WordEntity
+from core.repositories.chat_stats_repository import ChatStatsRepository
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -143,76 +147,208 @@ class PairRepository:
                 (PairEntity.second_id.in_(second_ids)) &
                 (PairEntity.created_at < time_offset) &
                 session.query(ReplyEntity).filter(
-                    ReplyEntity.pair_id == PairEntity.id).exists()
+                    (ReplyEntity.chat_id == chat_id) &
+                    (ReplyEntity.pair_id == PairEntity.id)).exists()
             )
             .limit(3)
         ).scalars().all()
         logger.debug("Found pairs: %s", result)
         return list(result)
 
-    def touch(self, session: Session, pair_ids: List[int]) -> None:
+    def generate_sentence(self, session: Session, chat_id: int,
+                          word_ids: List[int]) -> Tuple[List[str], Optional[int]]:
         """
-        Update the updated_at timestamp for the given pairs.
+        Generate a sentence with a single call of the generate_sentence database function.
+
+        The function walks pair -> reply -> next pair on the server side, following the
+        same rules as `get_pair_with_replies` and `ReplyRepository.replies_for_pair`.
 
         Args:
             session (Session): SQLAlchemy session.
-            pair_ids (List[int]): List of pair IDs to update.
-        """
-        logger.debug("Touching pairs with ids: %s", pair_ids)
-        session.execute(
-            update(PairEntity).where(PairEntity.id.in_(
-                pair_ids)).values(updated_at=datetime.now())
-        )
-        session.commit()
+            chat_id (int): Chat ID to generate the sentence for.
+            word_ids (List[int]): IDs of the words the sentence may start with.
 
-    def get_pairs_count(self, session: Session, chat_id: int) -> int:
+        Returns:
+            Tuple[List[str], Optional[int]]: The words of the sentence and the ID of the word
+                it starts with, or an empty list and None if nothing could be generated.
         """
-        Get the count of pairs for a given chat_id.
+        logger.debug("Generating sentence in database for chat_id: %d, word_ids: %s",
+                     chat_id, word_ids)
+        time_offset = datetime.now() - timedelta(minutes=10)
+        sentence = func.generate_sentence(
+            chat_id, bindparam("word_ids", word_ids, type_=ARRAY(Integer)), time_offset
+        ).table_valued("words", "start_word_id")
+        row = session.execute(select(sentence.c.words, sentence.c.start_word_id)).one()
+        logger.debug("Generated sentence: %s", row.words)
+        return list(row.words or []), row.start_word_id
+
+    def iter_pairs_with_replies(self, session: Session, chat_id: int) -> Iterator[Tuple[Any, ...]]:
+        """
+        Stream all pairs of a chat together with their replies and word texts.
 
         Args:
             session (Session): SQLAlchemy session.
             chat_id (int): Chat ID to filter pairs.
 
-        Returns:
-            int: The count of pairs.
+        Yields:
+            Tuple[Any, ...]: Rows of (pair_id, first_id, second_id, created_at, reply_word_id,
+                count, second_word, reply_word).
         """
-        logger.debug("Getting pairs count for chat_id: %d", chat_id)
+        logger.debug("Streaming pairs with replies for chat_id: %d", chat_id)
+        second_word = aliased(WordEntity)
+        reply_word = aliased(WordEntity)
         result = session.execute(
-            select(func.count(func.distinct(PairEntity.id))).where(  # pylint: disable=not-callable
-                PairEntity.chat_id == chat_id)
-        ).scalar()
-        logger.debug("Pairs count: %d", result)
-        return result if result is not None else 0
+            select(PairEntity.id, PairEntity.first_id, PairEntity.second_id,
+                   PairEntity.created_at, ReplyEntity.word_id, ReplyEntity.count,
+                   second_word.word, reply_word.word)
+            .join(ReplyEntity, (ReplyEntity.chat_id == PairEntity.chat_id) &
+                  (ReplyEntity.pair_id == PairEntity.id))
+            .outerjoin(second_word, second_word.id == PairEntity.second_id)
+            .outerjoin(reply_word, reply_word.id == ReplyEntity.word_id)
+            .where(PairEntity.chat_id == chat_id)
+            .execution_options(yield_per=10000)
+        )
+        for row in result:
+            yield tuple(row)
 
-    def remove_old(self, session: Session, cleanup_limit: int) -> List[int]:
+    def touch_many(self, session: Session, pairs: Iterable[Tuple[int, int]],
+                   commit: bool = True, granularity: int = 0) -> int:
         """
-        Remove old pairs that have not been updated for more than 90 days.
+        Update the updated_at timestamp of pairs of any chats with a single statement.
+
+        The keys are sent as two arrays, so the statement has the same two parameters
+        however many pairs are touched. Pairs updated within the last `granularity`
+        seconds are skipped, so they get no new row version.
 
         Args:
             session (Session): SQLAlchemy session.
-            cleanup_limit (int): The maximum number of pairs to remove.
+            pairs (Iterable[Tuple[int, int]]): The (chat_id, pair_id) keys of the pairs.
+            commit (bool, optional): Whether to commit the session. Defaults to True.
+            granularity (int, optional): Pairs updated within this many seconds are
+                left as they are. Defaults to 0.
 
         Returns:
-            List[int]: List of removed pair IDs.
+            int: Number of updated pairs.
         """
-        logger.debug(
-            "Removing old pairs with cleanup_limit: %d", cleanup_limit)
-        remove_lt = datetime.now() - timedelta(days=90)
-        to_removal_ids = session.execute(
-            select(PairEntity.id).where(
-                PairEntity.updated_at < remove_lt).limit(cleanup_limit)
-        ).scalars().all()
+        pairs = sorted(set(pairs))
+        logger.debug("Touching %d pairs", len(pairs))
+        if not pairs:
+            return 0
+        now = datetime.now()
+        keys = func.unnest(
+            bindparam("chat_ids", [chat_id for chat_id, _ in pairs], type_=ARRAY(Integer)),
+            bindparam("pair_ids", [pair_id for _, pair_id in pairs], type_=ARRAY(Integer))
+        ).table_valued("chat_id", "id").render_derived("touched")
+        count = session.execute(
+            update(PairEntity)
+            .where((PairEntity.chat_id == keys.c.chat_id) & (PairEntity.id == keys.c.id) &
+                   (PairEntity.updated_at < now - timedelta(seconds=granularity)))
+            .values(updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if commit:
+            session.commit()
+        logger.debug("Touched %d pairs", count)
+        return count
+
+    def remove_old(self, session: Session, cleanup_limit: int, retention_days: int = 90,
+                   after: Optional[Tuple[datetime, int]] = None
+                   ) -> Tuple[int, Optional[Tuple[datetime, int]]]:
+        """
+        Remove a chunk of the pairs that have not been updated for more than
+        `retention_days` days.
 
-        session.execute(
-            delete(PairEntity).where(PairEntity.id.in_(to_removal_ids))
+        The pairs are taken in (updated_at, id) order from the index on updated_at,
+        starting after the last pair of the previous chunk, so the index entries of
+        already deleted pairs are not scanned again. Pairs locked by learners are
+        skipped, they are about to be touched anyway. The IDs of the removed pairs
+        are not sent back to the client, only the numbers of pairs, replies and words
+        every chat loses, which are subtracted from its statistics in the same
+        transaction.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            cleanup_limit (int): The maximum number of pairs to remove.
+            retention_days (int, optional): Number of days pairs are kept after their
+                last update. Defaults to 90.
+            after (Optional[Tuple[datetime, int]], optional): The (updated_at, id) key
+                of the last pair removed by the previous chunk. Defaults to None.
+
+        Returns:
+            Tuple[int, Optional[Tuple[datetime, int]]]: The number of removed pairs and
+                the key of the last removed pair, or None if nothing was removed.
+        """
+        logger.debug("Removing old pairs with cleanup_limit: %d after: %s",
+                     cleanup_limit, after)
+        remove_lt = datetime.now() - timedelta(days=retention_days)
+        old_ids = select(PairEntity.chat_id, PairEntity.id).where(
+            PairEntity.updated_at < remove_lt)
+        if after is not None:
+            old_ids = old_ids.where(
+                tuple_(PairEntity.updated_at, PairEntity.id) > tuple_(*after))
+        old_ids = (
+            old_ids
+            .order_by(PairEntity.updated_at, PairEntity.id)
+            .limit(cleanup_limit)
+            .with_for_update(skip_locked=True)
+        )
+        removed = (
+            delete(PairEntity)
+            .where(tuple_(PairEntity.chat_id, PairEntity.id).in_(old_ids))
+            .returning(PairEntity.chat_id, PairEntity.id, PairEntity.first_id,
+                       PairEntity.updated_at)
+            .cte("removed")
+        )
+        # The statement still sees the removed pairs and their replies, so the words
+        # are lost if no pair outside of the removed ones starts with them.
+        remaining = aliased(PairEntity)
+        removed_pairs = (
+            select(removed.c.chat_id, func.count().label("pairs"))  # pylint: disable=not-callable
+            .group_by(removed.c.chat_id)
+            .subquery()
         )
+        removed_replies = (
+            select(ReplyEntity.chat_id, func.count().label("replies"))  # pylint: disable=not-callable
+            .join(removed, (ReplyEntity.chat_id == removed.c.chat_id) &
+                  (ReplyEntity.pair_id == removed.c.id))
+            .group_by(ReplyEntity.chat_id)
+            .subquery()
+        )
+        removed_words = (
+            select(removed.c.chat_id,
+                   func.count(func.distinct(removed.c.first_id)).label("words"))  # pylint: disable=not-callable
+            .where(removed.c.first_id.isnot(None) & ~exists().where(
+                (remaining.chat_id == removed.c.chat_id) &
+                (remaining.first_id == removed.c.first_id) &
+                tuple_(remaining.chat_id, remaining.id).notin_(
+                    select(removed.c.chat_id, removed.c.id))
+            ))
+            .group_by(removed.c.chat_id)
+            .subquery()
+        )
+        last = select(removed).order_by(removed.c.updated_at.desc(), removed.c.id.desc())
+        rows = session.execute(
+            select(removed_pairs.c.chat_id, removed_pairs.c.pairs,
+                   func.coalesce(removed_replies.c.replies, 0),
+                   func.coalesce(removed_words.c.words, 0),
+                   last.with_only_columns(removed.c.updated_at).limit(1).scalar_subquery(),
+                   last.with_only_columns(removed.c.id).limit(1).scalar_subquery())
+            .outerjoin(removed_replies, removed_replies.c.chat_id == removed_pairs.c.chat_id)
+            .outerjoin(removed_words, removed_words.c.chat_id == removed_pairs.c.chat_id)
+        ).all()
+        count = sum(pairs for _, pairs, _, _, _, _ in rows)
+        ChatStatsRepository().add_many(session, {
+            chat_id: (-pairs, -replies, -words)
+            for chat_id, pairs, replies, words, _, _ in rows
+        })
         session.commit()
 
-        logger.debug("Removed pairs with ids: %s", to_removal_ids)
-        return list(to_removal_ids)
+        logger.debug("Removed %d pairs", count)
+        return count, (rows[0][4], rows[0][5]) if count else None
 
     def get_pair_or_create_by(self, session: Session, chat_id: int,
-                              first_id: Optional[int], second_id: Optional[int]) -> PairEntity:
+                              first_id: Optional[int], second_id: Optional[int],
+                              created: Optional[List[int]] = None) -> PairEntity:
         """
         Get a pair by chat_id, first_id, and second_id, or create it if it does not exist.
 
@@ -221,6 +357,8 @@ class PairRepository:
             chat_id (int): Chat ID for the pair.
             first_id (Optional[int]): First ID for the pair.
             second_id (Optional[int]): Second ID for the pair.
+            created (Optional[List[int]], optional): List the ID of the pair is appended
+                to if it had to be created. Defaults to None.
 
         Returns:
             PairEntity: The found or created pair.
@@ -230,7 +368,120 @@ class PairRepository:
         pair = self._get_pair_by(session, chat_id, first_id, second_id)
         if not pair:
             logger.debug("No existing pair found, creating new one.")
-            return self._create_pair_by(session, chat_id, first_id, second_id)
+            pair = self._create_pair_by(session, chat_id, first_id, second_id)
+            if created is not None:
+                created.append(pair.id)
+            return pair
 
         logger.debug("Found existing pair: %s", pair)
         return pair
+
+    def _get_pair_ids_by(self, session: Session, chat_id: int,
+                         keys: Iterable[Tuple[Optional[int], Optional[int]]]
+                         ) -> Dict[Tuple[Optional[int], Optional[int]], int]:
+        """
+        Get the IDs of the pairs matching the given (first_id, second_id) keys in one query.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID to filter pairs.
+            keys (Iterable[Tuple[Optional[int], Optional[int]]]): Pair keys to look up.
+
+        Returns:
+            Dict[Tuple[Optional[int], Optional[int]], int]: Mapping of found keys to pair IDs.
+        """
+        keys = set(keys)
+        both = [(first, second) for first, second in keys
+                if first is not None and second is not None]
+        no_first = [second for first, second in keys if first is None and second is not None]
+        no_second = [first for first, second in keys if first is not None and second is None]
+
+        conditions = []
+        if both:
+            conditions.append(tuple_(PairEntity.first_id, PairEntity.second_id).in_(both))
+        if no_first:
+            conditions.append(
+                PairEntity.first_id.is_(None) & PairEntity.second_id.in_(no_first))
+        if no_second:
+            conditions.append(
+                PairEntity.second_id.is_(None) & PairEntity.first_id.in_(no_second))
+        if (None, None) in keys:
+            conditions.append(
+                PairEntity.first_id.is_(None) & PairEntity.second_id.is_(None))
+        if not conditions:
+            return {}
+
+        result = session.execute(
+            select(PairEntity.id, PairEntity.first_id, PairEntity.second_id)
+            .where(and_(PairEntity.chat_id == chat_id, or_(*conditions)))
+            .order_by(PairEntity.id)
+        ).all()
+
+        pair_ids: Dict[Tuple[Optional[int], Optional[int]], int] = {}
+        for pair_id, first_id, second_id in result:
+            pair_ids.setdefault((first_id, second_id), pair_id)
+        return pair_ids
+
+    def get_or_create_ids(self, session: Session, chat_id: int,
+                          keys: Iterable[Tuple[Optional[int], Optional[int]]],
+                          created: Optional[List[int]] = None
+                          ) -> Dict[Tuple[Optional[int], Optional[int]], int]:
+        """
+        Get the IDs of the pairs for the given (first_id, second_id) keys, creating the missing
+        ones with a single multi-row insert.
+
+        The session is not committed, so the new pairs become visible together with
+        the rest of the caller's transaction.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID for the pairs.
+            keys (Iterable[Tuple[Optional[int], Optional[int]]]): Pair keys to get or create.
+            created (Optional[List[int]], optional): List the IDs of the created pairs are
+                appended to. Defaults to None.
+
+        Returns:
+            Dict[Tuple[Optional[int], Optional[int]], int]: Mapping of every key to its pair ID.
+
+        Raises:
+            ValueError: If some of the pairs could not be created.
+        """
+        keys = set(keys)
+        logger.debug("Getting or creating %d pairs for chat_id: %d", len(keys), chat_id)
+        pair_ids = self._get_pair_ids_by(session, chat_id, keys)
+
+        missing = sorted((key for key in keys if key not in pair_ids),
+                         key=lambda key: (key[0] or 0, key[1] or 0))
+        if missing:
+            now = datetime.now()
+            result = session.execute(
+                insert(PairEntity)
+                .values([
+                    {
+                        "chat_id": chat_id,
+                        "first_id": first_id,
+                        "second_id": second_id,
+                        "created_at": now,
+                        "updated_at": now
+                    }
+                    for first_id, second_id in missing
+                ])
+                .on_conflict_do_nothing()
+                .returning(PairEntity.id, PairEntity.first_id, PairEntity.second_id)
+            ).all()
+            for pair_id, first_id, second_id in result:
+                pair_ids.setdefault((first_id, second_id), pair_id)
+            if created is not None:
+                created.extend(pair_id for pair_id, _, _ in result)
+
+        missing = [key for key in missing if key not in pair_ids]
+        if missing:
+            pair_ids.update(self._get_pair_ids_by(session, chat_id, missing))
+
+        if len(pair_ids) < len(keys):
+            logger.error("Failed to create pairs for chat_id: %d, keys: %s", chat_id,
+                         [key for key in keys if key not in pair_ids])
+            raise ValueError("No such pair")
+
+        logger.debug("Resolved %d pair IDs", len(pair_ids))
+        return pair_ids
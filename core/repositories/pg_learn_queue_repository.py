@@ -0,0 +1,236 @@
+"""
+This module provides the PgLearnQueueRepository class, a learning queue stored in the
+'learn_queue' table of PostgreSQL.
+
+It has the same interface as LearnQueueRepository. Workers claim items with
+`FOR UPDATE SKIP LOCKED` and delete them in the transaction of the given session, so
+the items disappear from the queue exactly when the learned trigrams are committed.
+Items which keep failing are moved to the 'learn_queue_failed' table.
+"""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.entities.learn_queue_entity import FailedLearnQueueItem, LearnQueueItem
+from core.repositories.learn_queue_repository import LearnItem, claim_count
+from config import Config
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class PgLearnQueueRepository:
+    """
+    Repository class for managing a learning queue stored in a PostgreSQL table.
+    """
+
+    _session_factory: Optional[sessionmaker] = None
+
+    def __init__(self, session: Optional[Session] = None,
+                 shard: Optional[Tuple[int, int]] = None):
+        """
+        Initialize the PgLearnQueueRepository.
+
+        Args:
+            session (Optional[Session], optional): SQLAlchemy session whose transaction
+                claimed items are deleted in. Without a session, every operation runs and
+                commits in a short session of its own. Defaults to None.
+            shard (Optional[Tuple[int, int]], optional): Index and count of the shard of
+                chats whose items are claimed, selected by `chat_id % count == index`.
+                Defaults to None, all chats.
+        """
+        self.session = session
+        self.shard = shard
+
+    def push(self, message: List[str], chat_id: int) -> None:
+        """
+        Push a new item onto the learning queue.
+
+        Args:
+            message (List[str]): The message content.
+            chat_id (int): The chat ID associated with the message.
+        """
+        self.push_many([(message, chat_id)])
+
+    def push_many(self, items: List[Tuple[List[str], int]]) -> None:
+        """
+        Push several items onto the learning queue with a single insert.
+
+        Args:
+            items (List[Tuple[List[str], int]]): List of (message, chat_id) tuples.
+        """
+        if not items:
+            return
+        session = self._get_session()
+        try:
+            session.execute(
+                insert(LearnQueueItem),
+                [{"message": message, "chat_id": chat_id} for message, chat_id in items]
+            )
+            session.commit()
+        finally:
+            self._release_session(session)
+
+    def pop(self) -> Optional[LearnItem]:
+        """
+        Pop an item from the learning queue.
+
+        Returns:
+            Optional[LearnItem]: The popped LearnItem, or None if the queue is empty.
+        """
+        items = self.pop_batch(1)
+        return items[0] if items else None
+
+    def pop_batch(self, size: int, visibility_timeout: int = 300) -> List[LearnItem]:
+        """
+        Claim and delete up to `size` of the oldest items of the learning queue.
+
+        The rows are locked with `FOR UPDATE SKIP LOCKED`, so concurrent workers claim
+        disjoint batches, and deleted in the transaction of the repository's session.
+        The deletion only becomes visible when that transaction commits; if it rolls
+        back, or the worker dies, the items are back in the queue at once. An item which
+        has failed before is claimed on its own; the candidates which are not claimed
+        stay locked, and skipped by other workers, until the transaction ends.
+
+        Args:
+            size (int): Maximum number of items to claim.
+            visibility_timeout (int, optional): Unused, the row locks are released with
+                the transaction. Defaults to 300.
+
+        Returns:
+            List[LearnItem]: The claimed items, oldest first.
+        """
+        session = self._get_session()
+        try:
+            candidates = select(LearnQueueItem.id, LearnQueueItem.attempts)
+            if self.shard:
+                candidates = candidates.where(
+                    LearnQueueItem.chat_id % self.shard[1] == self.shard[0])
+            candidates = session.execute(
+                candidates
+                .order_by(LearnQueueItem.id)
+                .limit(size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            ids = [item_id for item_id, _ in
+                   candidates[:claim_count([attempts for _, attempts in candidates])]]
+            rows = []
+            if ids:
+                rows = session.execute(
+                    delete(LearnQueueItem)
+                    .where(LearnQueueItem.id.in_(ids))
+                    .returning(LearnQueueItem.id, LearnQueueItem.message,
+                               LearnQueueItem.chat_id, LearnQueueItem.attempts)
+                ).all()
+            if self.session is None:
+                session.commit()
+        finally:
+            self._release_session(session)
+        return [LearnItem(list(message), chat_id, item_id, attempts)
+                for item_id, message, chat_id, attempts in sorted(rows)]
+
+    def ack(self, items: List[LearnItem]) -> None:
+        """
+        Acknowledge learned items. The items were already deleted by `pop_batch` in the
+        learning transaction, so there is nothing left to do.
+
+        Args:
+            items (List[LearnItem]): Items claimed by `pop_batch`.
+        """
+
+    def fail(self, items: List[LearnItem], max_attempts: int, error: str) -> int:
+        """
+        Record a failed attempt to learn claimed items and commit.
+
+        The transaction which claimed the items must have been rolled back, so they are
+        back in the queue. Items which have failed `max_attempts` times are moved to the
+        learn_queue_failed table.
+
+        Args:
+            items (List[LearnItem]): Items claimed by `pop_batch`.
+            max_attempts (int): Number of attempts after which an item is parked.
+            error (str): Description of the error, stored with parked items.
+
+        Returns:
+            int: Number of parked items.
+        """
+        ids = [item.id for item in items if item.id is not None]
+        if not ids:
+            return 0
+        session = self._get_session()
+        try:
+            rows = session.execute(
+                update(LearnQueueItem)
+                .where(LearnQueueItem.id.in_(ids))
+                .values(attempts=LearnQueueItem.attempts + 1)
+                .returning(LearnQueueItem.id, LearnQueueItem.chat_id, LearnQueueItem.message,
+                           LearnQueueItem.created_at, LearnQueueItem.attempts)
+            ).all()
+            parked = [row for row in rows if row.attempts >= max_attempts]
+            if parked:
+                session.execute(insert(FailedLearnQueueItem), [
+                    {"id": row.id, "chat_id": row.chat_id, "message": row.message,
+                     "created_at": row.created_at, "attempts": row.attempts, "error": error}
+                    for row in parked
+                ])
+                session.execute(
+                    delete(LearnQueueItem)
+                    .where(LearnQueueItem.id.in_([row.id for row in parked])))
+            session.commit()
+        finally:
+            self._release_session(session)
+        return len(parked)
+
+    def wait_for_items(self, timeout: float) -> bool:
+        """
+        Wait before the next attempt to claim items from an empty queue.
+
+        Args:
+            timeout (float): Number of seconds to wait.
+
+        Returns:
+            bool: Always False, the caller backs off until an item is found.
+        """
+        time.sleep(timeout)
+        return False
+
+    def clear(self) -> None:
+        """
+        Clear all records in the learn_queue table.
+        """
+        session = self._get_session()
+        try:
+            session.execute(delete(LearnQueueItem))
+            session.commit()
+        finally:
+            self._release_session(session)
+
+    def _get_session(self) -> Session:
+        """
+        Get the repository's session, or a new session when it has none.
+
+        Returns:
+            Session: SQLAlchemy session.
+        """
+        if self.session is not None:
+            return self.session
+        if PgLearnQueueRepository._session_factory is None:
+            config = Config()
+            PgLearnQueueRepository._session_factory = sessionmaker(
+                bind=create_engine(config.db.url, **config.db.pool_options))
+        return PgLearnQueueRepository._session_factory()
+
+    def _release_session(self, session: Session) -> None:
+        """
+        Close a session obtained from `_get_session` unless it is the repository's own.
+
+        Args:
+            session (Session): SQLAlchemy session.
+        """
+        if session is not self.session:
+            session.close()
@@ -5,9 +5,9 @@ to check, retrieve, create, and update replies associated with pairs.
 """
 
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
@@ -46,12 +46,14 @@ class ReplyRepository:
         logger.debug("ReplyEntity existence check result: %s", exists)
         return exists
 
-    def replies_for_pair(self, session: Session, pair_id: int) -> List[ReplyEntity]:
+    def replies_for_pair(self, session: Session, chat_id: int,
+                         pair_id: int) -> List[ReplyEntity]:
         """
         Get the top 3 replies for a given pair_id, ordered by count in descending order.
 
         Args:
             session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID of the pair, which selects the partition to search.
             pair_id (int): Pair ID to filter replies.
 
         Returns:
@@ -60,7 +62,7 @@ class ReplyRepository:
         logger.debug("Getting top 3 replies for pair_id: %d", pair_id)
         result = session.execute(
             select(ReplyEntity)
-            .where(ReplyEntity.pair_id == pair_id)
+            .where((ReplyEntity.chat_id == chat_id) & (ReplyEntity.pair_id == pair_id))
             .order_by(ReplyEntity.count.desc())
             .limit(3)
         ).scalars().all()
@@ -68,32 +70,38 @@ class ReplyRepository:
         logger.debug("Found replies: %s", replies)
         return replies
 
-    def increment_reply(self, session: Session, reply_id: int, counter: int) -> None:
+    def upsert_reply(self, session: Session, chat_id: int, pair_id: int,
+                     word_id: Optional[int], count: int = 1) -> bool:
         """
-        Increment the count of a reply by 1.
+        Create a reply with the given count, or add the count to the existing reply,
+        in a single statement.
 
         Args:
             session (Session): SQLAlchemy session.
-            reply_id (int): ID of the reply to increment.
-            counter (int): Current count of the reply.
+            chat_id (int): Chat ID of the pair.
+            pair_id (int): Pair ID of the reply.
+            word_id (Optional[int]): Word ID of the reply.
+            count (int, optional): Number of occurrences to add. Defaults to 1.
+
+        Returns:
+            bool: True if the reply has been created.
         """
-        logger.debug(
-            "Incrementing reply count for id: %d, current count: %d", reply_id, counter)
-        session.execute(
-            update(ReplyEntity)
-            .where(ReplyEntity.id == reply_id)
-            .values(count=counter + 1)
-        )
+        logger.debug("Upserting reply for pair_id: %d, word_id: %s by %d",
+                     pair_id, word_id, count)
+        _, _, total = session.execute(self._upsert_statement(
+            [{"chat_id": chat_id, "pair_id": pair_id, "word_id": word_id, "count": count}],
+            word_id is not None)).one()
         session.commit()
-        logger.debug("Reply count incremented for id: %d", reply_id)
+        return total == count
 
-    def get_reply_by(self, session: Session, pair_id: int,
+    def get_reply_by(self, session: Session, chat_id: int, pair_id: int,
                      word_id: Optional[int]) -> Optional[ReplyEntity]:
         """
         Get a reply by pair_id and word_id.
 
         Args:
             session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID of the pair.
             pair_id (int): Pair ID to filter replies.
             word_id (Optional[int]): Word ID to filter replies.
 
@@ -104,19 +112,21 @@ class ReplyRepository:
                      pair_id, word_id)
         result = session.execute(
             select(ReplyEntity)
-            .where((ReplyEntity.word_id == word_id) & (ReplyEntity.pair_id == pair_id))
+            .where((ReplyEntity.chat_id == chat_id) & (ReplyEntity.word_id == word_id) &
+                   (ReplyEntity.pair_id == pair_id))
             .limit(1)
         ).scalar()
         logger.debug("Found reply: %s", result)
         return result
 
-    def create_reply_by(self, session: Session, pair_id: int,
+    def create_reply_by(self, session: Session, chat_id: int, pair_id: int,
                         word_id: Optional[int]) -> ReplyEntity:
         """
         Create a reply by pair_id and word_id.
 
         Args:
             session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID of the pair.
             pair_id (int): Pair ID for the new reply.
             word_id (Optional[int]): Word ID for the new reply.
 
@@ -130,16 +140,82 @@ class ReplyRepository:
                      pair_id, word_id)
         session.execute(
             insert(ReplyEntity).values(
+                chat_id=chat_id,
                 pair_id=pair_id,
                 word_id=word_id
             ).on_conflict_do_nothing()
         )
         session.commit()
 
-        reply = self.get_reply_by(session, pair_id, word_id)
+        reply = self.get_reply_by(session, chat_id, pair_id, word_id)
         if not reply:
             logger.error(
                 "Failed to create reply for pair_id: %d, word_id: %s", pair_id, word_id)
             raise ValueError("No such reply")
         logger.debug("Created reply: %s", reply)
         return reply
+
+    def increment_many(self, session: Session, chat_id: int,
+                       counts: Dict[Tuple[int, Optional[int]], int]) -> int:
+        """
+        Add occurrence counts to many replies of a chat at once, creating the missing ones.
+
+        Replies with and without a word are upserted by two multi-row statements, as they
+        are covered by different unique indexes. The session is not committed.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            chat_id (int): Chat ID of the pairs.
+            counts (Dict[Tuple[int, Optional[int]], int]): Mapping of (pair_id, word_id)
+                to the number of occurrences to add.
+
+        Returns:
+            int: Number of created replies.
+        """
+        logger.debug("Incrementing %d replies", len(counts))
+        rows = [
+            {"chat_id": chat_id, "pair_id": pair_id, "word_id": word_id, "count": count}
+            for (pair_id, word_id), count in sorted(
+                counts.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+        ]
+        with_word = [row for row in rows if row["word_id"] is not None]
+        without_word = [row for row in rows if row["word_id"] is None]
+
+        created = 0
+        for batch, has_word in ((with_word, True), (without_word, False)):
+            if batch:
+                result = session.execute(self._upsert_statement(batch, has_word))
+                created += sum(total == counts[(pair_id, word_id)]
+                               for pair_id, word_id, total in result)
+        return created
+
+    def _upsert_statement(self, rows: List[Dict[str, Optional[int]]], with_word: bool):
+        """
+        Build an insert of replies that adds the counts to the already existing ones.
+
+        The statement returns the pair_id, word_id and resulting count of every row. A
+        reply has been created if its count equals the added count, as an existing
+        reply always has a count of at least one.
+
+        Args:
+            rows (List[Dict[str, Optional[int]]]): Rows with chat_id, pair_id, word_id and
+                count.
+            with_word (bool): Whether the rows have a word, which selects the unique index
+                to resolve conflicts on.
+
+        Returns:
+            Insert: The upsert statement.
+        """
+        stmt = insert(ReplyEntity).values(rows)
+        if with_word:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ReplyEntity.chat_id, ReplyEntity.pair_id, ReplyEntity.word_id],
+                set_={"count": ReplyEntity.count + stmt.excluded["count"]}
+            )
+        else:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ReplyEntity.chat_id, ReplyEntity.pair_id],
+                index_where=ReplyEntity.word_id.is_(None),
+                set_={"count": ReplyEntity.count + stmt.excluded["count"]}
+            )
+        return stmt.returning(ReplyEntity.pair_id, ReplyEntity.word_id, ReplyEntity.count)
@@ -2,22 +2,31 @@
 This module provides the WordRepository class for managing Word entities
 in a PostgreSQL database using SQLAlchemy. The repository includes methods
 to retrieve, create, and learn new words.
+
+Words are looked up through a process-wide WordCache first, so learning and story
+generation only query the database for words the process has not seen yet.
 """
 
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import select, insert
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete, event, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, SessionTransaction
 
+from core.caches.word_cache import WordCache
+from core.entities.pair_entity import Pair as PairEntity
+from core.entities.reply_entity import Reply as ReplyEntity
 from core.entities.word_entity import Word as WordEntity
+from config import Config
 
 # Configure logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+PENDING_WORDS_KEY = "pending_words"
+
 
 class WordRepository:
     """
@@ -25,28 +34,41 @@ class WordRepository:
     Provides methods to retrieve, create, and learn new words.
     """
 
-    def _create(self, session: Session, word: str) -> Optional[int]:
+    _cache: Optional[WordCache] = None
+
+    def __init__(self):
         """
-        Create a new WordEntity with the given word.
+        Initialize the WordRepository with the process-wide word cache.
+        """
+        if WordRepository._cache is None:
+            WordRepository._cache = WordCache(Config().bot.word_cache_size)
+            event.listen(Session, "after_commit", WordRepository._cache_pending_words)
+            event.listen(Session, "after_transaction_end", WordRepository._drop_pending_words)
+        self.cache = WordRepository._cache
+
+    @staticmethod
+    def _cache_pending_words(session: Session) -> None:
+        """
+        Move the words created by the committed transaction into the cache.
 
         Args:
-            session (Session): SQLAlchemy session.
-            word (str): The word to create.
+            session (Session): SQLAlchemy session that has been committed.
+        """
+        pending = session.info.pop(PENDING_WORDS_KEY, None)
+        if pending and WordRepository._cache is not None:
+            WordRepository._cache.put_many(pending)
 
-        Returns:
-            Optional[int]: The ID of the created WordEntity, or None if creation failed.
+    @staticmethod
+    def _drop_pending_words(session: Session, transaction: SessionTransaction) -> None:
         """
-        logger.debug("Creating WordEntity with word: %s", word)
-        stmt = insert(WordEntity).values(word=word).returning(WordEntity.id)
-        try:
-            result = session.execute(stmt).scalar()
-            session.commit()
-            logger.debug("Created WordEntity with ID: %d", result)
-            return result
-        except IntegrityError as e:
-            logger.error("IntegrityError: %s", e)
-            session.rollback()
-            return None
+        Forget the words created by a transaction that ended without being committed.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            transaction (SessionTransaction): The transaction that has ended.
+        """
+        if transaction.parent is None:
+            session.info.pop(PENDING_WORDS_KEY, None)
 
     def get_by_words(self, session: Session, words: List[str]) -> List[WordEntity]:
         """
@@ -66,10 +88,31 @@ class WordRepository:
         logger.debug("Found WordEntities: %s", result)
         return list(result)
 
+    def get_ids(self, session: Session, words: List[str]) -> Dict[str, int]:
+        """
+        Map known words to their IDs, querying the database only for uncached words.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            words (List[str]): List of words to map.
+
+        Returns:
+            Dict[str, int]: Mapping of the known words to their IDs. Unknown words are omitted.
+        """
+        word_ids = self._get_cached_ids(session, words)
+        missing = [word for word in set(words) if word not in word_ids]
+        if missing:
+            found = {word.word: word.id for word in self.get_by_words(session, missing)}
+            self.cache.put_many(found)
+            word_ids.update(found)
+        return word_ids
+
     def get_word_by_id(self, session: Session, word_id: int) -> Optional[WordEntity]:
         """
         Retrieve a WordEntity by its ID.
 
+        Cached words are returned as transient entities without touching the database.
+
         Args:
             session (Session): SQLAlchemy session.
             word_id (int): ID of the word to retrieve.
@@ -78,9 +121,15 @@ class WordRepository:
             Optional[WordEntity]: The found WordEntity, or None if not found.
         """
         logger.debug("Getting WordEntity by ID: %d", word_id)
+        word = self.cache.get_word(word_id)
+        if word is not None:
+            return WordEntity(id=word_id, word=word)
+
         result = session.execute(
             select(WordEntity).where(WordEntity.id == word_id).limit(1)
         ).scalar()
+        if result:
+            self.cache.put_many({result.word: result.id})
         logger.debug("Found WordEntity: %s", result)
         return result
 
@@ -93,12 +142,136 @@ class WordRepository:
             words (List[str]): List of words to learn.
         """
         logger.debug("Learning words: %s", words)
-        existing_words = {
-            word.word for word in self.get_by_words(session, words)}
-        for word in words:
-            if word in existing_words:
-                logger.debug("Word already exists: %s", word)
-                continue
-            logger.debug("Creating new word: %s", word)
-            self._create(session, word)
+        self.get_or_create_ids(session, words)
+        session.commit()
         logger.debug("Completed learning words")
+
+    def get_or_create_ids(self, session: Session, words: List[str]) -> Dict[str, int]:
+        """
+        Map words to their IDs, creating the missing ones.
+
+        Uncached words are created by a single multi-row insert, and the words that
+        already existed are fetched by one more lookup. The session is not committed,
+        so the new words become visible together with the rest of the caller's
+        transaction and are cached only once it commits.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            words (List[str]): List of words to map.
+
+        Returns:
+            Dict[str, int]: Mapping of every word to its ID.
+        """
+        word_ids = self._get_cached_ids(session, words)
+        missing = sorted(word for word in set(words) if word not in word_ids)
+        if not missing:
+            return word_ids
+
+        logger.debug("Creating %d uncached words", len(missing))
+        created = {
+            word: word_id for word_id, word in session.execute(
+                insert(WordEntity)
+                .values([{"word": word} for word in missing])
+                .on_conflict_do_nothing()
+                .returning(WordEntity.id, WordEntity.word)
+            ).all()
+        }
+        session.info.setdefault(PENDING_WORDS_KEY, {}).update(created)
+        word_ids.update(created)
+
+        existing = [word for word in missing if word not in created]
+        if existing:
+            found = {word.word: word.id for word in self.get_by_words(session, existing)}
+            self.cache.put_many(found)
+            word_ids.update(found)
+
+        logger.debug("Resolved %d word IDs", len(word_ids))
+        return word_ids
+
+    def reset_cache(self, session: Session) -> None:
+        """
+        Forget the cached word IDs and the words created by the current transaction.
+
+        Used when a cached word turned out to have been removed by the word cleanup,
+        so the IDs are read from the database again.
+
+        Args:
+            session (Session): SQLAlchemy session.
+        """
+        logger.warning("Resetting the word cache")
+        self.cache.clear()
+        session.info.pop(PENDING_WORDS_KEY, None)
+
+    def remove_unreferenced(self, session: Session, limit: int,
+                            after: int = 0) -> Tuple[int, Optional[int]]:
+        """
+        Remove the words referenced by no pair and no reply among the next `limit` words.
+
+        The unreferenced words of the chunk are found with anti-joins and locked with
+        `FOR UPDATE SKIP LOCKED`, so words that a learner is inserting a reference to
+        right now are skipped. The locked words are checked again by the delete, which
+        sees every reference committed before the lock was taken, and no reference can
+        be added while the lock is held. The session is committed.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            limit (int): Number of words to examine.
+            after (int, optional): ID of the last word examined by the previous chunk.
+                Defaults to 0.
+
+        Returns:
+            Tuple[int, Optional[int]]: The number of removed words and the ID of the last
+                examined word, or None if there are no more words.
+        """
+        chunk = (
+            select(WordEntity.id)
+            .where(WordEntity.id > after)
+            .order_by(WordEntity.id)
+            .limit(limit)
+            .subquery()
+        )
+        last_id = session.execute(
+            select(func.max(chunk.c.id))  # pylint: disable=not-callable
+        ).scalar()
+        if last_id is None:
+            session.commit()
+            return 0, None
+
+        unreferenced = (
+            ~exists().where(PairEntity.first_id == WordEntity.id) &
+            ~exists().where(PairEntity.second_id == WordEntity.id) &
+            ~exists().where(ReplyEntity.word_id == WordEntity.id)
+        )
+        locked = session.execute(
+            select(WordEntity.id)
+            .where(WordEntity.id > after, WordEntity.id <= last_id, unreferenced)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        removed = 0
+        if locked:
+            removed = session.execute(
+                delete(WordEntity).where(WordEntity.id.in_(locked), unreferenced)
+            ).rowcount
+        session.commit()
+
+        logger.debug("Removed %d unreferenced words up to id: %d", removed, last_id)
+        return removed, last_id
+
+    def _get_cached_ids(self, session: Session, words: List[str]) -> Dict[str, int]:
+        """
+        Map words to their IDs using only the cache and the words created by the
+        current transaction.
+
+        Args:
+            session (Session): SQLAlchemy session.
+            words (List[str]): List of words to map.
+
+        Returns:
+            Dict[str, int]: Mapping of the cached words to their IDs.
+        """
+        unique_words = set(words)
+        word_ids = self.cache.get_ids(unique_words)
+        pending = session.info.get(PENDING_WORDS_KEY, {})
+        word_ids.update({word: pending[word] for word in unique_words if word in pending})
+        return word_ids
@@ -4,12 +4,19 @@ of word pairs and replies using SQLAlchemy. It interacts with WordRepository,
 PairRepository, and ReplyRepository to store and retrieve data.
 """
 
+from collections import Counter
+from datetime import datetime
 from typing import List, Optional, Dict, Tuple
+from psycopg2 import errorcodes
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from core.entities.word_entity import Word as WordEntity
+from core.caches.touch_buffer import TouchBuffer
+from core.caches.trigram_model_cache import TrigramModelCache
+from core.repositories.chat_stats_repository import ChatStatsRepository
 from core.repositories.pair_repository import PairRepository
 from core.repositories.reply_repository import ReplyRepository
 from core.repositories.word_repository import WordRepository
+from core.services.trigram_counter import TrigramCounter
 from config import Config
 
 
@@ -34,33 +41,149 @@ class LearnService:
         self.word_repo = WordRepository()
         self.pair_repo = PairRepository()
         self.reply_repo = ReplyRepository()
+        self.word_ids: Dict[str, int] = {}
+        self.pair_keys: Dict[Tuple[Optional[int], Optional[int]], int] = {}
+        self.reply_counts: Counter = Counter()
+        self.created_pair_ids: List[int] = []
+        self.created_replies = 0
 
     def learn_pair(self) -> None:
         """
         Learn word pairs and manage replies by storing them in the database.
+
+        When bulk learning is enabled, the whole message is written with a constant
+        number of statements in a single transaction, see `learn_batch`.
         """
-        self._learn_words()
-        new_words = self._prepare_new_words()
-        pair_ids = self._process_trigrams(new_words)
-        self._update_pairs_timestamp(pair_ids)
+        if Config().bot.bulk_learn:
+            LearnService.learn_batch(self.session, [(self.words, self.chat_id)])
+            return
 
-    def _learn_words(self) -> None:
+        try:
+            self._learn_words()
+            new_words = self._prepare_new_words()
+            pair_ids = self._process_trigrams(new_words)
+            self._update_pairs_timestamp(pair_ids)
+            self._update_stats()
+        except IntegrityError as e:
+            # Parts of the message may already be committed, so it is not learned again,
+            # but the next messages no longer use the IDs of removed words.
+            if LearnService._is_foreign_key_violation(e):
+                self.session.rollback()
+                self.word_repo.reset_cache(self.session)
+            raise
+        TrigramModelCache.shared().apply(
+            self.chat_id, self.pair_keys, self.reply_counts, self.word_ids)
+
+    @staticmethod
+    def learn_batch(session: Session, messages: List[Tuple[List[str], int]]) -> None:
         """
-        Learn words by storing them in the database.
+        Learn a batch of messages with set-based writes in a single transaction.
+
+        Every (first, second, reply) trigram of the batch is counted in memory first,
+        then words, pairs and reply counts are written with a few multi-row upserts
+        per chat, so the number of statements does not depend on the message length.
+
+        Args:
+            session (Session): SQLAlchemy session for database operations.
+            messages (List[Tuple[List[str], int]]): List of (words, chat_id) tuples.
         """
-        self.word_repo.learn_words(self.session, self.words)
+        if not messages:
+            return
 
-    def _prepare_new_words(self) -> List[Optional[str]]:
+        try:
+            with session.begin_nested():
+                word_ids, learned = LearnService._write_batch(session, messages)
+        except IntegrityError as e:
+            if not LearnService._is_foreign_key_violation(e):
+                raise
+            # A cached word has been removed by the word cleanup in the meantime, so
+            # the batch is written again with word IDs read from the database.
+            WordRepository().reset_cache(session)
+            with session.begin_nested():
+                word_ids, learned = LearnService._write_batch(session, messages)
+
+        session.commit()
+
+        model_cache = TrigramModelCache.shared()
+        touch_buffer = TouchBuffer.shared()
+        for chat_id, pair_ids, reply_counts in learned:
+            model_cache.apply(chat_id, pair_ids, reply_counts, word_ids)
+            touch_buffer.add(chat_id, pair_ids.values())
+        touch_buffer.flush_if_due(session)
+
+    @staticmethod
+    def _write_batch(session: Session, messages: List[Tuple[List[str], int]]
+                     ) -> Tuple[Dict[str, int], List[Tuple[int, Dict, Counter]]]:
         """
-        Prepare a list of new words with None separators based on end sentence characters.
+        Write the words, pairs, reply counts and chat statistics of a batch of messages
+        without committing.
+
+        Args:
+            session (Session): SQLAlchemy session for database operations.
+            messages (List[Tuple[List[str], int]]): List of (words, chat_id) tuples.
 
         Returns:
-            List[Optional[str]]: The prepared list of new words.
+            Tuple[Dict[str, int], List[Tuple[int, Dict, Counter]]]: The IDs of the words,
+                and the pair IDs and reply counts written for every chat.
+        """
+        end_sentence = Config().end_sentence
+        word_ids = WordRepository().get_or_create_ids(
+            session, [word for words, _ in messages for word in words])
+
+        counters: Dict[int, TrigramCounter] = {}
+        for words, chat_id in messages:
+            counters.setdefault(chat_id, TrigramCounter(end_sentence)).add(words)
+        trigrams = {chat_id: counter.counter(word_ids) for chat_id, counter in counters.items()}
+
+        pair_repo = PairRepository()
+        reply_repo = ReplyRepository()
+        stats_repo = ChatStatsRepository()
+        learned = []
+        stats: Dict[int, Tuple[int, int, int]] = {}
+        for chat_id in sorted(trigrams):
+            counts = trigrams[chat_id]
+            created: List[int] = []
+            pair_ids = pair_repo.get_or_create_ids(
+                session, chat_id, {(first, second) for first, second, _ in counts}, created)
+            reply_counts: Counter = Counter()
+            for (first, second, reply), count in counts.items():
+                reply_counts[(pair_ids[(first, second)], reply)] += count
+            replies = reply_repo.increment_many(session, chat_id, reply_counts)
+            stats[chat_id] = (len(created), replies,
+                              stats_repo.count_new_words(session, chat_id, created))
+            learned.append((chat_id, pair_ids, reply_counts))
+        stats_repo.add_many(session, stats, datetime.now())
+        return word_ids, learned
+
+    @staticmethod
+    def _is_foreign_key_violation(error: IntegrityError) -> bool:
+        """
+        Check whether a database error is the violation of a foreign key.
+
+        Args:
+            error (IntegrityError): The error raised by SQLAlchemy.
+
+        Returns:
+            bool: True if a referenced row, such as a word, does not exist.
+        """
+        return getattr(error.orig, "pgcode", None) == errorcodes.FOREIGN_KEY_VIOLATION
+
+    @staticmethod
+    def _split_sentences(words: List[str], end_sentence: List[str]) -> List[Optional[str]]:
+        """
+        Surround the sentences of a message with None separators.
+
+        Args:
+            words (List[str]): The words of the message.
+            end_sentence (List[str]): List of characters that indicate sentence endings.
+
+        Returns:
+            List[Optional[str]]: The words with None separators.
         """
         new_words: List[Optional[str]] = [None]
-        for word in self.words:
+        for word in words:
             new_words.append(word)
-            if word[-1] in self.end_sentence:
+            if word[-1] in end_sentence:
                 new_words.append(None)
 
         if new_words[-1] is not None:
@@ -68,6 +191,21 @@ class LearnService:
 
         return new_words
 
+    def _learn_words(self) -> None:
+        """
+        Learn words by storing them in the database.
+        """
+        self.word_repo.learn_words(self.session, self.words)
+
+    def _prepare_new_words(self) -> List[Optional[str]]:
+        """
+        Prepare a list of new words with None separators based on end sentence characters.
+
+        Returns:
+            List[Optional[str]]: The prepared list of new words.
+        """
+        return LearnService._split_sentences(self.words, self.end_sentence)
+
     def _process_trigrams(self, new_words: List[Optional[str]]) -> List[int]:
         """
         Process trigrams and manage pairs and replies in the database.
@@ -78,39 +216,44 @@ class LearnService:
         Returns:
             List[int]: List of processed pair IDs.
         """
-        preloaded_words = self._preload_words()
+        self.word_ids = self._preload_words()
         pair_ids = []
 
-        while new_words:
-            trigram_map, _ = self._map_trigram(new_words, preloaded_words)
-            new_words = new_words[1:]
+        for position in range(len(new_words)):
+            trigram_map, _ = self._map_trigram(
+                new_words[position:position + 3], self.word_ids)
 
             pair = self.pair_repo.get_pair_or_create_by(
-                self.session, self.chat_id, trigram_map.get(0), trigram_map.get(1))
+                self.session, self.chat_id, trigram_map.get(0), trigram_map.get(1),
+                self.created_pair_ids)
             pair_ids.append(pair.id)
+            self.pair_keys[(trigram_map.get(0), trigram_map.get(1))] = pair.id
+
+            self.reply_counts[(pair.id, trigram_map.get(2))] += 1
 
-            self._manage_reply(pair.id, trigram_map.get(2))
+        for (pair_id, word_id), count in self.reply_counts.items():
+            self._manage_reply(pair_id, word_id, count)
 
         return pair_ids
 
-    def _preload_words(self) -> Dict[str, WordEntity]:
+    def _preload_words(self) -> Dict[str, int]:
         """
-        Preload words from the database into a dictionary.
+        Preload the IDs of the words into a dictionary.
 
         Returns:
-            Dict[str, WordEntity]: Dictionary of preloaded words.
+            Dict[str, int]: Dictionary of preloaded word IDs.
         """
-        return {word.word: word for word in self.word_repo.get_by_words(self.session, self.words)}
+        return self.word_repo.get_ids(self.session, self.words)
 
     def _map_trigram(self, new_words: List[Optional[str]],
-                     preloaded_words: Dict[str, WordEntity]
+                     preloaded_words: Dict[str, int]
                      ) -> Tuple[Dict[int, int], List[Optional[str]]]:
         """
         Map a trigram of words to their IDs.
 
         Args:
             new_words (List[Optional[str]]): The list of new words.
-            preloaded_words (Dict[str, WordEntity]): Dictionary of preloaded words.
+            preloaded_words (Dict[str, int]): Dictionary of preloaded word IDs.
 
         Returns:
             Tuple[Dict[int, int], List[Optional[str]]]: The trigram map and the trigram.
@@ -120,30 +263,44 @@ class LearnService:
 
         for i, word in enumerate(trigram):
             if word is not None and word in preloaded_words:
-                trigram_map[i] = preloaded_words[word].id
+                trigram_map[i] = preloaded_words[word]
 
         return trigram_map, trigram
 
-    def _manage_reply(self, pair_id: int, word_id: Optional[int]) -> None:
+    def _manage_reply(self, pair_id: int, word_id: Optional[int], count: int = 1) -> None:
         """
         Manage replies for a given pair and word ID.
 
+        The reply is created or incremented atomically by a single statement, so
+        concurrent learners never lose increments.
+
         Args:
             pair_id (int): The pair ID.
             word_id (Optional[int]): The word ID.
+            count (int, optional): Pre-aggregated number of occurrences. Defaults to 1.
         """
-        reply = self.reply_repo.get_reply_by(self.session, pair_id, word_id)
-        if reply:
-            self.reply_repo.increment_reply(
-                self.session, reply.id, reply.count)
-        else:
-            self.reply_repo.create_reply_by(self.session, pair_id, word_id)
+        if self.reply_repo.upsert_reply(self.session, self.chat_id, pair_id, word_id, count):
+            self.created_replies += 1
 
     def _update_pairs_timestamp(self, pair_ids: List[int]) -> None:
         """
-        Update the timestamp of the given pairs.
+        Update the timestamp of the given pairs through the shared TouchBuffer.
 
         Args:
             pair_ids (List[int]): List of pair IDs to update.
         """
-        self.pair_repo.touch(self.session, pair_ids)
+        touch_buffer = TouchBuffer.shared()
+        touch_buffer.add(self.chat_id, pair_ids)
+        touch_buffer.flush_if_due(self.session)
+
+    def _update_stats(self) -> None:
+        """
+        Add the created pairs, replies and words to the statistics of the chat.
+        """
+        stats_repo = ChatStatsRepository()
+        words = stats_repo.count_new_words(self.session, self.chat_id, self.created_pair_ids)
+        stats_repo.add_many(
+            self.session,
+            {self.chat_id: (len(self.created_pair_ids), self.created_replies, words)},
+            datetime.now())
+        self.session.commit()
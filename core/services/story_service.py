@@ -1,14 +1,15 @@
 """
 This module provides the StoryService class for generating stories based on word pairs
 and replies using SQLAlchemy. It interacts with PairRepository, ReplyRepository, and WordRepository
-to store and retrieve data.
+to store and retrieve data, or with an in-memory TrigramModel of the chat when the
+memory engine is selected.
 """
 
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 from random import shuffle, randint
 from sqlalchemy.orm import Session
 
-from core.entities.word_entity import Word
+from core.caches.trigram_model_cache import ModelPair, ModelReply, TrigramModelCache
 from core.entities.pair_entity import Pair
 from core.entities.reply_entity import Reply
 from core.repositories.pair_repository import PairRepository
@@ -22,10 +23,11 @@ class StoryService:
     """
 
     def __init__(self, words: List[str], context: List[str], chat_id: int,
-                 session: Session, end_sentence: List[str], sentences: Optional[int] = None):
+                 session: Session, end_sentence: List[str], sentences: Optional[int] = None,
+                 engine: str = "db"):
         """
         Initialize the StoryService with words, context, chat_id, session, end_sentence, 
-            and sentences.
+            sentences, and engine.
 
         Args:
             words (List[str]): List of words to be used in the story.
@@ -34,6 +36,10 @@ class StoryService:
             session (Session): SQLAlchemy session for database operations.
             end_sentence (List[str]): List of characters that indicate sentence endings.
             sentences (Optional[int], optional): Number of sentences to generate. Defaults to None.
+            engine (str, optional): Generation engine, "db" to walk the pairs in the database,
+                "sql" to walk them inside a single database function call, or "memory" to use
+                the in-memory model of the chat, falling back to "sql" for chats too big to
+                be cached. Defaults to "db".
         """
         self.words = words
         self.context = context
@@ -41,6 +47,8 @@ class StoryService:
         self.session = session
         self.end_sentence = end_sentence
         self.sentences = sentences
+        self.engine = engine
+        self.model = None
         self.current_sentences = []
         self.current_word_ids = []
 
@@ -48,6 +56,10 @@ class StoryService:
         """
         Generate a single sentence for the story and add it to the current sentences.
         """
+        if self.engine == "sql" or (self.engine == "memory" and self.model is None):
+            self._generate_sentence_in_db()
+            return
+
         sentence = []
         safety_counter = 50
 
@@ -62,21 +74,21 @@ class StoryService:
             replies = self._get_shuffled_replies(pair.id)
 
             first_word_id = pair.second_id
-            word_entity = self._get_word_entity(pair.second_id)
+            word = self._get_word(pair.second_id)
 
-            if word_entity:
+            if word:
                 if not sentence:
-                    sentence.append(word_entity.word.lower())
+                    sentence.append(word.lower())
                     if pair.second_id in self.current_word_ids:
                         self.current_word_ids.remove(pair.second_id)
 
                 if replies:
                     reply = replies[0]
                     second_word_ids = [reply.word_id]
-                    word_entity = self._get_word_entity(reply.word_id)
+                    word = self._get_word(reply.word_id)
 
-                    if word_entity:
-                        sentence.append(word_entity.word)
+                    if word:
+                        sentence.append(word)
                     else:
                         break
                 else:
@@ -87,8 +99,23 @@ class StoryService:
             final_sentence = self._set_sentence_end(" ".join(sentence).strip())
             self.current_sentences.append(final_sentence)
 
+    def _generate_sentence_in_db(self) -> None:
+        """
+        Generate a single sentence with one database round trip and add it to the current
+        sentences.
+        """
+        sentence, start_word_id = PairRepository().generate_sentence(
+            session=self.session, chat_id=self.chat_id, word_ids=list(self.current_word_ids))
+        if start_word_id in self.current_word_ids:
+            self.current_word_ids.remove(start_word_id)
+
+        if sentence:
+            final_sentence = self._set_sentence_end(" ".join(sentence).strip())
+            self.current_sentences.append(final_sentence)
+
     def _get_shuffled_pairs(self, first_word_id: Optional[int],
-                            second_word_ids: List[Optional[int]]) -> List[Pair]:
+                            second_word_ids: List[Optional[int]]
+                            ) -> List[Union[Pair, ModelPair]]:
         """
         Retrieve and shuffle pairs based on first and second word IDs.
 
@@ -97,16 +124,19 @@ class StoryService:
             second_word_ids (List[Optional[int]]): The list of second word IDs.
 
         Returns:
-            List[Pair]: The shuffled list of pairs.
+            List[Union[Pair, ModelPair]]: The shuffled list of pairs.
         """
-        pairs = PairRepository().get_pair_with_replies(
-            session=self.session, chat_id=self.chat_id,
-            first_ids=first_word_id, second_ids=second_word_ids
-        )
+        if self.model:
+            pairs = self.model.get_pairs(first_word_id, second_word_ids)
+        else:
+            pairs = PairRepository().get_pair_with_replies(
+                session=self.session, chat_id=self.chat_id,
+                first_ids=first_word_id, second_ids=second_word_ids
+            )
         shuffle(pairs)
         return pairs
 
-    def _get_shuffled_replies(self, pair_id: int) -> List[Reply]:
+    def _get_shuffled_replies(self, pair_id: int) -> List[Union[Reply, ModelReply]]:
         """
         Retrieve and shuffle replies for a given pair ID.
 
@@ -114,24 +144,30 @@ class StoryService:
             pair_id (int): The pair ID.
 
         Returns:
-            List[Reply]: The shuffled list of replies.
+            List[Union[Reply, ModelReply]]: The shuffled list of replies.
         """
-        replies = ReplyRepository().replies_for_pair(
-            session=self.session, pair_id=pair_id)
+        if self.model:
+            replies = self.model.get_replies(pair_id)
+        else:
+            replies = ReplyRepository().replies_for_pair(
+                session=self.session, chat_id=self.chat_id, pair_id=pair_id)
         shuffle(replies)
         return replies
 
-    def _get_word_entity(self, word_id: Optional[int]) -> Optional[Word]:
+    def _get_word(self, word_id: Optional[int]) -> Optional[str]:
         """
-        Retrieve a Word by its ID.
+        Retrieve a word by its ID.
 
         Args:
             word_id (Optional[int]): The word ID.
 
         Returns:
-            Optional[Word]: The Word if found, otherwise None.
+            Optional[str]: The word if found, otherwise None.
         """
-        return WordRepository().get_word_by_id(session=self.session, word_id=word_id or 0)
+        if self.model:
+            return self.model.get_word(word_id)
+        word = WordRepository().get_word_by_id(session=self.session, word_id=word_id or 0)
+        return word.word if word else None
 
     def _set_sentence_end(self, sentence: str) -> str:
         """
@@ -167,8 +203,14 @@ class StoryService:
         Returns:
             Optional[str]: The generated story, or None if no sentences were generated.
         """
-        current_words: Dict[str, int] = {w.word: w.id for w in WordRepository().get_by_words(
-            session=self.session, words=self.words + self.context)}
+        if self.engine == "memory":
+            self.model = TrigramModelCache.shared().get(self.session, self.chat_id)
+
+        if self.model:
+            current_words: Dict[str, int] = self.model.get_word_ids(self.words)
+        else:
+            current_words = WordRepository().get_ids(
+                session=self.session, words=self.words + self.context)
         self.current_word_ids = [current_words[w]
                                  for w in self.words if w in current_words]
 
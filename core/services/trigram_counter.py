@@ -0,0 +1,129 @@
+"""
+This module provides the TrigramCounter class, which counts the (first, second, reply)
+trigrams of many messages with NumPy array operations.
+
+The words of the messages are numbered as they are added and appended to one flat
+array of word numbers, in which 0 stands for the None markers of the sentence
+boundaries. The trigrams are then taken from three shifted views of that array and
+counted by a single unique-with-counts pass, instead of a Python loop per trigram.
+"""
+
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Number of None markers appended to every message, so the trigrams near its end are
+# padded with None without reaching into the next message.
+PADDING = 2
+
+
+class TrigramCounter:
+    """
+    Counter of the trigrams of a stream of messages.
+
+    The trigrams are taken exactly as LearnService walks a message: the sentences are
+    surrounded by None markers and a trigram starts at every position, so the last
+    ones are padded with None.
+    """
+
+    def __init__(self, end_sentence: Iterable[str]):
+        """
+        Initialize an empty TrigramCounter.
+
+        Args:
+            end_sentence (Iterable[str]): Characters that indicate sentence endings.
+        """
+        self.end_sentence = set(end_sentence)
+        self.vocabulary: Dict[str, int] = {}
+        self.messages = 0
+        self._stream = array("q")
+        self._starts = array("B")
+
+    def add(self, words: List[str]) -> None:
+        """
+        Add the words of a message.
+
+        Args:
+            words (List[str]): The words of the message.
+        """
+        stream = self._stream
+        vocabulary = self.vocabulary
+        end_sentence = self.end_sentence
+        length = len(stream)
+
+        stream.append(0)
+        for word in words:
+            number = vocabulary.get(word)
+            if number is None:
+                number = vocabulary[word] = len(vocabulary) + 1
+            stream.append(number)
+            if word[-1] in end_sentence:
+                stream.append(0)
+        if stream[-1] != 0:
+            stream.append(0)
+        stream.extend([0] * PADDING)
+
+        self._starts.extend([1] * (len(stream) - length - PADDING))
+        self._starts.extend([0] * PADDING)
+        self.messages += 1
+
+    def count(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Count the trigrams of the added messages.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The distinct trigrams of word numbers as an
+                array of shape (n, 3), with 0 for None, and their occurrence counts.
+        """
+        stream = np.frombuffer(self._stream, dtype=np.int64)
+        if len(stream) < 3:
+            return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        starts = np.frombuffer(self._starts, dtype=np.uint8)[:-2].astype(bool)
+        first, second, reply = stream[:-2][starts], stream[1:-1][starts], stream[2:][starts]
+
+        base = len(self.vocabulary) + 1
+        if base ** 3 < np.iinfo(np.int64).max:
+            keys, counts = np.unique((first * base + second) * base + reply,
+                                     return_counts=True)
+            trigrams = np.stack([keys // (base * base), keys // base % base, keys % base],
+                                axis=1)
+        else:
+            trigrams, counts = np.unique(np.stack([first, second, reply], axis=1),
+                                         axis=0, return_counts=True)
+        return trigrams, counts
+
+    def rows(self, word_ids: Dict[str, int]
+             ) -> Iterator[Tuple[Optional[int], Optional[int], Optional[int], int]]:
+        """
+        Count the trigrams of the added messages and translate them to word IDs.
+
+        Args:
+            word_ids (Dict[str, int]): Mapping of every added word to its ID.
+
+        Yields:
+            Tuple[Optional[int], Optional[int], Optional[int], int]: Rows of
+                (first_id, second_id, reply_id, count), with None for the markers.
+        """
+        ids = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        for word, number in self.vocabulary.items():
+            ids[number] = word_ids[word]
+
+        trigrams, counts = self.count()
+        for (first, second, reply), count in zip(ids[trigrams].tolist(), counts.tolist()):
+            yield (first or None, second or None, reply or None, count)
+
+    def counter(self, word_ids: Dict[str, int]) -> Counter:
+        """
+        Count the trigrams of the added messages into a Counter of word ID trigrams.
+
+        Args:
+            word_ids (Dict[str, int]): Mapping of every added word to its ID.
+
+        Returns:
+            Counter: Occurrence counts of the (first_id, second_id, reply_id) trigrams.
+        """
+        return Counter({(first, second, reply): count
+                        for first, second, reply, count in self.rows(word_ids)})
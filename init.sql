@@ -8,15 +8,71 @@ CREATE TABLE IF NOT EXISTS chats(
     name character varying
 );
 
-CREATE INDEX IF NOT EXISTS index_chats_on_telegram_id ON chats USING btree (telegram_id);
+-- Before the Telegram ID was unique, a group migrated to a supergroup the bot had
+-- already seen could leave two chats with the same Telegram ID. The oldest of them
+-- is kept, and the newer ones are removed together with their pairs and replies.
+DO $$
+DECLARE
+    duplicate record;
+BEGIN
+    IF to_regclass('unique_chats_telegram_id') IS NULL THEN
+        FOR duplicate IN
+            SELECT c.id, c.telegram_id FROM chats c
+            WHERE EXISTS (SELECT 1 FROM chats o
+                          WHERE o.telegram_id = c.telegram_id AND o.id < c.id)
+        LOOP
+            RAISE NOTICE 'Removing chat % with the duplicate telegram_id %',
+                duplicate.id, duplicate.telegram_id;
+            IF to_regclass('learn_queue') IS NOT NULL THEN
+                DELETE FROM learn_queue WHERE chat_id = duplicate.id;
+            END IF;
+            IF to_regclass('pairs') IS NOT NULL THEN
+                DELETE FROM pairs WHERE chat_id = duplicate.id;
+            END IF;
+            DELETE FROM chats WHERE id = duplicate.id;
+        END LOOP;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS unique_chats_telegram_id ON chats USING btree (telegram_id);
+DROP INDEX IF EXISTS index_chats_on_telegram_id;
+
+-- pairs and replies are hash partitioned by chat_id. Both tables use the same
+-- partition bounds, so the replies of a chat live in the partition with the same
+-- number as its pairs, and queries filtered by chat_id only touch one partition.
+-- Tables created before the partitioning are converted at the end of this script.
+DO $$
+DECLARE
+    index_name text;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('pairs') AND relkind = 'r') THEN
+        ALTER TABLE replies RENAME TO replies_unpartitioned;
+        ALTER TABLE pairs RENAME TO pairs_unpartitioned;
+        FOR index_name IN
+            SELECT indexname FROM pg_indexes
+            WHERE tablename IN ('pairs_unpartitioned', 'replies_unpartitioned')
+        LOOP
+            EXECUTE format('ALTER INDEX %I RENAME TO %I',
+                           index_name, index_name || '_unpartitioned');
+        END LOOP;
+        ALTER SEQUENCE pairs_id_seq OWNED BY NONE;
+        ALTER SEQUENCE replies_id_seq OWNED BY NONE;
+    END IF;
+END $$;
+
+CREATE SEQUENCE IF NOT EXISTS pairs_id_seq;
 
 CREATE TABLE IF NOT EXISTS pairs (
-    id SERIAL PRIMARY KEY NOT NULL,
+    id integer DEFAULT nextval('pairs_id_seq') NOT NULL,
     chat_id integer NOT NULL,
     first_id integer,
     second_id integer,
-    created_at timestamp without time zone NOT NULL
-);
+    created_at timestamp without time zone NOT NULL,
+    updated_at timestamp without time zone NOT NULL,
+    PRIMARY KEY (chat_id, id)
+) PARTITION BY HASH (chat_id);
+
+ALTER SEQUENCE pairs_id_seq OWNED BY pairs.id;
 
 CREATE INDEX IF NOT EXISTS index_pairs_on_chat_id ON pairs USING btree (chat_id);
 CREATE INDEX IF NOT EXISTS index_pairs_on_first_id ON pairs USING btree (first_id);
@@ -25,15 +81,32 @@ CREATE UNIQUE INDEX IF NOT EXISTS unique_pair_chat_id_first_id ON pairs USING bt
 CREATE UNIQUE INDEX IF NOT EXISTS unique_pair_chat_id_first_id_second_id ON pairs USING btree (chat_id, first_id, second_id);
 CREATE UNIQUE INDEX IF NOT EXISTS unique_pair_chat_id_second_id ON pairs USING btree (chat_id, second_id) WHERE (first_id IS NULL);
 
+CREATE SEQUENCE IF NOT EXISTS replies_id_seq;
+
 CREATE TABLE IF NOT EXISTS replies (
-    id SERIAL PRIMARY KEY NOT NULL,
+    id integer DEFAULT nextval('replies_id_seq') NOT NULL,
+    chat_id integer NOT NULL,
     pair_id integer NOT NULL,
     word_id integer,
-    count bigint DEFAULT 1 NOT NULL
-);
+    count bigint DEFAULT 1 NOT NULL,
+    PRIMARY KEY (chat_id, id)
+) PARTITION BY HASH (chat_id);
+
+ALTER SEQUENCE replies_id_seq OWNED BY replies.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS unique_reply_pair_id ON replies USING btree (chat_id, pair_id) WHERE (word_id IS NULL);
+CREATE UNIQUE INDEX IF NOT EXISTS unique_reply_pair_id_word_id ON replies USING btree (chat_id, pair_id, word_id);
+CREATE INDEX IF NOT EXISTS index_replies_on_word_id ON replies USING btree (word_id);
 
-CREATE UNIQUE INDEX IF NOT EXISTS unique_reply_pair_id ON replies USING btree (pair_id) WHERE (word_id IS NULL);
-CREATE UNIQUE INDEX IF NOT EXISTS unique_reply_pair_id_word_id ON replies USING btree (pair_id, word_id);
+DO $$
+BEGIN
+    FOR remainder IN 0..15 LOOP
+        EXECUTE format('CREATE TABLE IF NOT EXISTS pairs_%s PARTITION OF pairs '
+                       'FOR VALUES WITH (MODULUS 16, REMAINDER %s)', remainder, remainder);
+        EXECUTE format('CREATE TABLE IF NOT EXISTS replies_%s PARTITION OF replies '
+                       'FOR VALUES WITH (MODULUS 16, REMAINDER %s)', remainder, remainder);
+    END LOOP;
+END $$;
 
 CREATE TABLE IF NOT EXISTS words (
     id SERIAL PRIMARY KEY NOT NULL,
@@ -52,7 +125,7 @@ ALTER TABLE replies ADD CONSTRAINT word_id_fk FOREIGN KEY (word_id) REFERENCES w
 CREATE UNIQUE INDEX IF NOT EXISTS unique_word_word ON words USING btree(word);
 
 ALTER TABLE replies DROP CONSTRAINT IF EXISTS pair_id_fk;
-ALTER TABLE replies ADD CONSTRAINT pair_id_fk FOREIGN KEY (pair_id) REFERENCES pairs ON DELETE CASCADE;
+ALTER TABLE replies ADD CONSTRAINT pair_id_fk FOREIGN KEY (chat_id, pair_id) REFERENCES pairs (chat_id, id) ON DELETE CASCADE;
 
 ALTER TABLE pairs DROP CONSTRAINT IF EXISTS chat_id_fk;
 ALTER TABLE pairs ADD CONSTRAINT chat_id_fk FOREIGN KEY (chat_id) REFERENCES chats ON DELETE CASCADE;
@@ -60,6 +133,7 @@ ALTER TABLE pairs ADD CONSTRAINT chat_id_fk FOREIGN KEY (chat_id) REFERENCES cha
 ALTER TABLE pairs ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone;
 UPDATE pairs SET updated_at = now() WHERE updated_at IS NULL;
 ALTER TABLE pairs ALTER COLUMN updated_at SET NOT NULL;
+CREATE INDEX IF NOT EXISTS index_pairs_on_updated_at ON pairs USING btree (updated_at, id);
 
 CREATE TABLE IF NOT EXISTS subscriptions(
     id SERIAL PRIMARY KEY NOT NULL,
@@ -69,3 +143,134 @@ CREATE TABLE IF NOT EXISTS subscriptions(
 );
 
 ALTER TABLE chats ADD COLUMN IF NOT EXISTS repost_chat_username character varying;
+
+CREATE TABLE IF NOT EXISTS learn_queue (
+    id BIGSERIAL PRIMARY KEY NOT NULL,
+    chat_id integer NOT NULL,
+    message character varying[] NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+ALTER TABLE learn_queue ADD COLUMN IF NOT EXISTS attempts integer DEFAULT 0 NOT NULL;
+
+-- Items of the learn queue which failed TELEGRAM_BOT_LEARN_MAX_ATTEMPTS times.
+CREATE TABLE IF NOT EXISTS learn_queue_failed (
+    id bigint PRIMARY KEY NOT NULL,
+    chat_id integer NOT NULL,
+    message character varying[] NOT NULL,
+    created_at timestamp without time zone NOT NULL,
+    attempts integer NOT NULL,
+    error text NOT NULL,
+    failed_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+DO $$
+BEGIN
+    IF to_regclass('pairs_unpartitioned') IS NOT NULL THEN
+        INSERT INTO pairs (id, chat_id, first_id, second_id, created_at, updated_at)
+        SELECT id, chat_id, first_id, second_id, created_at, COALESCE(updated_at, now())
+        FROM pairs_unpartitioned;
+        INSERT INTO replies (id, chat_id, pair_id, word_id, count)
+        SELECT r.id, p.chat_id, r.pair_id, r.word_id, r.count
+        FROM replies_unpartitioned r JOIN pairs_unpartitioned p ON p.id = r.pair_id;
+        DROP TABLE replies_unpartitioned;
+        DROP TABLE pairs_unpartitioned;
+    END IF;
+END $$;
+
+-- Counters of the pairs, replies and distinct words of every chat, kept up to date by
+-- learning and the pairs cleanup and recomputed by `main.py reconcilestats`. Every word
+-- of a learned message starts a pair, so the vocabulary is the distinct first_ids.
+CREATE TABLE IF NOT EXISTS chat_stats (
+    chat_id integer PRIMARY KEY NOT NULL REFERENCES chats ON DELETE CASCADE,
+    pairs_count bigint DEFAULT 0 NOT NULL,
+    replies_count bigint DEFAULT 0 NOT NULL,
+    words_count bigint DEFAULT 0 NOT NULL,
+    last_learned_at timestamp without time zone,
+    updated_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+INSERT INTO chat_stats (chat_id, pairs_count, replies_count, words_count, last_learned_at)
+SELECT p.chat_id, p.pairs_count, COALESCE(r.replies_count, 0), p.words_count, p.last_learned_at
+FROM (
+    SELECT chat_id, count(*) AS pairs_count, count(DISTINCT first_id) AS words_count,
+           max(updated_at) AS last_learned_at
+    FROM pairs GROUP BY chat_id
+) p
+LEFT JOIN (SELECT chat_id, count(*) AS replies_count FROM replies GROUP BY chat_id) r
+    ON r.chat_id = p.chat_id
+WHERE NOT EXISTS (SELECT 1 FROM chat_stats);
+
+CREATE OR REPLACE FUNCTION generate_sentence(
+    p_chat_id integer,
+    p_word_ids integer[],
+    p_created_before timestamp without time zone
+) RETURNS TABLE (words character varying[], start_word_id integer) AS $$
+DECLARE
+    safety_counter integer := 50;
+    first_word_id integer := NULL;
+    second_word_ids integer[] := p_word_ids;
+    current_pair_id integer;
+    current_second_id integer;
+    reply_word_id integer;
+    has_reply boolean;
+    word_text character varying;
+BEGIN
+    words := ARRAY[]::character varying[];
+    start_word_id := NULL;
+
+    WHILE safety_counter > 0 LOOP
+        SELECT candidates.id, candidates.second_id
+        INTO current_pair_id, current_second_id
+        FROM (
+            SELECT p.id, p.second_id
+            FROM pairs p
+            WHERE p.chat_id = p_chat_id
+              AND ((first_word_id IS NULL AND p.first_id IS NULL) OR p.first_id = first_word_id)
+              AND p.second_id = ANY(second_word_ids)
+              AND p.created_at < p_created_before
+              AND EXISTS (SELECT 1 FROM replies r
+                          WHERE r.chat_id = p_chat_id AND r.pair_id = p.id)
+            LIMIT 3
+        ) candidates
+        ORDER BY random()
+        LIMIT 1;
+        EXIT WHEN NOT FOUND;
+
+        safety_counter := safety_counter - 1;
+
+        SELECT top_replies.word_id
+        INTO reply_word_id
+        FROM (
+            SELECT r.word_id
+            FROM replies r
+            WHERE r.chat_id = p_chat_id AND r.pair_id = current_pair_id
+            ORDER BY r.count DESC
+            LIMIT 3
+        ) top_replies
+        ORDER BY random()
+        LIMIT 1;
+        has_reply := FOUND;
+
+        first_word_id := current_second_id;
+
+        SELECT w.word INTO word_text FROM words w WHERE w.id = current_second_id;
+        IF FOUND THEN
+            IF cardinality(words) = 0 THEN
+                words := words || lower(word_text);
+                start_word_id := current_second_id;
+            END IF;
+
+            EXIT WHEN NOT has_reply;
+
+            second_word_ids := ARRAY[reply_word_id];
+            SELECT w.word INTO word_text FROM words w WHERE w.id = reply_word_id;
+            EXIT WHEN NOT FOUND;
+
+            words := words || word_text;
+        END IF;
+    END LOOP;
+
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
@@ -1,20 +1,27 @@
 """
 This module is the main entry point for the bot application.
-It handles different tasks such as learning, pairs and learnqueue clearing, and bot operations.
+It handles different tasks such as learning, history import, pairs, words and learnqueue
+clearing, chat stats reconciliation, and bot operations.
 The module sets up logging, configures the database connection, and dispatches tasks 
     based on the command-line argument.
 """
 
+import argparse
+import asyncio
 import logging
 import sys
 from datetime import datetime
 import pytz
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.exc import OperationalError, ProgrammingError, DatabaseError
 from bot.clear_queue import CleanQueue
 from bot.clear_pairs import CleanPairs
+from bot.clear_words import CleanWords
+from bot.import_history import ImportHistory
 from bot.learn import Learn
+from bot.reconcile_stats import ReconcileStats
 from bot.router import Router
 from config import Config
 
@@ -40,10 +47,17 @@ def get_config():
 def setup_database(config):
     """Set up the database connection and return the engine and session."""
     logger.debug("Database URI: %s", config.db.url)
-    engine = create_engine(config.db.url)
+    engine = create_engine(config.db.url, **config.db.pool_options)
     session = sessionmaker(bind=engine)
     return engine, session
 
+def setup_async_database(config):
+    """Set up the asyncio database engine and return the engine and session factory."""
+    logger.debug("Async database URI: %s", config.db.async_url)
+    engine = create_async_engine(config.db.async_url, **config.db.pool_options)
+    session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    return engine, session
+
 def check_db_connection(engine):
     """Check the database connection and log the result."""
     logger.debug("Checking database connection.")
@@ -59,23 +73,101 @@ def check_db_connection(engine):
     except DatabaseError as e:
         logger.error("General database error: %s", e)
 
+async def check_async_db_connection(engine):
+    """Check the connection of the asyncio database engine and log the result."""
+    logger.debug("Checking database connection.")
+    try:
+        async with engine.connect() as connection:
+            result = await connection.execute(text("SELECT 1"))
+            if result.scalar() == 1:
+                logger.info("Successfully connected to the database.")
+    except OperationalError as e:
+        logger.error("Operational error while connecting to the database: %s", e)
+    except ProgrammingError as e:
+        logger.error("Programming error while connecting to the database: %s", e)
+    except DatabaseError as e:
+        logger.error("General database error: %s", e)
+    except (OSError, asyncio.TimeoutError) as e:
+        logger.error("Could not connect to the database: %s", e)
+
+def parse_shard(value):
+    """Parse a shard spec of the form I/M into the shard index and the shard count."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected I/M") from e
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected 0 <= I < M")
+    return index, count
+
+def parse_learn_args(args):
+    """Parse the options of the learn task."""
+    parser = argparse.ArgumentParser(prog="main.py learn")
+    parser.add_argument("--workers", type=int, default=Learn.max_workers,
+                        help=f"number of learn processes to start (default: {Learn.max_workers})")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                        help="learn only the chats of shard I out of M, as I/M (default: 0/1)")
+    options = parser.parse_args(args)
+    if options.workers < 1:
+        parser.error("--workers must be at least 1")
+    return options
+
+def parse_import_args(args):
+    """Parse the options of the import task."""
+    parser = argparse.ArgumentParser(prog="main.py import")
+    parser.add_argument("file", help="path of the chat history export (result.json)")
+    parser.add_argument("--chat", type=int, required=True,
+                        help="Telegram ID of the chat to import the messages into")
+    return parser.parse_args(args)
+
+def parse_cleanup_args(task, args):
+    """Parse the options of a cleanup task."""
+    parser = argparse.ArgumentParser(prog=f"main.py {task}")
+    parser.add_argument("--once", action="store_true",
+                        help="run a single cleanup pass and exit")
+    return parser.parse_args(args)
+
 def run_task(arg, config=None, session=None):
     """Run the specified task based on the argument."""
     try:
         if arg == "learn":
             logger.info("Running learn task")
-            Learn.run()
+            options = parse_learn_args(sys.argv[2:])
+            Learn.run(options.workers, options.shard)
         elif arg == "clearpairs":
             if session and config:
                 logger.info("Running clear pairs task")
-                CleanPairs.run(session, config)
+                options = parse_cleanup_args(arg, sys.argv[2:])
+                if not CleanPairs.run(session, config, options.once):
+                    sys.exit(1)
+        elif arg == "clearwords":
+            if session and config:
+                logger.info("Running clear words task")
+                options = parse_cleanup_args(arg, sys.argv[2:])
+                if not CleanWords.run(session, config, options.once):
+                    sys.exit(1)
+        elif arg == "import":
+            if session and config:
+                logger.info("Running import task")
+                options = parse_import_args(sys.argv[2:])
+                ImportHistory.run(session, config, options.file, options.chat)
+        elif arg == "reconcilestats":
+            if session and config:
+                logger.info("Running reconcile stats task")
+                ReconcileStats.run(session)
         elif arg == "clearqueue":
             logger.info("Running clear learn queue task")
             CleanQueue.run()
         elif arg == "bot":
-            if config and session:
+            if config:
                 logger.info("Running bot")
-                router = Router(config, session)
+                async_engine, async_session = setup_async_database(config)
+                # The bot runs on the event loop the check leaves current, so the
+                # pooled connection stays usable.
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                loop.run_until_complete(check_async_db_connection(async_engine))
+                router = Router(config, async_session)
                 router.run()
         else:
             logger.error("Unknown application argument: %s", arg)
@@ -94,15 +186,20 @@ def main():
     arg = sys.argv[1]
     logger.debug("Application argument: %s", arg)
 
-    if arg != 'learn':
+    config = None
+    session = None
+    if arg == 'bot':
+        # The bot only uses the asyncio engine, which checks its own connection.
+        config = get_config()
+    elif arg != 'learn':
         config = get_config()
         engine, session = setup_database(config)
         check_db_connection(engine)
         session = session()
 
-    run_task(arg, config if arg != 'learn' else None, session if arg != 'learn' else None)
+    run_task(arg, config, session)
 
-    if arg != 'learn' and 'session' in locals():
+    if session is not None:
         session.close()
         logger.debug("Database session closed.")
 
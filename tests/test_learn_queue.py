@@ -0,0 +1,70 @@
+"""
+Tests of the claiming of learn items and of the handling of items which fail to learn.
+"""
+
+import unittest
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+from bot.learn import Learn
+from core.repositories.learn_queue_repository import LearnItem, claim_count
+
+
+class ClaimCountTest(unittest.TestCase):
+    """Tests of `claim_count`."""
+
+    def test_claims_all_fresh_items(self):
+        self.assertEqual(claim_count([0, 0, 0]), 3)
+        self.assertEqual(claim_count([]), 0)
+
+    def test_claims_a_failed_item_on_its_own(self):
+        self.assertEqual(claim_count([2, 0, 0]), 1)
+        self.assertEqual(claim_count([1, 1]), 1)
+
+    def test_stops_before_a_failed_item(self):
+        self.assertEqual(claim_count([0, 0, 1, 0]), 2)
+
+
+class LearnTest(unittest.TestCase):
+    """Tests of the error handling of `Learn.learn`."""
+
+    def setUp(self):
+        self.items = [LearnItem(["hello"], 1, "a"), LearnItem(["bye"], 2, "b")]
+        self.repository = mock.Mock()
+        self.repository.pop_batch.return_value = self.items
+        self.repository.fail.return_value = 0
+        self.session = mock.Mock()
+        for target in ("bot.learn.time.sleep", "bot.learn.logger",
+                       "bot.learn.Learn._fill_window"):
+            patcher = mock.patch(target, return_value=[])
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("bot.learn.LearnService.learn_batch")
+        self.learn_batch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_acknowledges_learned_items(self):
+        self.assertTrue(Learn.learn(self.session, self.repository))
+        self.learn_batch.assert_called_once_with(self.session, [(["hello"], 1), (["bye"], 2)])
+        self.repository.ack.assert_called_once_with(self.items)
+        self.repository.fail.assert_not_called()
+
+    def test_connection_errors_leave_the_items_queued(self):
+        self.learn_batch.side_effect = OperationalError("INSERT", {}, Exception("gone"))
+        self.assertFalse(Learn.learn(self.session, self.repository))
+        self.session.rollback.assert_called_once_with()
+        self.repository.ack.assert_not_called()
+        self.repository.fail.assert_not_called()
+
+    def test_other_errors_fail_the_items(self):
+        self.learn_batch.side_effect = ValueError("broken")
+        self.assertTrue(Learn.learn(self.session, self.repository))
+        self.session.rollback.assert_called_once_with()
+        self.repository.ack.assert_not_called()
+        self.repository.fail.assert_called_once_with(
+            self.items, mock.ANY, repr(ValueError("broken")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Tests of the `--shard I/M` option of the learn task and of the split of a shard among
+the learn processes.
+"""
+
+import argparse
+import unittest
+
+from bot.learn import Learn
+from main import parse_shard
+
+
+def owners(chat_id, shard_workers):
+    """Get the (shard, worker) pairs whose processes learn a chat."""
+    shard_count = len(shard_workers)
+    return [
+        (shard_index, worker)
+        for shard_index, workers in enumerate(shard_workers)
+        for worker, (index, count) in enumerate(
+            Learn.worker_shards(workers, (shard_index, shard_count)))
+        if chat_id % count == index
+    ]
+
+
+class ParseShardTest(unittest.TestCase):
+    """Tests of `parse_shard`."""
+
+    def test_parses_index_and_count(self):
+        self.assertEqual(parse_shard("0/1"), (0, 1))
+        self.assertEqual(parse_shard("2/3"), (2, 3))
+
+    def test_rejects_invalid_specs(self):
+        for value in ("", "1", "a/b", "1/2/3", "2/2", "-1/2", "0/0"):
+            with self.subTest(value=value), self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(value)
+
+
+class WorkerShardsTest(unittest.TestCase):
+    """Tests of `Learn.worker_shards`."""
+
+    def test_single_worker_keeps_the_shard(self):
+        self.assertEqual(Learn.worker_shards(1, (2, 3)), [(2, 3)])
+
+    def test_splits_the_shard_by_the_quotient(self):
+        self.assertEqual(Learn.worker_shards(2, (1, 3)), [(1, 6), (4, 6)])
+
+    def test_every_chat_has_exactly_one_process(self):
+        for shard_workers in ([1], [5], [2, 5, 1], [3, 3], [4, 1, 2, 7]):
+            for chat_id in range(1, 500):
+                with self.subTest(shard_workers=shard_workers, chat_id=chat_id):
+                    self.assertEqual(len(owners(chat_id, shard_workers)), 1)
+
+    def test_shard_chats_do_not_depend_on_workers(self):
+        for chat_id in range(1, 500):
+            for shard_workers in ([1, 1, 1], [2, 5, 1], [7, 3, 4]):
+                with self.subTest(shard_workers=shard_workers, chat_id=chat_id):
+                    (shard_index, _), = owners(chat_id, shard_workers)
+                    self.assertEqual(shard_index, chat_id % 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
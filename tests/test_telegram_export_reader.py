@@ -0,0 +1,73 @@
+"""
+Tests of the incremental reader of Telegram chat history exports.
+"""
+
+import io
+import json
+import unittest
+
+from core.readers.telegram_export_reader import TelegramExportReader
+
+MESSAGES = [
+    {"id": 1, "type": "message", "from": "alice", "text": "hello there"},
+    {"id": 2, "type": "service", "actor": "bob", "action": "pin_message", "text": ""},
+    {"id": 3, "type": "message", "from": "bob", "text": [{"type": "bold", "text": "hi"}]},
+    {"id": 4, "type": "message", "from": "pepebob", "text": "my own message"},
+    {"id": 5, "type": "message", "from": "bob", "text": "  "},
+    {"id": 6, "type": "message", "from": "bob", "text": "see \"messages\": [ ]"},
+]
+
+CHUNK_SIZES = (1, 2, 3, 7, 64, 1 << 16)
+
+
+def read(export, chunk_size):
+    """Read all messages of an export given as a string."""
+    return list(TelegramExportReader(io.StringIO(export), chunk_size).messages())
+
+
+class TelegramExportReaderTest(unittest.TestCase):
+    """Tests of `TelegramExportReader`."""
+
+    def assert_messages(self, document):
+        """Check that the messages of a document are read with every chunk size."""
+        for indent in (None, 1):
+            export = json.dumps(document, indent=indent)
+            for chunk_size in CHUNK_SIZES:
+                with self.subTest(indent=indent, chunk_size=chunk_size):
+                    self.assertEqual(read(export, chunk_size), MESSAGES)
+
+    def test_reads_the_messages(self):
+        self.assert_messages(
+            {"name": "chat", "type": "private_group", "id": 1234567, "messages": MESSAGES})
+
+    def test_ignores_values_equal_to_the_key(self):
+        self.assert_messages(
+            {"name": "messages", "type": "private_group", "id": 1, "messages": MESSAGES})
+
+    def test_ignores_nested_messages_keys(self):
+        self.assert_messages(
+            {"about": "x \"messages\": 5", "nested": {"messages": [1, 2]},
+             "messages": MESSAGES, "tail": {"messages": []}})
+
+    def test_reads_an_empty_array(self):
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(read('{"id": 12345, "messages": [ ]}', chunk_size), [])
+
+    def test_texts_skip_service_formatted_and_excluded_messages(self):
+        export = json.dumps({"name": "chat", "messages": MESSAGES})
+        reader = TelegramExportReader(io.StringIO(export), 5)
+        self.assertEqual(list(reader.texts(["pepebob"])),
+                         ["hello there", "see \"messages\": [ ]"])
+
+    def test_rejects_invalid_exports(self):
+        for export in ("", "[1, 2]", '{"name": "messages"}', '{"messages": 3}',
+                       '{"messages": [{"id": 1}', '{"messages": [{"id": 1}, '):
+            for chunk_size in (1, 1 << 16):
+                with self.subTest(export=export, chunk_size=chunk_size), \
+                        self.assertRaises(json.JSONDecodeError):
+                    read(export, chunk_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
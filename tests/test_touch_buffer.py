@@ -0,0 +1,87 @@
+"""
+Tests of the write-behind buffer of the pair touches.
+"""
+
+import unittest
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+from core.caches.touch_buffer import TouchBuffer
+
+
+class TouchBufferTest(unittest.TestCase):
+    """Tests of `TouchBuffer`."""
+
+    def setUp(self):
+        patcher = mock.patch("core.caches.touch_buffer.PairRepository")
+        self.touch_many = patcher.start().return_value.touch_many
+        self.touch_many.side_effect = lambda session, keys, commit, granularity: len(keys)
+        self.addCleanup(patcher.stop)
+        self.session = mock.Mock()
+
+    def flushed(self):
+        """Get the keys passed to every `touch_many` call."""
+        return [set(call.args[1]) for call in self.touch_many.call_args_list]
+
+    def test_flush_touches_the_pending_pairs(self):
+        buffer = TouchBuffer(granularity=60)
+        buffer.add(1, [10, 11])
+        buffer.add(2, [10])
+        self.assertEqual(buffer.flush(self.session), 3)
+        self.assertEqual(self.flushed(), [{(1, 10), (1, 11), (2, 10)}])
+        self.touch_many.assert_called_once_with(self.session, mock.ANY, True, 60)
+        self.assertEqual(buffer.flush(self.session), 0)
+        self.assertEqual(self.touch_many.call_count, 1)
+
+    def test_pairs_are_buffered_once_per_period(self):
+        buffer = TouchBuffer(granularity=60)
+        with mock.patch("core.caches.touch_buffer.time.time", return_value=600):
+            buffer.add(1, [10])
+            buffer.flush(self.session)
+            buffer.add(1, [10, 11])
+            buffer.flush(self.session)
+        with mock.patch("core.caches.touch_buffer.time.time", return_value=660):
+            buffer.add(1, [10])
+            buffer.flush(self.session)
+        self.assertEqual(self.flushed(), [{(1, 10)}, {(1, 11)}, {(1, 10)}])
+
+    def test_zero_granularity_touches_every_time(self):
+        buffer = TouchBuffer(granularity=0)
+        for _ in range(2):
+            buffer.add(1, [10])
+            buffer.flush(self.session)
+        self.assertEqual(self.flushed(), [{(1, 10)}, {(1, 10)}])
+
+    def test_failed_flush_keeps_the_pairs(self):
+        buffer = TouchBuffer()
+        buffer.add(1, [10])
+        self.touch_many.side_effect = OperationalError("UPDATE", {}, Exception("gone"))
+        with self.assertRaises(OperationalError):
+            buffer.flush(self.session)
+        self.session.rollback.assert_called_once_with()
+
+        self.touch_many.side_effect = lambda session, keys, commit, granularity: len(keys)
+        self.assertEqual(buffer.flush(self.session), 1)
+        self.assertEqual(self.flushed()[-1], {(1, 10)})
+
+    def test_flush_if_due_waits_for_the_interval(self):
+        with mock.patch("core.caches.touch_buffer.time.monotonic", return_value=100):
+            buffer = TouchBuffer(flush_interval=60)
+            buffer.add(1, [10])
+        with mock.patch("core.caches.touch_buffer.time.monotonic", return_value=159):
+            self.assertEqual(buffer.flush_if_due(self.session), 0)
+        self.touch_many.assert_not_called()
+        with mock.patch("core.caches.touch_buffer.time.monotonic", return_value=160):
+            self.assertEqual(buffer.flush_if_due(self.session), 1)
+
+    def test_flush_if_due_logs_errors(self):
+        buffer = TouchBuffer(flush_interval=0)
+        buffer.add(1, [10])
+        self.touch_many.side_effect = OperationalError("UPDATE", {}, Exception("gone"))
+        with self.assertLogs("core.caches.touch_buffer", "ERROR"):
+            self.assertEqual(buffer.flush_if_due(self.session), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Tests of the vectorized trigram counter used by bulk learning and the history import.
+"""
+
+import random
+import unittest
+from collections import Counter
+
+from core.services.learn_service import LearnService
+from core.services.trigram_counter import TrigramCounter
+
+END_SENTENCE = [".", "!", "?"]
+
+
+def expected_trigrams(messages, word_ids):
+    """Count the trigrams the way `LearnService.learn_pair` walks the messages."""
+    counter = Counter()
+    for words in messages:
+        # pylint: disable-next=protected-access
+        new_words = LearnService._split_sentences(words, END_SENTENCE)
+        for position in range(len(new_words)):
+            trigram = new_words[position:position + 3] + [None] * 2
+            counter[tuple(word_ids.get(word) for word in trigram[:3])] += 1
+    return counter
+
+
+class TrigramCounterTest(unittest.TestCase):
+    """Tests of `TrigramCounter`."""
+
+    def count(self, messages, word_ids):
+        """Count the trigrams of the messages with a TrigramCounter."""
+        counter = TrigramCounter(END_SENTENCE)
+        for words in messages:
+            counter.add(words)
+        return counter.counter(word_ids)
+
+    def test_counts_the_trigrams_of_a_message(self):
+        word_ids = {"hello": 10, "world.": 11, "bye": 12}
+        self.assertEqual(self.count([["hello", "world.", "bye"]], word_ids), Counter({
+            (None, 10, 11): 1,
+            (10, 11, None): 1,
+            (11, None, 12): 1,
+            (None, 12, None): 1,
+            (12, None, None): 1,
+            (None, None, None): 1,
+        }))
+
+    def test_does_not_join_messages(self):
+        word_ids = {"a": 1, "b": 2}
+        self.assertEqual(self.count([["a"], ["b"]], word_ids), Counter({
+            (None, 1, None): 1, (1, None, None): 1,
+            (None, 2, None): 1, (2, None, None): 1,
+            (None, None, None): 2,
+        }))
+
+    def test_matches_the_learn_service_walk(self):
+        rng = random.Random(42)
+        vocabulary = ["a", "b", "c", "d.", "e!", "f", "g?", "h"]
+        word_ids = {word: 100 + number for number, word in enumerate(vocabulary)}
+        messages = [[rng.choice(vocabulary) for _ in range(rng.randint(1, 12))]
+                    for _ in range(300)]
+        self.assertEqual(self.count(messages, word_ids),
+                         expected_trigrams(messages, word_ids))
+
+    def test_counts_the_messages_and_words(self):
+        counter = TrigramCounter(END_SENTENCE)
+        counter.add(["a", "b."])
+        counter.add(["b.", "c"])
+        self.assertEqual(counter.messages, 2)
+        self.assertEqual(counter.vocabulary, {"a": 1, "b.": 2, "c": 3})
+
+    def test_counts_nothing_without_messages(self):
+        trigrams, counts = TrigramCounter(END_SENTENCE).count()
+        self.assertEqual(trigrams.shape, (0, 3))
+        self.assertEqual(len(counts), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests of the in-memory trigram models used by the memory story engine.
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from core.caches.trigram_model_cache import (
+    ModelPair, ModelReply, TrigramModel, TrigramModelCache)
+
+OLD = datetime.now() - timedelta(hours=1)
+
+
+class TrigramModelTest(unittest.TestCase):
+    """Tests of `TrigramModel`."""
+
+    def setUp(self):
+        self.model = TrigramModel(1)
+        self.model.add(1, None, 10, OLD, 11, 2)
+        self.model.add(1, None, 10, OLD, 12, 5)
+        self.model.add(1, None, 10, OLD, 13, 1)
+        self.model.add(1, None, 10, OLD, 14, 3)
+        self.model.add(2, None, 11, OLD, 10, 1)
+        self.model.add(3, None, 12, datetime.now(), 10, 1)
+        self.model.add(4, 10, 11, OLD, None, 1)
+        self.model.add_words({10: "a", 11: "b", 12: "c"})
+
+    def test_get_pairs_follows_the_second_ids(self):
+        self.assertEqual(self.model.get_pairs(None, [11, 10, 11]),
+                         [ModelPair(2, None, 11), ModelPair(1, None, 10)])
+        self.assertEqual(self.model.get_pairs(10, [11]), [ModelPair(4, 10, 11)])
+
+    def test_get_pairs_skips_new_and_unknown_pairs(self):
+        self.assertEqual(self.model.get_pairs(None, [12, 99, None]), [])
+
+    def test_get_pairs_returns_at_most_three(self):
+        for pair_id in range(5, 10):
+            self.model.add(pair_id, 20, pair_id, OLD, None, 1)
+        self.assertEqual(len(self.model.get_pairs(20, list(range(5, 10)))), 3)
+
+    def test_get_replies_returns_the_top_three(self):
+        self.assertEqual(self.model.get_replies(1), [
+            ModelReply(12, 5), ModelReply(14, 3), ModelReply(11, 2)])
+        self.assertEqual(self.model.get_replies(99), [])
+
+    def test_get_words(self):
+        self.assertEqual(self.model.get_word(11), "b")
+        self.assertIsNone(self.model.get_word(None))
+        self.assertEqual(self.model.get_word_ids(["c", "a", "z"]), {"c": 12, "a": 10})
+
+    def test_size_counts_pairs_replies_and_words(self):
+        self.assertEqual(self.model.size, 4 + 7 + 3)
+
+
+class TrigramModelCacheTest(unittest.TestCase):
+    """Tests of `TrigramModelCache`."""
+
+    def setUp(self):
+        self.rows = [(1, None, 10, OLD, 11, 2, "a", "b")]
+        patcher = mock.patch("core.caches.trigram_model_cache.PairRepository")
+        self.repository = patcher.start().return_value
+        self.repository.iter_pairs_with_replies.side_effect = lambda session, chat_id: iter(
+            self.rows)
+        self.addCleanup(patcher.stop)
+
+    def test_get_loads_the_model_once(self):
+        cache = TrigramModelCache(budget=100)
+        model = cache.get(None, 7)
+        self.assertIs(cache.get(None, 7), model)
+        self.assertEqual(model.get_replies(1), [ModelReply(11, 2)])
+        self.assertEqual(self.repository.iter_pairs_with_replies.call_count, 1)
+
+    def test_get_skips_oversized_chats(self):
+        cache = TrigramModelCache(budget=2)
+        self.assertIsNone(cache.get(None, 7))
+        self.assertIsNone(cache.get(None, 7))
+        self.assertEqual(self.repository.iter_pairs_with_replies.call_count, 1)
+
+    def test_evicts_the_least_recently_used_model(self):
+        cache = TrigramModelCache(budget=8)
+        cache.get(None, 1)
+        cache.get(None, 2)
+        cache.get(None, 1)
+        cache.get(None, 3)
+        self.assertEqual(list(cache._models), [1, 3])  # pylint: disable=protected-access
+
+    def test_apply_adds_only_the_words_of_the_chat(self):
+        cache = TrigramModelCache(budget=100)
+        model = cache.get(None, 7)
+        cache.apply(7, {(10, 11): 2}, {(2, 12): 3}, {"c": 12, "other": 99})
+        cache.apply(8, {(10, 11): 5}, {(5, 13): 1}, {"d": 13})
+        self.assertEqual(model.get_replies(2), [ModelReply(12, 3)])
+        self.assertEqual(model.get_word_ids(["c", "other", "d"]), {"c": 12})
+
+    def test_apply_during_a_load_is_replayed(self):
+        cache = TrigramModelCache(budget=100)
+
+        def load(session, chat_id):
+            yield self.rows[0]
+            cache.apply(chat_id, {(10, 11): 2}, {(2, 12): 1}, {"c": 12})
+        self.repository.iter_pairs_with_replies.side_effect = load
+
+        model = cache.get(None, 7)
+        self.assertEqual(model.get_replies(2), [ModelReply(12, 1)])
+        self.assertEqual(model.get_word(12), "c")
+        self.assertEqual(cache._loading, {})  # pylint: disable=protected-access
+
+
+if __name__ == "__main__":
+    unittest.main()